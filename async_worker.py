@@ -1,31 +1,51 @@
+import asyncio
+import logging
 from http_client import send_request
+from raw_client import RawConnectionPool, send_request as send_raw_request
 
-async def worker(url, session, method, semaphore, results, errors, data=None):
+logger = logging.getLogger(__name__)
+
+async def worker(template, session, semaphore, stats, scheduled_at=None, log_every=0, endpoint=None):
     """
-    Asynchronous worker function to send an HTTP request to a given URL.
+    Asynchronous worker function to send a pre-encoded HTTP request.
+
+    Nothing is printed per request: completed requests are only logged every `log_every`
+    requests, or individually when debug logging is enabled.
 
     Args:
-        url (str): The URL to send the request to.
-        session (aiohttp.ClientSession): The aiohttp client session to use for the request.
-        method (str): The HTTP method to use (e.g. "GET", "POST", etc.).
+        template (RequestTemplate): The request to send, see `http_client.build_request_template`.
+        session (aiohttp.ClientSession or RawConnectionPool): The session to send the request through;
+                                                              a raw pool sends it with the raw engine.
         semaphore (asyncio.Semaphore): A semaphore to limit the number of concurrent requests.
-        results (list): A list to store the response times of successful requests.
-        errors (list): A list to store the status codes of failed requests.
-        data (dict, optional): The data to send with the request (e.g. for POST requests).
+        stats (RunStats): The statistics to record the response time, status and dispatch lag into,
+                          and whose `recorder`, if set, gets every raw sample.
+        scheduled_at (float, optional): The event loop time at which the request was planned to go out.
+                                        How late it actually went out, including any time spent waiting
+                                        on the semaphore, is recorded as dispatch lag.
+        log_every (int, optional): Log one in every `log_every` completed requests; 0 disables sampling.
+        endpoint (str, optional): Name to break the result down under in the report.
 
     Returns:
         tuple: A tuple containing the response time and status code of the request.
     """
     async with semaphore:
-        response_time, status = await send_request(url, session, method=method, data=data)
-        print(f"Request completed in {response_time} seconds with status {status}")
-        results.append(response_time)
-        
-        if not isinstance(status, int) or status >= 400:  # Consider any 400+ status as error
-            errors.append(status)
-        
+        dispatched_at = asyncio.get_running_loop().time()
+        if scheduled_at is not None:
+            stats.dispatch_lag.record(dispatched_at - scheduled_at)
+        stats.request_started()
+        try:
+            send = send_raw_request if isinstance(session, RawConnectionPool) else send_request
+            response_time, status, size = await send(template, session, stats)
+        finally:
+            stats.in_flight -= 1
+        stats.record(response_time, status, endpoint)
+        if stats.recorder is not None:
+            recorder = stats.recorder
+            recorder.record((scheduled_at if scheduled_at is not None else dispatched_at) - recorder.start,
+                            response_time, status, size)
+        if log_every and stats.latency.count % log_every == 0:
+            logger.info("Request %d completed in %.4f seconds with status %s",
+                        stats.latency.count, response_time, status)
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Request completed in %.4f seconds with status %s", response_time, status)
         return response_time, status
-
-
-
-
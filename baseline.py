@@ -0,0 +1,250 @@
+import json
+import math
+import time
+import numpy as np
+from stats import RunStats
+
+SUMMARY_VERSION = 1
+# Run settings recorded with a summary; a comparison warns when they differ
+METADATA_FIELDS = ["url", "pattern", "qps", "duration", "concurrency", "method", "engine", "arrival"]
+
+def save_summary(path, stats, duration, args):
+    """
+    Save a run's statistics and settings as JSON, to serve as a baseline for `compare`.
+
+    Args:
+        path (str): The file to write.
+        stats (RunStats): The statistics of the run.
+        duration (float): The duration the run's rates are computed over, in seconds.
+        args (object): Parsed arguments; the settings in METADATA_FIELDS are recorded.
+    """
+    summary = {
+        "version": SUMMARY_VERSION,
+        "created": time.time(),
+        "metadata": {field: getattr(args, field, None) for field in METADATA_FIELDS},
+        "duration": duration,
+        "stats": stats.snapshot(),
+    }
+    with open(path, 'w') as file:
+        json.dump(summary, file)
+    print(f"Run summary saved to {path}")
+
+def save_run(args, stats, duration):
+    """
+    Save the run summary if --save_run was given.
+
+    Args:
+        args (object): Parsed arguments.
+        stats (RunStats): The statistics of the run.
+        duration (float): The duration the run's rates are computed over, in seconds.
+    """
+    path = getattr(args, 'save_run', None)
+    if path:
+        save_summary(path, stats, duration, args)
+
+def load_summary(path):
+    """
+    Load a summary written by `save_summary`.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        tuple: The summary dict and its statistics as RunStats.
+    """
+    with open(path, 'r') as file:
+        summary = json.load(file)
+    if summary.get("version") != SUMMARY_VERSION:
+        raise ValueError(f"{path} is not a run summary saved with --save_run")
+    return summary, RunStats.from_snapshot(summary["stats"])
+
+def bootstrap_percentiles(histogram, percentiles, resamples=2000, rng=None):
+    """
+    Bootstrap the sampling distribution of percentiles from a histogram.
+
+    Every resample draws as many requests as the run had, with replacement. The k-th smallest of
+    n such draws is the empirical quantile function at the k-th smallest of n uniforms, which
+    follows a Beta(k, n - k + 1) distribution; drawing that directly and looking it up in the
+    cumulative bucket counts gives exact bootstrap percentiles for all resamples at once,
+    without materializing a single resampled request.
+
+    Args:
+        histogram (LatencyHistogram): The recorded latencies.
+        percentiles (list[float]): Percentiles between 0 and 100.
+        resamples (int): Number of bootstrap resamples.
+        rng (numpy.random.Generator): The random generator.
+
+    Returns:
+        numpy.ndarray: A (resamples, len(percentiles)) array of percentile values in seconds.
+
+    Example:
+        >>> from histogram import LatencyHistogram
+        >>> histogram = LatencyHistogram()
+        >>> for value in [0.25] * 100:
+        ...     histogram.record(value)
+        >>> bootstrap_percentiles(histogram, [50, 99], 3, np.random.default_rng(0)).round(3).tolist()
+        [[0.25, 0.25], [0.25, 0.25], [0.25, 0.25]]
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    values, counts = histogram.nonzero_buckets()
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+    ranks = np.maximum(np.ceil(np.asarray(percentiles, dtype=np.float64) / 100 * total), 1)
+    quantiles = rng.beta(ranks, total - ranks + 1, size=(resamples, len(ranks)))
+    buckets = np.searchsorted(cumulative, quantiles * total)
+    return np.asarray(values)[np.minimum(buckets, len(values) - 1)]
+
+def parse_thresholds(value):
+    """
+    Parse the allowed percentile increase: one percentage for all, or per-percentile `p:percent` pairs.
+
+    Args:
+        value (str): E.g. "10" or "50:5,99:20".
+
+    Returns:
+        float or dict: The percentage, or a dict of percentile to percentage.
+
+    Example:
+        >>> parse_thresholds("50:5,99:20")
+        {50.0: 5.0, 99.0: 20.0}
+    """
+    if ":" not in value:
+        return float(value)
+    return {float(percentile): float(limit)
+            for percentile, limit in (pair.split(":") for pair in value.split(","))}
+
+def compare_runs(baseline, candidate, percentiles, max_increase, max_error_increase=1.0, confidence=0.95,
+                 resamples=2000, rng=None):
+    """
+    Compare two runs' latency percentiles and error rates with bootstrap confidence intervals.
+
+    A percentile regresses when the candidate is slower by more than its allowed increase and
+    the whole confidence interval of the change lies above zero, so noise alone cannot fail a
+    comparison; the error rate regresses on the same terms, in percentage points.
+
+    Args:
+        baseline (RunStats): The baseline run.
+        candidate (RunStats): The run to check.
+        percentiles (list[float]): Percentiles to compare.
+        max_increase (float or dict): Allowed increase in percent, for all or per percentile.
+        max_error_increase (float): Allowed error rate increase in percentage points.
+        confidence (float): Confidence level of the intervals, e.g. 0.95.
+        resamples (int): Number of bootstrap resamples.
+        rng (numpy.random.Generator): The random generator.
+
+    Returns:
+        list[dict]: One row per metric with the baseline and candidate values, the relative
+                    change and its interval, the threshold and whether it regressed.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    tail = (1 - confidence) / 2 * 100
+    rows = []
+
+    if baseline.latency.count and candidate.latency.count:
+        before = bootstrap_percentiles(baseline.latency, percentiles, resamples, rng)
+        after = bootstrap_percentiles(candidate.latency, percentiles, resamples, rng)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changes = (after - before) / before * 100
+        low, high = np.nanpercentile(changes, [tail, 100 - tail], axis=0)
+        base_values = baseline.latency.percentiles(percentiles)
+        new_values = candidate.latency.percentiles(percentiles)
+        for column, percentile in enumerate(percentiles):
+            limit = max_increase.get(percentile, math.inf) if isinstance(max_increase, dict) else max_increase
+            change = (new_values[column] - base_values[column]) / base_values[column] * 100 \
+                if base_values[column] else 0.0
+            rows.append({
+                "metric": f"p{percentile:g}",
+                "baseline": base_values[column],
+                "candidate": new_values[column],
+                "change": change,
+                "low": float(low[column]),
+                "high": float(high[column]),
+                "limit": limit,
+                "regressed": change > limit and low[column] > 0,
+            })
+
+    # Error rates: binomial resampling of each run's error count
+    before_rate = _error_rates(baseline, resamples, rng)
+    after_rate = _error_rates(candidate, resamples, rng)
+    low, high = np.percentile(after_rate - before_rate, [tail, 100 - tail])
+    change = _error_rate(candidate) - _error_rate(baseline)
+    rows.append({
+        "metric": "error rate",
+        "baseline": _error_rate(baseline),
+        "candidate": _error_rate(candidate),
+        "change": change,
+        "low": float(low),
+        "high": float(high),
+        "limit": max_error_increase,
+        "regressed": change > max_error_increase and low > 0,
+    })
+    return rows
+
+def _error_rate(stats):
+    return stats.error_count / stats.latency.count * 100 if stats.latency.count else 0.0
+
+def _error_rates(stats, resamples, rng):
+    requests = stats.latency.count
+    if not requests:
+        return np.zeros(resamples)
+    return rng.binomial(requests, stats.error_count / requests, size=resamples) / requests * 100
+
+def display_comparison(baseline_summary, candidate_summary, rows, confidence):
+    """
+    Print a comparison and its verdict.
+
+    Args:
+        baseline_summary (dict): The baseline summary, for its metadata.
+        candidate_summary (dict): The candidate summary, for its metadata.
+        rows (list[dict]): The rows returned by `compare_runs`.
+        confidence (float): The confidence level of the intervals.
+
+    Returns:
+        bool: True if nothing regressed.
+    """
+    differences = [field for field in METADATA_FIELDS
+                   if baseline_summary["metadata"].get(field) != candidate_summary["metadata"].get(field)]
+    if differences:
+        print("Note: the runs differ in " + ", ".join(
+            f"{field} ({baseline_summary['metadata'].get(field)} -> {candidate_summary['metadata'].get(field)})"
+            for field in differences))
+    base_stats = baseline_summary["stats"]["latency"]["count"], baseline_summary["duration"]
+    new_stats = candidate_summary["stats"]["latency"]["count"], candidate_summary["duration"]
+    print("-------- Comparison --------")
+    print(f"Requests: {base_stats[0]} -> {new_stats[0]}")
+    print(f"Requests Per Second: {base_stats[0] / base_stats[1]:.2f} -> {new_stats[0] / new_stats[1]:.2f}")
+    print(f"{'metric':>10} {'baseline':>10} {'candidate':>10} {'change':>9} {f'{confidence * 100:g}% CI':>19} "
+          f"{'limit':>7}  verdict")
+    for row in rows:
+        if row["metric"] == "error rate":
+            values = f"{row['baseline']:>9.2f}% {row['candidate']:>9.2f}% {row['change']:>+7.2f}pp"
+            interval = f"[{row['low']:+.2f}, {row['high']:+.2f}]pp"
+            limit = f"{row['limit']:g}pp"
+        else:
+            values = f"{row['baseline']:>9.4f}s {row['candidate']:>9.4f}s {row['change']:>+8.1f}%"
+            interval = f"[{row['low']:+.1f}, {row['high']:+.1f}]%"
+            limit = f"{row['limit']:g}%" if math.isfinite(row["limit"]) else "-"
+        print(f"{row['metric']:>10} {values} {interval:>19} {limit:>7}  {'REGRESSED' if row['regressed'] else 'ok'}")
+    regressions = [row["metric"] for row in rows if row["regressed"]]
+    if regressions:
+        print(f"Verdict: FAIL, {', '.join(regressions)} regressed beyond the allowed limits")
+    else:
+        print("Verdict: PASS")
+    return not regressions
+
+def run_compare(args):
+    """
+    Entry point of the `compare` command.
+
+    Args:
+        args (object): Parsed arguments with baseline, candidate, percentiles, max_increase,
+                       max_error_increase, confidence, resamples and seed.
+
+    Returns:
+        int: The exit status, 1 if the candidate regressed.
+    """
+    baseline_summary, baseline = load_summary(args.baseline)
+    candidate_summary, candidate = load_summary(args.candidate)
+    rows = compare_runs(baseline, candidate, args.percentiles, args.max_increase, args.max_error_increase,
+                        args.confidence, args.resamples, np.random.default_rng(args.seed))
+    return 0 if display_comparison(baseline_summary, candidate_summary, rows, args.confidence) else 1
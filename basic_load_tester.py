@@ -1,100 +1,226 @@
-import requests
+import math
 import threading
 import time
-from queue import Queue
 from argparse import ArgumentParser
+import requests
+from requests.adapters import HTTPAdapter
+from http_client import CHECKSUMS, build_request_template
+from stats import RunStats
+from utils import calculate_and_display_results
+
+CHUNK_SIZE = 64 * 1024  # Bytes read at a time while draining a response body
+MAX_WAIT = 0.1  # Longest a token is reserved ahead; beyond that the rate may change before it is due
 
-def send_request(url, results):
+class TokenBucket:
     """
-    Send a GET request to the specified URL and store the result in the results queue.
+    Token bucket pacer shared by all threads of a run.
+
+    Every request reserves a token and is told how long to wait for it; tokens may be reserved
+    ahead of time, so waiting threads are released at the bucket's rate rather than all at once.
+    A token due later than `max_wait` is not reserved, since the rate may have changed by then;
+    the caller checks back instead, which keeps profiles that start at or dip to a rate of 0
+    sending once the rate picks up again. The lock is only held to update two numbers, never
+    while a thread waits.
 
     Args:
-        url (str): The URL to send the request to.
-        results (Queue): The queue to store the result in.
+        rate (float or callable): Tokens per second, or a function of the seconds since `start`
+                                  returning it, such as a `load_patterns.RateProfile`.
+        burst (int): How many tokens can build up while every thread is busy.
+        start (float): The `perf_counter` time the run started at; defaults to now.
+
+    Example:
+        >>> bucket = TokenBucket(10, burst=1, start=0.0)
+        >>> [round(bucket.reserve(now=0.0), 3) for _ in range(3)]
+        [0.0, 0.1, 0.2]
+
+        A ramp from 0 QPS: nothing is due at first, then tokens come at the rising rate.
+
+        >>> bucket = TokenBucket(lambda elapsed: 10 * elapsed, burst=1, start=0.0)
+        >>> [bucket.reserve(now=now, max_wait=0.1) for now in (0.0, 0.0, 0.05, 0.5, 0.55)]
+        [0.0, None, None, 0.0, None]
+        >>> round(bucket.reserve(now=0.65, max_wait=0.1), 3)
+        0.012
+    """
+
+    def __init__(self, rate, burst=1, start=None):
+        self.rate = rate if callable(rate) else (lambda elapsed: rate)
+        self.burst = burst
+        self.start = time.perf_counter() if start is None else start
+        self._tokens = float(burst)
+        self._updated = self.start
+        self._lock = threading.Lock()
+
+    def reserve(self, now=None, max_wait=math.inf):
+        """
+        Reserve the next token, unless it is due more than `max_wait` seconds from now at the current rate.
+
+        Args:
+            now (float): The current `perf_counter` time; read from the clock if omitted.
+            max_wait (float): The longest wait a token is reserved for.
+
+        Returns:
+            float or None: Seconds to wait before the token is due, 0 if one was available, or None
+                           if none was reserved and the caller should check back later.
+        """
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            rate = self.rate(now - self.start)
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            wait = (1 - self._tokens) / rate if rate > 0 else math.inf
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+def create_session():
+    """
+    Create a requests session that keeps a single connection alive, for the exclusive use of one thread.
 
     Returns:
-        None
+        requests.Session: The session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def send_request(session, template, stats, timeout=None):
     """
-    start_time = time.time()
+    Send a request, drain its body in chunks and record the outcome into the thread's statistics.
+
+    Args:
+        session (requests.Session): The calling thread's session.
+        template (RequestTemplate): The request to send, see `http_client.build_request_template`.
+        stats (RunStats): The calling thread's statistics.
+        timeout (float): Seconds to wait for the connection and for each read from it; None waits forever.
+
+    Returns:
+        tuple: The elapsed time in seconds and the response status (or error message).
+    """
+    expect = template.expect
+    start_time = time.perf_counter()
     try:
-        response = requests.get(url)
-        elapsed_time = time.time() - start_time
-        if response.status_code == 200:
-            results.put((elapsed_time, None))
-        else:
-            results.put((elapsed_time, f"Error: Status {response.status_code}"))
+        with session.request(template.method, template.url, data=template.body, headers=template.headers,
+                             stream=True, timeout=timeout) as response:
+            headers_at = time.perf_counter()
+            size = 0
+            update, checksum = CHECKSUMS[expect.checksum] if expect and expect.checksum else (None, None)
+            for chunk in response.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if update:
+                    checksum = update(chunk, checksum)
+            end_time = time.perf_counter()
+        stats.ttfb.record(response.elapsed.total_seconds())
+        stats.body_time.record(end_time - headers_at)
+        stats.bytes_received += size
+        status = response.status_code
+        if expect is not None and status < 400:
+            status = expect.failure(size, checksum) or status
+        elapsed_time = end_time - start_time
     except Exception as e:
-        elapsed_time = time.time() - start_time
-        results.put((elapsed_time, str(e)))
+        elapsed_time = time.perf_counter() - start_time
+        status = str(e)
+    stats.record(elapsed_time, status)
+    return elapsed_time, status
 
-def worker(url, qps, duration, results):
+def worker(template, bucket, stop_time, stats, timeout=None):
     """
-    Worker function that sends requests to the specified URL at a specified rate.
+    Send requests paced by the shared token bucket until the run is over.
 
     Args:
-        url (str): The URL to send requests to.
-        qps (int): The number of queries per second.
-        duration (int): The duration of the test in seconds.
-        results (Queue): The queue to store the results in.
+        template (RequestTemplate): The request to send.
+        bucket (TokenBucket): The shared pacer.
+        stop_time (float): The `perf_counter` time at which no new request is started.
+        stats (RunStats): The statistics of this thread, merged with the others at the end.
+        timeout (float): Request timeout, see `send_request`.
+    """
+    session = create_session()
+    try:
+        while True:
+            now = time.perf_counter()
+            if now >= stop_time:
+                return
+            wait = bucket.reserve(now, MAX_WAIT)
+            if wait is None:
+                # Too little rate right now; look again shortly rather than giving up
+                time.sleep(min(MAX_WAIT, stop_time - now))
+                continue
+            if now + wait >= stop_time:
+                return
+            if wait > 0:
+                time.sleep(wait)
+            send_request(session, template, stats, timeout)
+    finally:
+        session.close()
+
+def run_threaded_test(url, qps, duration, threads=10, method="GET", data=None, precision=3, expect=None,
+                      timeout=None):
+    """
+    Run a load test from a pool of threads, each with its own pooled `requests.Session`.
+
+    Threads take turns through a shared token bucket, so the offered rate holds as long as
+    enough threads are free; each records into its own statistics, which are merged once all
+    threads have finished, so recording needs no locking.
+
+    Args:
+        url (str): The URL to test.
+        qps (float or callable): The target queries per second, or a function of the elapsed time
+                                 returning it, such as a `load_patterns.RateProfile`.
+        duration (float): The duration of the test in seconds.
+        threads (int): The number of threads, and so the maximum number of concurrent requests.
+        method (str): The HTTP method to use.
+        data (dict): Optional JSON data to send with each request.
+        precision (int): Significant figures kept by the latency histograms.
+        expect (http_client.ResponseCheck): Optional size or checksum every successful body must match.
+        timeout (float): Seconds to wait for the connection and for each read from it; None waits forever.
 
     Returns:
-        None
+        RunStats: The merged statistics of all threads.
     """
-    interval = 1 / qps
-    next_time = time.time() + interval
-    stop_time = time.time() + duration
-    while time.time() < stop_time:
-        send_request(url, results)
-        next_time += interval
-        sleep_time = next_time - time.time()
-        if sleep_time > 0:
-            time.sleep(sleep_time) 
-
-def main(url, qps, duration):
+    template = build_request_template(url, method, data, expect=expect)
+    thread_stats = [RunStats(precision) for _ in range(threads)]
+    start_time = time.perf_counter()
+    bucket = TokenBucket(qps, start=start_time)
+    stop_time = start_time + duration
+    pool = [threading.Thread(target=worker, args=(template, bucket, stop_time, stats, timeout), daemon=True)
+            for stats in thread_stats]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    merged = RunStats(precision)
+    for stats in thread_stats:
+        merged.merge(stats)
+    return merged
+
+def main(url, qps, duration, threads=10):
     """
     Main function that runs the load test.
 
     Args:
         url (str): The URL to test.
-        qps (int): The number of queries per second.
+        qps (float): The number of queries per second.
         duration (int): The duration of the test in seconds.
+        threads (int): The number of threads sending requests.
 
     Returns:
         None
     """
-    results = Queue()
-    thread = threading.Thread(target=worker, args=(url, qps, duration, results))
-    thread.start()
-    thread.join()
-
-    total_requests = 0
-    total_time = 0
-    errors = 0
-
-    while not results.empty():
-        elapsed_time, error = results.get()
-        total_requests += 1
-        total_time += elapsed_time
-        if error:
-            errors += 1
-    
-    if total_requests == 0:  # Added check for division by zero
-        avg_latency = 0
-    else:
-        avg_latency = total_time / total_requests
-    print(f"Total Requests: {total_requests}")
-    print(f"Average Latency: {avg_latency:.2f} seconds")
-    if total_requests == 0:  # Added check for division by zero
-        error_rate = 0
-    else:
-        error_rate = errors / total_requests * 100
-    print(f"Error Rate: {error_rate:.2f}%")
+    stats = run_threaded_test(url, qps, duration, threads)
+    calculate_and_display_results(stats, duration)
 
 if __name__ == "__main__":
     parser = ArgumentParser(description="HTTP Load Tester")
     parser.add_argument("url", type=str, help="URL to test")
-    parser.add_argument("--qps", type=int, default=1, help="Queries per second")
+    parser.add_argument("--qps", type=float, default=1, help="Queries per second")
     parser.add_argument("--duration", type=int, default=10, help="Duration of test in seconds")
+    parser.add_argument("--threads", type=int, default=10, help="Number of threads sending requests")
     args = parser.parse_args()
-    
-    main(args.url, args.qps, args.duration)
+
+    main(args.url, args.qps, args.duration, args.threads)
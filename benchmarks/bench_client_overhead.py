@@ -0,0 +1,96 @@
+"""
+Microbenchmark of the client-side cost of sending one request.
+
+Runs the same POST workload through the old hot path (headers dict and `json.dumps` rebuilt
+on every call, `json=` re-serialized by aiohttp, a formatted `print` per request) and through
+the current one (pre-encoded `RequestTemplate`, raw `data=` body, sampled logging), and reports
+client CPU time per request for each. The target server runs in a separate process so its
+work is not counted.
+
+Usage:
+    python benchmarks/bench_client_overhead.py --requests 20000 --concurrency 50
+"""
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from async_worker import worker
+from http_client import build_request_template
+from stats import RunStats
+from target_server import serve
+
+PAYLOAD = {"user": "load-tester", "items": list(range(20)), "note": "x" * 64}
+
+async def legacy_send_request(url, session, method="GET", data=None):
+    # The hot path as it was before request templates
+    start_time = time.time()
+    try:
+        headers = {'Content-Type': 'application/json'} if data else {}
+        json_data = json.dumps(data) if data else None
+        async with session.request(method, url, json=data, headers=headers) as response:
+            elapsed_time = time.time() - start_time
+            return elapsed_time, response.status
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        return elapsed_time, str(e)
+
+async def legacy_worker(url, session, method, semaphore, stats, data=None):
+    async with semaphore:
+        response_time, status = await legacy_send_request(url, session, method=method, data=data)
+        print(f"Request completed in {response_time} seconds with status {status}")
+        stats.record(response_time, status)
+
+async def run_engine(name, url, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = RunStats()
+    template = build_request_template(url, "POST", PAYLOAD)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        if name == "legacy":
+            # Printing to a terminal would cost even more; a buffer keeps only the formatting cost
+            with redirect_stdout(io.StringIO()):
+                await asyncio.gather(*(legacy_worker(url, session, "POST", semaphore, stats, PAYLOAD)
+                                       for _ in range(requests)))
+        else:
+            await asyncio.gather(*(worker(template, session, semaphore, stats) for _ in range(requests)))
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+    return cpu / requests, requests / wall, stats.error_count
+
+def main():
+    parser = ArgumentParser(description="Client-side overhead per request, before and after request templates")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per engine")
+    parser.add_argument("--concurrency", type=int, default=50, help="Maximum number of concurrent requests")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the local target server")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    server = context.Process(target=serve, args=(args.port,), kwargs={"ready": ready}, daemon=True)
+    server.start()
+    ready.wait(30)
+    url = f"http://127.0.0.1:{args.port}/"
+
+    try:
+        results = {}
+        for name in ["legacy", "template"]:
+            results[name] = asyncio.run(run_engine(name, url, args.requests, args.concurrency))
+            cpu, rps, errors = results[name]
+            print(f"{name:>8}: {cpu * 1e6:8.1f} us client CPU/request, {rps:8.0f} req/s, {errors} errors")
+        saved = results["legacy"][0] - results["template"][0]
+        print(f"Saved: {saved * 1e6:.1f} us/request ({saved / results['legacy'][0] * 100:.1f}%)")
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Self-benchmark of the load generator's own ceiling.
+
+Starts the bundled target server (`target_server.py`) in a separate process with a fixed
+response delay and size, then drives it with each engine at rising rates: the async engine
+behind `main.py` (`load_tester.execute_load_test`), the same with the raw asyncio protocol client
+(`raw_client.py`) and the thread pool in `basic_load_tester.py`.
+For every step it reports achieved vs offered QPS, client CPU time per request and the latency
+added on top of the server's delay. An engine stops climbing once it can no longer deliver the
+offered rate, and its ceiling is the highest rate it kept up with.
+
+Results can be saved and later checked against, so hot path regressions show up as numbers in CI.
+Record the baseline on the same kind of machine the check runs on.
+
+Usage:
+    python benchmarks/self_benchmark.py --rates 100,500,1000,2000 --duration 5
+    python benchmarks/self_benchmark.py --save baseline.json
+    python benchmarks/self_benchmark.py --baseline baseline.json --tolerance 20
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from basic_load_tester import run_threaded_test
+from load_patterns import RateProfile
+from load_tester import execute_load_test
+from raw_client import run
+from stats import RunStats
+from target_server import serve
+
+ENGINES = ["async", "raw", "threaded"]
+KEEP_UP_RATIO = 0.95  # An engine keeps up while it delivers at least this share of the offered rate
+
+def summarize(engine, rate, latency, errors, cpu, wall, delay, dispatch_lag=None):
+    """
+    Reduce one benchmark step to a JSON-serializable result.
+
+    Args:
+        engine (str): The engine that ran the step.
+        rate (float): The offered QPS.
+        latency (LatencyHistogram): Client-observed response times.
+        errors (int): Number of failed requests.
+        cpu (float): Client CPU seconds spent on the step.
+        wall (float): Wall-clock seconds spent on the step.
+        delay (float): The server's fixed response delay, subtracted to get the added latency.
+        dispatch_lag (LatencyHistogram): Optional dispatch lag of an open-loop engine.
+
+    Returns:
+        dict: The step's result.
+    """
+    requests = latency.count
+    p50, p99 = latency.percentiles([50, 99])
+    achieved = requests / wall if wall > 0 else 0.0
+    return {
+        "engine": engine,
+        "offered": rate,
+        "achieved": achieved,
+        "requests": requests,
+        "errors": errors,
+        "cpu_per_request": cpu / requests if requests else None,
+        "added_p50": max(p50 - delay, 0.0),
+        "added_p99": max(p99 - delay, 0.0),
+        "lag_p99": dispatch_lag.percentile(99) if dispatch_lag is not None else None,
+        "kept_up": requests > 0 and errors == 0 and achieved >= rate * KEEP_UP_RATIO,
+    }
+
+async def _run_async(url, rate, duration, concurrency, engine="async"):
+    stats = RunStats()
+    semaphore = asyncio.Semaphore(concurrency)
+    await execute_load_test(url, RateProfile("steady", duration, qps=rate), rate, duration, concurrency,
+                            semaphore, "GET", stats=stats, show_progress=False,
+                            session_options={"pool_size": concurrency}, engine=engine)
+    return stats
+
+def run_async_step(url, rate, duration, concurrency, delay, engine="async"):
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    stats = (run if engine == "raw" else asyncio.run)(_run_async(url, rate, duration, concurrency, engine))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return summarize(engine, rate, stats.latency, stats.error_count, cpu, wall, delay, stats.dispatch_lag)
+
+def run_raw_step(url, rate, duration, concurrency, delay):
+    return run_async_step(url, rate, duration, concurrency, delay, engine="raw")
+
+def run_threaded_step(url, rate, duration, concurrency, delay):
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    stats = run_threaded_test(url, rate, duration, concurrency)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return summarize("threaded", rate, stats.latency, stats.error_count, cpu, wall, delay)
+
+STEP_RUNNERS = {"async": run_async_step, "raw": run_raw_step, "threaded": run_threaded_step}
+
+def ceilings(results):
+    """
+    Find the highest offered rate each engine kept up with.
+
+    Args:
+        results (list[dict]): Step results, as returned by `summarize`.
+
+    Returns:
+        dict: Engine name to its ceiling in QPS, 0 if it never kept up.
+
+    Example:
+        >>> ceilings([{"engine": "async", "offered": 100, "kept_up": True},
+        ...           {"engine": "async", "offered": 200, "kept_up": False}])
+        {'async': 100}
+    """
+    best = {}
+    for result in results:
+        best.setdefault(result["engine"], 0)
+        if result["kept_up"]:
+            best[result["engine"]] = max(best[result["engine"]], result["offered"])
+    return best
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    List the regressions of a benchmark run against a saved baseline.
+
+    A step regresses when its client CPU per request grew, or its achieved QPS shrank, by
+    more than `tolerance` percent; an engine regresses when it no longer keeps up with the
+    rate that was its ceiling in the baseline.
+
+    Args:
+        results (list[dict]): Step results of this run.
+        baseline (dict): A previously saved run, with `results` and `ceilings`.
+        tolerance (float): Allowed slack in percent.
+
+    Returns:
+        list[str]: One line per regression; empty when the run is within tolerance.
+    """
+    slack = tolerance / 100
+    previous = {(result["engine"], result["offered"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["engine"], result["offered"]))
+        if before is None:
+            continue
+        step = f"{result['engine']} @ {result['offered']:g} QPS"
+        if before["cpu_per_request"] and result["cpu_per_request"] and \
+                result["cpu_per_request"] > before["cpu_per_request"] * (1 + slack):
+            regressions.append(f"{step}: CPU/request {before['cpu_per_request'] * 1e6:.1f} -> "
+                               f"{result['cpu_per_request'] * 1e6:.1f} us")
+        if result["achieved"] < before["achieved"] * (1 - slack):
+            regressions.append(f"{step}: achieved {before['achieved']:.1f} -> {result['achieved']:.1f} QPS")
+    tested = {(result["engine"], result["offered"]) for result in results}
+    for engine, ceiling in ceilings(results).items():
+        # Only comparable when this run offered the rate the baseline topped out at
+        if (engine, baseline["ceilings"].get(engine)) in tested and ceiling < baseline["ceilings"][engine]:
+            regressions.append(f"{engine}: ceiling {baseline['ceilings'][engine]:g} -> {ceiling:g} QPS")
+    return regressions
+
+def _format(value, scale=1.0):
+    return "-" if value is None else f"{value * scale:.1f}"
+
+def print_result(result):
+    print(f"{result['engine']:>9} {result['offered']:>8g} {result['achieved']:>9.1f} "
+          f"{result['achieved'] / result['offered'] * 100:>6.1f}% {_format(result['cpu_per_request'], 1e6):>9} "
+          f"{_format(result['added_p50'], 1e3):>8} {_format(result['added_p99'], 1e3):>8} "
+          f"{_format(result['lag_p99'], 1e3):>8} {result['errors']:>7}")
+
+def main():
+    parser = ArgumentParser(description="Measure the load generator's own ceiling against a local target")
+    parser.add_argument("--rates", type=str, default="100,250,500,1000,2000,4000",
+                        help="Comma-separated offered rates in QPS, in increasing order")
+    parser.add_argument("--duration", type=float, default=5, help="Duration of each step in seconds")
+    parser.add_argument("--engines", type=str, default=",".join(ENGINES), help="Comma-separated engines to run")
+    parser.add_argument("--concurrency", type=int, default=200, help="Concurrency limit of the async and raw engines")
+    parser.add_argument("--threads", type=int, default=32, help="Thread pool size of the threaded engine")
+    parser.add_argument("--delay", type=float, default=0.001, help="Target server response delay in seconds")
+    parser.add_argument("--size", type=int, default=64, help="Target server response size in bytes")
+    parser.add_argument("--port", type=int, default=8766, help="Port for the local target server")
+    parser.add_argument("--save", type=str, default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="JSON file saved by an earlier run; exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="Allowed regression against the baseline, in percent")
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(",")]
+    engines = [engine for engine in args.engines.split(",") if engine]
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"unknown engines: {', '.join(sorted(unknown))}")
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    server = context.Process(target=serve, args=(args.port, args.delay, args.size), kwargs={"ready": ready},
+                             daemon=True)
+    server.start()
+    if not ready.wait(30):
+        server.terminate()
+        sys.exit("Target server did not start")
+    url = f"http://127.0.0.1:{args.port}/"
+
+    print(f"Target: {url} ({args.delay * 1e3:g} ms delay, {args.size} byte responses), {args.duration:g}s per step")
+    print(f"{'engine':>9} {'offered':>8} {'achieved':>9} {'ratio':>7} {'CPU/req':>9} "
+          f"{'+p50 ms':>8} {'+p99 ms':>8} {'lag p99':>8} {'errors':>7}")
+    results = []
+    try:
+        for engine in engines:
+            concurrency = args.threads if engine == "threaded" else args.concurrency
+            for rate in rates:
+                result = STEP_RUNNERS[engine](url, rate, args.duration, concurrency, args.delay)
+                results.append(result)
+                print_result(result)
+                if not result["kept_up"]:
+                    break
+    finally:
+        server.terminate()
+
+    print("-------- Generator ceiling --------")
+    best = ceilings(results)
+    for engine, ceiling in best.items():
+        print(f"{engine}: {ceiling:g} QPS" if ceiling else f"{engine}: did not keep up with {rates[0]:g} QPS")
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({"settings": {"duration": args.duration, "concurrency": args.concurrency,
+                                    "delay": args.delay, "size": args.size},
+                       "results": results, "ceilings": best}, file, indent=2)
+        print(f"Saved results to {args.save}")
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare_to_baseline(results, json.load(file), args.tolerance)
+        print("-------- Baseline check --------")
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"Within {args.tolerance:g}% of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,189 @@
 import asyncio
 import json
+import os
+import sys
+import time
 from argparse import ArgumentParser
+from types import SimpleNamespace
 
-async def handle_worker(reader, writer, config):
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from baseline import save_summary
+from load_patterns import profile_from_args
+from protocol import read_message, send_message
+from stats import RunStats
+from utils import calculate_and_display_results, display_process_breakdown
+
+def plan_assignments(config, workers, start_delay):
     """
-    Handle incoming messages from a worker node.
+    Split one load test configuration across several workers.
 
-    This function reads messages from the worker, processes them, and sends a response back.
-    If the worker sends a 'READY' message, it sends the configuration to the worker and closes the connection.
+    Every worker offers an equal share of the global rate profile, phase-shifted so their
+    requests interleave, and an equal share of the concurrency budget. Every worker gets the
+    same wall-clock start time.
 
     Args:
-        reader (asyncio.StreamReader): The reader object for the incoming connection.
-        writer (asyncio.StreamWriter): The writer object for the outgoing connection.
-        config (dict): The configuration to send to the worker.
+        config (dict): The load test configuration (url, qps, duration, concurrency and args).
+        workers (int): The number of workers to split the load across.
+        start_delay (float): Seconds from now until the synchronized start.
+
+    Returns:
+        list[dict]: One START message per worker.
+
+    Example:
+        >>> config = {"url": "http://example.com", "qps": 5, "duration": 2, "concurrency": 3, "args": {}}
+        >>> [(assignment["profile"]["scale"], assignment["phase"]) for assignment in plan_assignments(config, 2, 0)]
+        [(0.5, 0.0), (0.5, 0.5)]
     """
-    while True:
-        data = await reader.read(1024)
-        if not data:
-            break
-        message = json.loads(data.decode())
-        print(f"Received from worker: {message['status']}")
-
-        if message['status'] == 'READY':
-            # Send the configuration to the worker
-            writer.write(json.dumps({"command": "START", "params": config}).encode())
-            await writer.drain()
-            print("Configuration sent, closing connection.")
-            writer.close()
-            return  # Close this handler to prevent handling further messages from the same worker
+    args = SimpleNamespace(**config.get("args", {}))
+    concurrency = config["concurrency"]
+    share = profile_from_args(args, config["qps"], config["duration"]).scaled(1 / workers).to_dict()
+    start_at = time.time() + start_delay
+    return [
+        {
+            "type": "START",
+            "index": index,
+            "workers": workers,
+            "url": config["url"],
+            "profile": share,
+            "phase": index / workers,
+            "concurrency": max(1, concurrency // workers + (1 if index < concurrency % workers else 0)),
+            "args": config.get("args", {}),
+            "start_at": start_at,
+        }
+        for index in range(workers)
+    ]
+
+def merge_snapshots(snapshots):
+    """
+    Merge the latest statistics of every worker into one cluster-wide view.
+
+    Args:
+        snapshots (dict): Worker index to RunStats.
 
-async def run_master(host, port, configs):
+    Returns:
+        RunStats: The merged statistics.
     """
-    Run the master node that accepts incoming connections from worker nodes.
+    statistics = list(snapshots.values())
+    merged = RunStats(statistics[0].latency.significant_figures if statistics else 3)
+    for stats in statistics:
+        merged.merge(stats)
+    return merged
+
+async def report_live(snapshots, done, start_at, interval=1.0):
+    """
+    Print cluster-wide throughput, latency and errors once per interval until the run is done.
+
+    Args:
+        snapshots (dict): Worker index to latest RunStats, updated as workers report in.
+        done (asyncio.Event): Set once every worker has finished.
+        start_at (float): The wall-clock time the workers start at.
+        interval (float): Seconds between reports.
+    """
+    await asyncio.sleep(max(0, start_at - time.time()))
+    previous_time = time.time()
+    previous_count = 0
+    while not done.is_set():
+        try:
+            await asyncio.wait_for(done.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        now = time.time()
+        merged = merge_snapshots(snapshots)
+        count = merged.latency.count
+        p50, p99 = merged.latency.percentiles([50, 99])
+        print(f"[{now - start_at:6.1f}s] workers {len(snapshots)} | requests {count} | "
+              f"{(count - previous_count) / max(now - previous_time, 1e-9):8.1f} req/s | "
+              f"p50 {p50:.4f}s | p99 {p99:.4f}s | errors {merged.error_count}")
+        previous_time, previous_count = now, count
+
+async def run_master(host, port, config, workers, start_delay=3.0, save_path=None):
+    """
+    Run the master node: wait for workers to register, start them together and aggregate their results.
+
+    Workers stream cumulative statistics snapshots every second; the master keeps the latest one
+    per worker, prints a merged cluster-wide line every second and a full report at the end.
 
     Args:
         host (str): The host to bind to.
         port (int): The port to listen on.
-        configs (list[dict]): A list of configurations to send to worker nodes.
+        config (dict): The load test configuration whose load is split across the workers.
+        workers (int): The number of workers to wait for before starting.
+        start_delay (float): Seconds between the last registration and the synchronized start.
+        save_path (str): Save the merged run summary to this file, as a baseline for `main.py compare`.
+
+    Returns:
+        RunStats: The merged statistics of the whole cluster.
 
     Example:
-        >>> configs = [{'concurrency': 10, 'duration': 60}, {'concurrency': 20, 'duration': 30}]
-        >>> asyncio.run(run_master('localhost', 8888, configs))
+        >>> config = {'url': 'http://example.com', 'qps': 100, 'duration': 60, 'concurrency': 20, 'args': {}}
+        >>> asyncio.run(run_master('localhost', 8888, config, workers=2))  # doctest: +SKIP
     """
-    async def start_server_callback(reader, writer):
-        # Assign each worker a unique configuration from the list, remove it once assigned
-        if configs:
-            config = configs.pop(0)
-            await handle_worker(reader, writer, config)
-        else:
-            print("No more configurations available.")
+    connections = []
+    assignments = []
+    registered = asyncio.Event()
+    done = asyncio.Event()
+    snapshots = {}
+    finished = {}
+    failures = []
+
+    def finish(index):
+        finished.setdefault(index, None)
+        if len(finished) == workers:
+            done.set()
+
+    async def handle_worker(reader, writer):
+        message = await read_message(reader)
+        if not message or message.get("type") != "REGISTER" or registered.is_set():
+            await send_message(writer, {"type": "REJECTED", "reason": "run already started or bad handshake"})
+            writer.close()
+            return
+
+        index = len(connections)
+        connections.append(writer)
+        await send_message(writer, {"type": "REGISTERED", "index": index, "workers": workers})
+        print(f"Worker {index} registered from {message.get('hostname', 'unknown')} ({len(connections)}/{workers})")
+        if len(connections) == workers:
+            assignments.extend(plan_assignments(config, workers, start_delay))
+            registered.set()
+        await registered.wait()
+        await send_message(writer, assignments[index])
+
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    raise ConnectionError("connection closed before the run finished")
+                if message["type"] in ("STATS", "DONE"):
+                    snapshots[index] = RunStats.from_snapshot(message["stats"])
+                if message["type"] == "DONE":
+                    finished[index] = message["elapsed"]
+                    break
+                if message["type"] == "ERROR":
+                    raise RuntimeError(message["error"])
+        except Exception as e:
+            failures.append(f"worker {index}: {e}")
+        finally:
+            finish(index)
             writer.close()
 
-    server = await asyncio.start_server(start_server_callback, host, port)
-    print(f"Master running on {host}:{port}")
+    server = await asyncio.start_server(handle_worker, host, port)
+    print(f"Master running on {host}:{port}, waiting for {workers} worker(s)")
     async with server:
-        await server.serve_forever()
+        await registered.wait()
+        print(f"Starting {workers} worker(s) at {time.ctime(assignments[0]['start_at'])} "
+              f"against {config['url']} at {config['qps']} QPS")
+        await report_live(snapshots, done, assignments[0]['start_at'])
+
+    merged = merge_snapshots(snapshots)
+    calculate_and_display_results(merged, config["duration"])
+    display_process_breakdown([(index, snapshots[index], elapsed) for index, elapsed in sorted(finished.items())
+                               if elapsed is not None], title="Per-worker throughput", label="Worker")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if save_path:
+        settings = {field: config[field] for field in ("url", "qps", "duration", "concurrency")}
+        save_summary(save_path, merged, config["duration"], SimpleNamespace(**{**config.get("args", {}), **settings}))
+    return merged
 
 def load_configurations(file_path):
     """
@@ -75,7 +204,14 @@ if __name__ == "__main__":
     parser.add_argument('--host', type=str, default='0.0.0.0', help="Host for the master to bind")
     parser.add_argument('--port', type=int, default=8888, help="Port for the master to listen on")
     parser.add_argument('--config', type=str, default='config.json', help="Path to configuration file")
+    parser.add_argument('--target', type=int, default=0, help="Index of the configuration to run from the file")
+    parser.add_argument('--workers', type=int, default=1, help="Number of workers to split the load across")
+    parser.add_argument('--start-delay', type=float, default=3.0,
+                        help="Seconds between the last worker registering and the synchronized start")
+    parser.add_argument('--save-run', type=str, default=None,
+                        help="Save the merged run summary to this JSON file, as a baseline for `main.py compare`")
     args = parser.parse_args()
 
     configurations = load_configurations(args.config)
-    asyncio.run(run_master(args.host, args.port, configurations))
+    asyncio.run(run_master(args.host, args.port, configurations[args.target], args.workers, args.start_delay,
+                           args.save_run))
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import struct
+
+# Every message is a JSON object preceded by its length as a 4-byte big-endian unsigned integer,
+# so messages of any size arrive whole regardless of how TCP splits them
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+async def send_message(writer, message):
+    """
+    Send one length-prefixed JSON message.
+
+    Args:
+        writer (asyncio.StreamWriter): The writer of the connection.
+        message (dict): The message to send.
+    """
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    writer.write(HEADER.pack(len(payload)) + payload)
+    await writer.drain()
+
+async def read_message(reader):
+    """
+    Read one length-prefixed JSON message.
+
+    Args:
+        reader (asyncio.StreamReader): The reader of the connection.
+
+    Returns:
+        dict or None: The message, or None if the connection was closed cleanly between messages.
+
+    Example:
+        >>> class Writer:
+        ...     data = b""
+        ...     def write(self, data):
+        ...         self.data += data
+        ...     async def drain(self):
+        ...         pass
+        >>> async def round_trip(data, count):
+        ...     reader = asyncio.StreamReader()
+        ...     for start in range(0, len(data), 3):
+        ...         reader.feed_data(data[start:start + 3])  # However TCP splits it
+        ...     reader.feed_eof()
+        ...     return [await read_message(reader) for _ in range(count)]
+        >>> writer = Writer()
+        >>> asyncio.run(send_message(writer, {"type": "stats", "latency": [0.25, 1]}))
+        >>> asyncio.run(send_message(writer, {"type": "done"}))
+        >>> asyncio.run(round_trip(writer.data, 3))
+        [{'type': 'stats', 'latency': [0.25, 1]}, {'type': 'done'}, None]
+        >>> asyncio.run(round_trip(HEADER.pack(MAX_MESSAGE_SIZE + 1), 1))
+        Traceback (most recent call last):
+        ...
+        ValueError: Message of 67108865 bytes exceeds the 67108864 byte limit
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    (length,) = HEADER.unpack(header)
+    if length > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {length} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+    return json.loads(await reader.readexactly(length))
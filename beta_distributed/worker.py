@@ -1,54 +1,88 @@
 import asyncio
-import json
+import socket
+import time
 from argparse import ArgumentParser
 from types import SimpleNamespace
 
 import sys
 import os
 
-sys.path.append(os.path.abspath('../'))
-from http_client import fetch_server_info, send_request
-from load_tester import run_load_test
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from load_patterns import RateProfile
+from load_tester import execute_load_test, execution_options
+from protocol import read_message, send_message
+from stats import RunStats
 
-async def worker(args):
+async def worker(assignment, writer, report_interval=1.0):
     """
-    Worker function to execute load tests based on given parameters.
+    Worker function to execute its share of a distributed load test and stream statistics back.
+
+    Waits for the shared wall-clock start time, runs the assigned share of the rate profile and sends a
+    cumulative statistics snapshot to the master every `report_interval` seconds, followed by a
+    final DONE message.
 
     Args:
-        args (SimpleNamespace): An object containing all necessary parameters including URL, method, QPS, duration,
-                                concurrency, and additional parameters like data and load pattern specifics.
+        assignment (dict): The START message from the master, with url, profile, phase, concurrency,
+                           args (method, data, connection and arrival options) and start_at.
+        writer (asyncio.StreamWriter): The connection to the master.
+        report_interval (float): Seconds between statistics snapshots.
     """
-    # Assuming args might contain another namespace or dict under 'args'
-    additional_args = getattr(args, 'args', SimpleNamespace())
-    if isinstance(additional_args, dict):
-        additional_args = SimpleNamespace(**additional_args)
-    
-    # Access pattern and other optional parameters safely
-    pattern = getattr(additional_args, 'pattern', 'steady')
-    data = getattr(additional_args, 'data', None)
-    method = getattr(additional_args, 'method','GET')
-
-    print(f"Starting load test on {args.url} with {method} method under {pattern} pattern.")
-    await run_load_test(args.url, args.qps, args.duration, args.concurrency, additional_args)
+    args = SimpleNamespace(**assignment['args'])
+    method = getattr(args, 'method', 'GET')
+    data = getattr(args, 'data', None)
+    concurrency = assignment['concurrency']
+    stats = RunStats(getattr(args, 'precision', 3))
+    semaphore = asyncio.Semaphore(concurrency)
+    profile = RateProfile.from_dict(assignment['profile'])
+    options = dict(execution_options(args, concurrency), phase=assignment['phase'])
+    if options["recorder_options"]:
+        # One file per worker, e.g. samples.bin -> samples.w0.bin, tagged with the worker index
+        stem, extension = os.path.splitext(options["recorder_options"]["path"])
+        options["recorder_options"] = dict(options["recorder_options"], path=f"{stem}.w{assignment['index']}{extension}",
+                                           worker=assignment['index'])
+    if options["payload_options"]:
+        # Interleave the sequence numbers of the workers so bodies stay unique across the cluster
+        options["payload_options"] = dict(options["payload_options"], worker=assignment['index'],
+                                          workers=assignment.get('workers', 1))
+
+    print(f"Worker {assignment['index']}: ~{profile.expected_requests()} requests to {assignment['url']} "
+          f"with {method}, starting at {time.ctime(assignment['start_at'])}")
+    await asyncio.sleep(max(0, assignment['start_at'] - time.time()))
+
+    start_time = time.perf_counter()
+    test = asyncio.create_task(execute_load_test(
+        assignment['url'], profile, 0, profile.duration, concurrency, semaphore, method, data,
+        stats=stats, show_progress=False, **options))
+    while not test.done():
+        await asyncio.wait({test}, timeout=report_interval)
+        if not test.done():
+            await send_message(writer, {"type": "STATS", "stats": stats.snapshot()})
+    test.result()
+    await send_message(writer, {"type": "DONE", "stats": stats.snapshot(),
+                                "elapsed": time.perf_counter() - start_time})
 
 async def connect_to_master(host, port):
     """
-    Connects to the master and receives configuration to run the load test.
+    Connects to the master, registers, and runs the load test it assigns.
     """
     reader, writer = await asyncio.open_connection(host, port)
     print(f"Connected to master at {host}:{port}")
 
-    # Send ready message and wait for configuration
-    writer.write(json.dumps({"status": "READY"}).encode())
-    await writer.drain()
-
-    data = await reader.read(1024)
-    command_data = json.loads(data.decode())
+    await send_message(writer, {"type": "REGISTER", "hostname": socket.gethostname()})
+    message = await read_message(reader)
+    if not message or message['type'] != 'REGISTERED':
+        print(f"Master refused registration: {message and message.get('reason')}")
+        writer.close()
+        return
+    print(f"Registered as worker {message['index']} of {message['workers']}, waiting for start")
 
-    if command_data['command'] == 'START':
-        params = SimpleNamespace(**command_data['params'])
-        print('Received params:', params)
-        await worker(params)
+    assignment = await read_message(reader)
+    if assignment and assignment['type'] == 'START':
+        try:
+            await worker(assignment, writer)
+        except Exception as e:
+            await send_message(writer, {"type": "ERROR", "error": repr(e)})
+            raise
 
     writer.close()
     await writer.wait_closed()
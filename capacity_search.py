@@ -0,0 +1,110 @@
+import asyncio
+import time
+from http_client import create_session, prewarm_connections
+from load_patterns import RateProfile, capacity_search_steps, find_knee
+from load_tester import execute_load_test, execution_options, prepare_test
+from health import saturation_verdict
+from metrics import serve_metrics
+from payload import PayloadPool
+from stats import RunStats
+
+def evaluate_step(stats, slo_p99, max_error_rate):
+    """
+    Check one step's statistics against the SLO.
+
+    A step passes when its p99 response time and its p99 dispatch lag are both within the SLO
+    and its error rate is within budget. Dispatch lag is included because a target that cannot
+    keep up behind the concurrency limit shows up as requests queueing before they are sent,
+    not as slower responses, which `health.saturation_verdict` reports as CONCURRENCY-LIMITED.
+    The client verdict tells that apart from lag caused by a saturated client, in which case
+    the step fails too, as its rate was not offered, but the failure is the client's.
+
+    Args:
+        stats (RunStats): The statistics of the step.
+        slo_p99 (float): The p99 latency objective in seconds.
+        max_error_rate (float): The highest acceptable error rate, in percent.
+
+    Returns:
+        tuple: (passed, p99 latency, p99 dispatch lag, error rate in percent, client verdict).
+    """
+    requests = stats.latency.count
+    p99 = stats.latency.percentile(99)
+    lag_p99 = stats.dispatch_lag.percentile(99)
+    error_rate = stats.error_count / requests * 100 if requests else 100.0
+    passed = requests > 0 and p99 <= slo_p99 and lag_p99 <= slo_p99 and error_rate <= max_error_rate
+    client, _ = saturation_verdict(stats)
+    return passed, p99, lag_p99, error_rate, client
+
+async def run_capacity_search(url, qps, duration, concurrency, args):
+    """
+    Find the highest rate the target sustains within a latency and error SLO.
+
+    Runs a steady step at each rate chosen by `load_patterns.capacity_search_steps`, evaluates
+    the step's p99 and error rate against the SLO and feeds the verdict back to pick the next
+    rate. All steps share one session so connection setup is paid once. Prints a line per step,
+    the highest sustained rate and the knee of the p99 curve.
+
+    Args:
+        url (str): The URL to test.
+        qps (int): The first rate to try, unless --start_qps is given.
+        duration (int): Unused; each step lasts --step_duration seconds.
+        concurrency (int): The maximum number of concurrent requests.
+        args (object): Parsed arguments with the search settings (start_qps, step_qps, max_qps,
+                       step_duration, strategy, slo_p99, max_error_rate).
+
+    Returns:
+        int: The highest sustained QPS, 0 if even the first step failed.
+    """
+    options = execution_options(args, concurrency)
+    session_options = options.pop("session_options")
+    prewarm = options.pop("prewarm")
+    options.pop("timeline_options")  # Rejected with search by main.py
+    # One endpoint for the whole search, its counters running on from step to step
+    exporter_options = options.pop("metrics_options")
+    # and one payload pool, so sequence numbers do not start over at every step
+    payload_options = options.pop("payload_options")
+    payloads = PayloadPool(**payload_options) if payload_options else None
+    precision = getattr(args, 'precision', 3)
+    search = capacity_search_steps(args.start_qps or int(qps), args.step_qps, args.max_qps, args.strategy)
+    results = []
+
+    async with create_session(RunStats(precision), **session_options) as session, \
+            serve_metrics(exporter_options) as exporter:
+        semaphore = await prepare_test(url, concurrency, session)
+        if prewarm:
+            await prewarm_connections(session, url, prewarm)
+        print(f"Searching for the highest QPS with p99 <= {args.slo_p99:.4f}s and errors <= {args.max_error_rate:.2f}% "
+              f"({args.strategy}, {args.step_duration}s steps)")
+        print(f"{'QPS':>8} {'achieved':>10} {'p50':>9} {'p99':>9} {'lag p99':>9} {'errors':>8}  verdict")
+
+        try:
+            step_qps = next(search)
+            while True:
+                stats = RunStats(precision)
+                profile = RateProfile("steady", args.step_duration, qps=step_qps)
+                if exporter is not None:
+                    exporter.attach(stats, profile)
+                start_time = time.perf_counter()
+                await execute_load_test(url, profile, step_qps, args.step_duration, concurrency, semaphore,
+                                        args.method, args.data, stats=stats, show_progress=False,
+                                        session=session, payloads=payloads, **options)
+                elapsed = time.perf_counter() - start_time
+                passed, p99, lag_p99, error_rate, client = evaluate_step(stats, args.slo_p99, args.max_error_rate)
+                results.append((step_qps, stats.latency.percentile(50), p99))
+                note = {"OK": "", "CONCURRENCY-LIMITED": " (concurrency-limited)"}.get(client, f" (client {client})")
+                print(f"{step_qps:>8} {stats.latency.count / elapsed:>10.2f} {stats.latency.percentile(50):>8.4f}s "
+                      f"{p99:>8.4f}s {lag_p99:>8.4f}s {error_rate:>7.2f}%  {'PASS' if passed else 'FAIL'}{note}")
+                if args.cooldown:
+                    await asyncio.sleep(args.cooldown)
+                step_qps = search.send(passed)
+        except StopIteration as done:
+            best = done.value
+    if payloads is not None:
+        payloads.close()
+
+    print("-------- Capacity search --------")
+    print(f"Max sustainable QPS: {best}" if best else "No tested rate met the SLO")
+    knee = find_knee([(step, p99) for step, _, p99 in results])
+    if knee:
+        print(f"Latency knee: ~{knee[0]} QPS (p99 {knee[1]:.4f}s)")
+    return best
@@ -0,0 +1,149 @@
+import asyncio
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# p99 event loop lag and peak CPU share of one core beyond which the load generator, rather
+# than the target, is likely what the results measure
+LOOP_LAG_WARN, LOOP_LAG_INVALID = 0.020, 0.100
+CPU_WARN, CPU_INVALID = 0.80, 0.95
+# p99 dispatch lag beyond which requests did not go out at the offered rate
+DISPATCH_LAG_WARN = 0.050
+# Loop lag probes skipped while the run starts up, and needed before the p99 is judged
+WARMUP = 1.0
+MIN_LOOP_LAG_SAMPLES = 100
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process.
+
+    Returns:
+        int: Bytes, 0 where the platform does not report it.
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class HealthMonitor:
+    """
+    Samples the load generator's own health into run statistics while a test runs.
+
+    A background task sleeps for `interval` and records how much later than asked it woke up
+    as event loop lag: time during which no dispatch, response or timer could be handled.
+    Once a second it also samples the process CPU time, all threads included, to track the
+    peak share of a core in use; the peak RSS is taken when monitoring stops. Nothing is added
+    to the per-request path.
+
+    Args:
+        stats (RunStats): The statistics to record into.
+        interval (float): Seconds between loop lag probes.
+        warmup (float): Seconds after starting during which loop lag is not recorded, as the first
+                        dispatches and connections delay the loop once without saturating it.
+    """
+
+    def __init__(self, stats, interval=0.05, warmup=WARMUP):
+        self.stats = stats
+        self.interval = interval
+        self.warmup = warmup
+        self._task = None
+        self._cpu_at = 0.0
+        self._wall_at = 0.0
+
+    def start(self):
+        """
+        Start sampling on the running event loop.
+
+        Returns:
+            HealthMonitor: This instance, for chaining.
+        """
+        self._cpu_at = time.process_time()
+        self._wall_at = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = self.interval
+        loop_lag = self.stats.loop_lag
+        record_from = loop.time() + self.warmup
+        while True:
+            wake_at = loop.time() + interval
+            await asyncio.sleep(interval)
+            if wake_at >= record_from:
+                loop_lag.record(max(0.0, loop.time() - wake_at))
+            if time.perf_counter() - self._wall_at >= 1.0:
+                self._sample_cpu(peak=True)
+
+    def _sample_cpu(self, peak):
+        cpu, wall = time.process_time(), time.perf_counter()
+        stats = self.stats
+        stats.cpu_time += cpu - self._cpu_at
+        stats.cpu_wall += wall - self._wall_at
+        if peak and wall > self._wall_at:
+            stats.cpu_peak = max(stats.cpu_peak, (cpu - self._cpu_at) / (wall - self._wall_at))
+        self._cpu_at, self._wall_at = cpu, wall
+
+    def stop(self):
+        """
+        Stop sampling and account for the time since the last sample.
+        """
+        self._task.cancel()
+        # A partial second is too short to judge the peak by, but counts towards the average
+        self._sample_cpu(peak=False)
+        self.stats.rss_peak = max(self.stats.rss_peak, peak_rss())
+
+def saturation_verdict(stats):
+    """
+    Judge whether the load generator kept up with the test, from its health statistics.
+
+    Only event loop lag and CPU can make a run INVALID. Requests going out late while the loop
+    was responsive waited for a free slot under the concurrency limit, as the target answered
+    too slowly for it to carry the offered rate: the run is CONCURRENCY-LIMITED, which describes
+    the target, not the client. Loop lag is only judged from MIN_LOOP_LAG_SAMPLES probes on.
+
+    Args:
+        stats (RunStats): The statistics of a monitored run.
+
+    Returns:
+        tuple: "OK", "CONCURRENCY-LIMITED", "WARNING" or "INVALID", and a list of reasons.
+
+    Example:
+        >>> from stats import RunStats
+        >>> stats = RunStats()
+        >>> for _ in range(MIN_LOOP_LAG_SAMPLES):
+        ...     stats.loop_lag.record(0.001)
+        >>> stats.dispatch_lag.record(1.5)
+        >>> saturation_verdict(stats)
+        ('CONCURRENCY-LIMITED', ['requests dispatched late by 1500.0 ms at p99 waiting for a free slot under -c'])
+        >>> stats.cpu_peak = 0.99
+        >>> saturation_verdict(stats)[0]
+        'INVALID'
+    """
+    reasons = []
+    severity = 0
+    loop_lag = 0.0
+    if stats.loop_lag.count >= MIN_LOOP_LAG_SAMPLES:
+        loop_lag = stats.loop_lag.percentile(99)
+        if loop_lag > LOOP_LAG_WARN:
+            reasons.append(f"event loop lag p99 {loop_lag * 1e3:.1f} ms")
+            severity = max(severity, 2 if loop_lag > LOOP_LAG_INVALID else 1)
+    if stats.cpu_peak > CPU_WARN:
+        reasons.append(f"client CPU peaked at {stats.cpu_peak * 100:.0f}% of a core")
+        severity = max(severity, 2 if stats.cpu_peak > CPU_INVALID else 1)
+    concurrency_limited = False
+    if stats.dispatch_lag.count:
+        dispatch_lag = stats.dispatch_lag.percentile(99)
+        if dispatch_lag > DISPATCH_LAG_WARN:
+            # A lagging loop explains late requests; a responsive one means they queued under -c
+            concurrency_limited = loop_lag <= LOOP_LAG_WARN
+            cause = " waiting for a free slot under -c" if concurrency_limited else ""
+            reasons.append(f"requests dispatched late by {dispatch_lag * 1e3:.1f} ms at p99{cause}")
+    if severity:
+        return ["OK", "WARNING", "INVALID"][severity], reasons
+    return ("CONCURRENCY-LIMITED" if concurrency_limited else "OK"), reasons
@@ -0,0 +1,228 @@
+import math
+import operator
+
+class LatencyHistogram:
+    """
+    Fixed-memory, log-bucketed latency histogram in the style of HdrHistogram.
+
+    Values are recorded in seconds and stored as integer microseconds in buckets whose width
+    grows with the magnitude of the value, so every recorded value is kept to the requested
+    number of significant figures. Recording is O(1) and the memory footprint depends only on
+    the precision and the highest trackable value, never on how many samples are recorded.
+
+    Args:
+        significant_figures (int): Number of significant decimal digits to preserve (1-5).
+        highest_trackable (float): Largest value, in seconds, that is tracked precisely.
+                                   Larger values are clamped into the last bucket.
+
+    Example:
+        >>> histogram = LatencyHistogram()
+        >>> for value in [0.1, 0.2, 0.3, 0.4, 0.5]:
+        ...     histogram.record(value)
+        >>> histogram.count
+        5
+        >>> round(histogram.percentile(50), 3)
+        0.3
+    """
+
+    UNIT = 1e-6  # Values are bucketed as integer microseconds
+
+    def __init__(self, significant_figures=3, highest_trackable=3600.0):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.significant_figures = significant_figures
+        self.highest_trackable = highest_trackable
+
+        largest_single_unit = 2 * 10 ** significant_figures
+        sub_bucket_count_magnitude = math.ceil(math.log2(largest_single_unit))
+        self._half_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+        self._sub_bucket_count = 1 << (self._half_magnitude + 1)
+        self._half_count = self._sub_bucket_count // 2
+        self._sub_bucket_mask = self._sub_bucket_count - 1
+        self._highest = max(int(highest_trackable / self.UNIT), 2)
+
+        bucket_count = 1
+        smallest_untrackable = self._sub_bucket_count
+        while smallest_untrackable <= self._highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self.counts = [0] * ((bucket_count + 1) * self._half_count)
+
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def reset(self):
+        """
+        Forget every recorded value, keeping the bucket layout and its memory.
+        """
+        self.counts[:] = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, value):
+        bucket_index = (value | self._sub_bucket_mask).bit_length() - (self._half_magnitude + 1)
+        sub_bucket_index = value >> bucket_index
+        return ((bucket_index + 1) << self._half_magnitude) + sub_bucket_index - self._half_count
+
+    def _highest_equivalent(self, index):
+        bucket_index = (index >> self._half_magnitude) - 1
+        sub_bucket_index = (index & (self._half_count - 1)) + self._half_count
+        if bucket_index < 0:
+            sub_bucket_index -= self._half_count
+            bucket_index = 0
+        return ((sub_bucket_index + 1) << bucket_index) - 1
+
+    def record(self, value):
+        """
+        Record a single value, in seconds, in O(1).
+
+        Args:
+            value (float): The value to record. Negative values are recorded as zero.
+        """
+        units = min(max(int(value / self.UNIT + 0.5), 0), self._highest)
+        self.counts[self._index(units)] += 1
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def stdev(self):
+        if not self.count:
+            return 0.0
+        return math.sqrt(max(self.total_sq / self.count - self.mean ** 2, 0.0))
+
+    def percentiles(self, percentiles):
+        """
+        Compute several percentiles in a single pass over the buckets.
+
+        Args:
+            percentiles (list[float]): Percentiles to compute, each between 0 and 100.
+
+        Returns:
+            list[float]: The value at each percentile, in seconds, clamped to the recorded min/max.
+        """
+        if not self.count:
+            return [0.0 for _ in percentiles]
+        targets = sorted((max(1, math.ceil(p / 100 * self.count)), i) for i, p in enumerate(percentiles))
+        values = [0.0] * len(percentiles)
+        position = 0
+        cumulative = 0
+        for index, bucket in enumerate(self.counts):
+            if not bucket:
+                continue
+            cumulative += bucket
+            while position < len(targets) and cumulative >= targets[position][0]:
+                value = self._highest_equivalent(index) * self.UNIT
+                values[targets[position][1]] = min(max(value, self.min), self.max)
+                position += 1
+            if position == len(targets):
+                break
+        return values
+
+    def percentile(self, percentile):
+        return self.percentiles([percentile])[0]
+
+    def nonzero_buckets(self):
+        """
+        List the non-empty buckets, for vectorized processing of the distribution elsewhere.
+
+        Returns:
+            tuple: Two lists in increasing order: the value each bucket reports, in seconds and
+                   clamped to the recorded min/max as in `percentiles`, and its count.
+
+        Example:
+            >>> histogram = LatencyHistogram()
+            >>> for value in [0.25, 0.25, 0.5]:
+            ...     histogram.record(value)
+            >>> values, counts = histogram.nonzero_buckets()
+            >>> [round(value, 3) for value in values], counts
+            ([0.25, 0.5], [2, 1])
+        """
+        values, counts = [], []
+        for index, bucket in enumerate(self.counts):
+            if bucket:
+                value = self._highest_equivalent(index) * self.UNIT
+                values.append(min(max(value, self.min), self.max))
+                counts.append(bucket)
+        return values, counts
+
+    def _check_compatible(self, other):
+        if (other.significant_figures, other.highest_trackable) != (self.significant_figures, self.highest_trackable):
+            raise ValueError("Cannot merge histograms with different precision or range")
+
+    def merge(self, other):
+        """
+        Add all values recorded in another histogram with the same configuration.
+
+        Args:
+            other (LatencyHistogram): The histogram to merge in.
+
+        Returns:
+            LatencyHistogram: This histogram, for chaining.
+        """
+        self._check_compatible(other)
+        if not other.count:
+            return self
+        self.counts[:] = map(operator.add, self.counts, other.counts)
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def snapshot(self):
+        """
+        Return a compact, JSON-serializable copy of the histogram.
+
+        Only non-empty buckets are included, so snapshots of sparse histograms stay small
+        enough to ship between processes or over the network.
+
+        Returns:
+            dict: The snapshot.
+        """
+        return {
+            "significant_figures": self.significant_figures,
+            "highest_trackable": self.highest_trackable,
+            "count": self.count,
+            "total": self.total,
+            "total_sq": self.total_sq,
+            "min": self.min if self.count else None,
+            "max": self.max,
+            "counts": [[index, bucket] for index, bucket in enumerate(self.counts) if bucket],
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Rebuild a histogram from a snapshot produced by `snapshot()`.
+
+        Args:
+            snapshot (dict): The snapshot.
+
+        Returns:
+            LatencyHistogram: The restored histogram.
+        """
+        histogram = cls(snapshot["significant_figures"], snapshot["highest_trackable"])
+        for index, bucket in snapshot["counts"]:
+            histogram.counts[index] = bucket
+        histogram.count = snapshot["count"]
+        histogram.total = snapshot["total"]
+        histogram.total_sq = snapshot["total_sq"]
+        histogram.min = snapshot["min"] if snapshot["min"] is not None else math.inf
+        histogram.max = snapshot["max"]
+        return histogram
@@ -1,48 +1,254 @@
+import asyncio
 import aiohttp
 import time
 import json
+import zlib
+from typing import NamedTuple, Optional
+from tracing import UNTRACKED, request_trace_config
 
-async def fetch_server_info(url):
+def connection_options(args, concurrency):
+    """
+    Build the connection pool settings for a run from command-line arguments.
+
+    Args:
+        args (object): Parsed arguments; missing attributes fall back to the defaults.
+        concurrency (int): The maximum number of concurrent requests, used as the default pool size.
+
+    Returns:
+        dict: Keyword arguments for `create_session`.
+    """
+    return {
+        "pool_size": getattr(args, 'pool_size', None) or concurrency,
+        "per_host_limit": getattr(args, 'per_host_limit', 0),
+        "keepalive": not getattr(args, 'no_keepalive', False),
+        "dns_ttl": getattr(args, 'dns_ttl', 10),
+        "timeout": getattr(args, 'timeout', 300),
+    }
+
+def create_session(stats=None, pool_size=100, per_host_limit=0, keepalive=True, dns_ttl=10, timeout=300):
+    """
+    Create an aiohttp client session with an explicitly configured connection pool.
+
+    Args:
+        stats (RunStats, optional): Statistics to record connection creation and reuse and per-phase timings into.
+        pool_size (int): The maximum number of simultaneous connections.
+        per_host_limit (int): The maximum number of simultaneous connections per host; 0 means no extra limit.
+        keepalive (bool): Whether to keep connections open between requests. Disable to pay for
+                          a new connection on every request.
+        dns_ttl (int): How long resolved addresses are cached, in seconds; 0 disables the cache.
+        timeout (float): Seconds a request may take in total, connection and body included.
+
+    Returns:
+        aiohttp.ClientSession: The session. The caller is responsible for closing it.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=pool_size,
+        limit_per_host=per_host_limit,
+        force_close=not keepalive,
+        use_dns_cache=dns_ttl > 0,
+        ttl_dns_cache=dns_ttl if dns_ttl > 0 else None,
+    )
+    trace_configs = [request_trace_config(stats)] if stats is not None else None
+    return aiohttp.ClientSession(connector=connector, trace_configs=trace_configs,
+                                 timeout=aiohttp.ClientTimeout(total=timeout))
+
+async def prewarm_connections(session, url, count):
+    """
+    Open connections to the target before the test clock starts, so they can be reused from the pool.
+
+    Args:
+        session (aiohttp.ClientSession): The session whose pool should be warmed up.
+        url (str): The URL to connect to.
+        count (int): The number of connections to open.
+
+    Returns:
+        int: The number of pre-warm requests that succeeded.
+    """
+    async def warm():
+        try:
+            async with session.get(url, trace_request_ctx=UNTRACKED) as response:
+                await response.read()
+            return True
+        except Exception:
+            return False
+
+    results = await asyncio.gather(*(warm() for _ in range(count)))
+    return sum(results)
+
+async def fetch_server_info(url, session=None):
     """
     Fetches the server information from the given URL.
 
     Args:
         url (str): The URL to fetch the server information from.
+        session (aiohttp.ClientSession, optional): The session to use; a temporary one is created if omitted.
 
     Returns:
         str: The server information, or 'Unknown' if not found.
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
+    if session is None:
+        async with aiohttp.ClientSession() as session:
+            return await fetch_server_info(url, session)
+    try:
+        async with session.get(url, trace_request_ctx=UNTRACKED) as response:
             server = response.headers.get('Server', 'Unknown')
+            await response.read()
+    except asyncio.TimeoutError:
+        # Slower than --timeout; the test will record its requests timing out
+        return 'Unknown'
     return server
 
-async def send_request(url, session, method="GET", data=None):
+# Incremental checksums a response body can be verified with, and their starting values
+CHECKSUMS = {"adler32": (zlib.adler32, 1), "crc32": (zlib.crc32, 0)}
+
+class ResponseCheck(NamedTuple):
+    """
+    Expectations a successful response body is verified against while it is drained.
+
+    Attributes:
+        size (int or None): The expected body size in bytes.
+        checksum (str or None): The checksum algorithm, one of CHECKSUMS.
+        expected_checksum (int or None): The expected checksum of the body.
+    """
+    size: Optional[int] = None
+    checksum: Optional[str] = None
+    expected_checksum: Optional[int] = None
+
+    def failure(self, size, checksum):
+        """
+        Describe how a drained body fails the expectations.
+
+        Args:
+            size (int): The number of bytes received.
+            checksum (int or None): The checksum of the body.
+
+        Returns:
+            str or None: The failure, recorded as the request's error, or None if the body is as expected.
+
+        Example:
+            >>> ResponseCheck(size=10).failure(8, None)
+            'Body size 8 != expected 10'
+        """
+        if self.size is not None and size != self.size:
+            return f"Body size {size} != expected {self.size}"
+        if self.expected_checksum is not None and checksum != self.expected_checksum:
+            return f"Body {self.checksum} {checksum:08x} != expected {self.expected_checksum:08x}"
+        return None
+
+def response_check(args):
+    """
+    Build the response body expectations from parsed arguments.
+
+    Args:
+        args (object): Parsed arguments; missing attributes fall back to the defaults.
+
+    Returns:
+        ResponseCheck or None: The expectations, or None when bodies are only drained and counted.
+    """
+    size = getattr(args, 'expect_size', None)
+    expected_checksum = getattr(args, 'expect_checksum', None)
+    if size is None and expected_checksum is None:
+        return None
+    checksum = getattr(args, 'checksum', 'adler32') if expected_checksum is not None else None
+    return ResponseCheck(size, checksum, int(expected_checksum, 16) if expected_checksum is not None else None)
+
+class RequestTemplate(NamedTuple):
     """
-    Sends a request to the given URL using the specified HTTP method and returns the elapsed time and response status.
+    A request encoded once per test and sent as-is on every dispatch.
+
+    Attributes:
+        method (str): The HTTP method.
+        url (str): The URL to send the request to.
+        headers (dict): The request headers.
+        body (bytes or None): The encoded request body.
+        expect (ResponseCheck or None): Expectations the response body is verified against.
+    """
+    method: str
+    url: str
+    headers: dict
+    body: Optional[bytes]
+    expect: Optional[ResponseCheck] = None
+
+def build_request_template(url, method="GET", data=None, headers=None, expect=None):
+    """
+    Encode a request once so the hot path does not rebuild headers or re-serialize JSON per call.
 
     Args:
         url (str): The URL to send the request to.
+        method (str): HTTP method to use for the request.
+        data (dict or None): JSON data to send with the request (for methods that allow a body).
+        headers (dict or None): Extra headers to send with every request.
+        expect (ResponseCheck or None): Expectations to verify every response body against.
+
+    Returns:
+        RequestTemplate: The pre-encoded request.
+    """
+    request_headers = {'Content-Type': 'application/json'} if data else {}
+    request_headers.update(headers or {})
+    body = json.dumps(data).encode() if data else None
+    return RequestTemplate(method, url, request_headers, body, expect)
+
+async def drain_body(content, checksum=None):
+    """
+    Consume a response body chunk by chunk without accumulating it.
+
+    Each chunk is the buffer the connection already received, handed over without copying and
+    dropped as soon as it is counted, so memory stays flat however large the body is.
+
+    Args:
+        content (aiohttp.StreamReader): The response body stream.
+        checksum (str or None): Incremental checksum to compute along the way, one of CHECKSUMS.
+
+    Returns:
+        tuple: The number of bytes received and the checksum, or None if no checksum was requested.
+    """
+    size = 0
+    if checksum is None:
+        while True:
+            chunk = await content.readany()
+            if not chunk:
+                return size, None
+            size += len(chunk)
+    update, value = CHECKSUMS[checksum]
+    while True:
+        chunk = await content.readany()
+        if not chunk:
+            return size, value
+        size += len(chunk)
+        value = update(chunk, value)
+
+async def send_request(template, session, stats=None):
+    """
+    Sends a pre-encoded request, drains the whole response body and returns the elapsed time, response status and body size.
+
+    Times are taken on the monotonic `perf_counter` clock and cover the full exchange, up to
+    the last byte of the body. If the template carries a `ResponseCheck`, a successful response
+    whose body does not match it is reported with the mismatch as its error.
+
+    Args:
+        template (RequestTemplate): The request to send, see `build_request_template`.
         session (aiohttp.ClientSession): The client session to use for the request.
-        method (str): HTTP method to use for the request (e.g., "GET", "POST", "PUT", "DELETE", "PATCH").
-        data (dict or None): The data to send with the request (for methods that allow a body).
+        stats (RunStats, optional): Statistics to record the body download time and size into.
 
     Returns:
-        tuple: A tuple containing the elapsed time (in seconds) and the response status (or error message).
+        tuple: A tuple containing the elapsed time (in seconds), the response status (or error message)
+               and the number of body bytes received.
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
+    expect = template.expect
     try:
-        # Prepare headers and data if necessary
-        headers = {'Content-Type': 'application/json'} if data else {}
-        # Convert data to JSON if it's provided
-        json_data = json.dumps(data) if data else None
-
-        # Select the correct method and send the request
-        async with session.request(method, url, json=data, headers=headers) as response:
-            elapsed_time = time.time() - start_time
-            return elapsed_time, response.status
+        async with session.request(template.method, template.url, data=template.body,
+                                   headers=template.headers) as response:
+            headers_at = time.perf_counter()
+            size, checksum = await drain_body(response.content, expect.checksum if expect else None)
+            end_time = time.perf_counter()
+            if stats is not None:
+                stats.body_time.record(end_time - headers_at)
+                stats.bytes_received += size
+            status = response.status
+            if expect is not None and status < 400:
+                status = expect.failure(size, checksum) or status
+            return end_time - start_time, status, size
     except Exception as e:
-        elapsed_time = time.time() - start_time
-        return elapsed_time, str(e)
-
-
+        elapsed_time = time.perf_counter() - start_time
+        return elapsed_time, str(e) or type(e).__name__, 0
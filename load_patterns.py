@@ -1,14 +1,254 @@
-def compute_load_schedule(pattern, qps, duration, concurrency, spike_duration=None, spike_load=None, spike_interval=None):
-    if pattern == "steady":
-        return [qps] * duration
-    elif pattern == "spike":
-        normal_duration = (duration - spike_duration) // 2
-        spike_load_schedule = [qps] * normal_duration + [spike_load] * spike_duration + [qps] * normal_duration
-        return spike_load_schedule[:duration]
-    elif pattern == "periodic":
-        load = []
-        while len(load) < duration:
-            load += [qps] * (spike_interval - spike_duration) + [spike_load] * spike_duration
-        return load[:duration]
-    else:
-        raise ValueError("Unsupported load pattern")
\ No newline at end of file
+import bisect
+import math
+
+RATE_PATTERNS = ["steady", "spike", "periodic", "ramp", "steps", "sine", "curve"]
+
+class RateProfile:
+    """
+    Closed-form offered rate over time, for lazily scheduling a load test of any length.
+
+    Calling the profile with a time offset returns the target rate in QPS at that instant, so
+    rates can be fractional and change smoothly within a second, and a schedule never has to
+    be materialized. Profiles are plain picklable objects that can be scaled down to split the
+    load across processes or workers, and round-tripped through `to_dict()` / `from_dict()`.
+
+    Patterns and their parameters:
+        steady: qps
+        spike: qps, spike_duration, spike_load (normal rate, then the spike in the middle, then normal again)
+        periodic: qps, spike_interval, spike_duration, spike_load
+        ramp: start_qps, end_qps (linear over the whole duration)
+        steps: qps, step_qps, step_duration (a ladder climbing by step_qps every step_duration seconds)
+        sine: qps, amplitude, period (e.g. a period of 86400 for a diurnal cycle)
+        curve: points, a list of (offset, qps) pairs joined by straight lines
+
+    Args:
+        pattern (str): One of RATE_PATTERNS.
+        duration (float): The duration of the test in seconds.
+        scale (float): Factor applied to the rate, e.g. 1/N for one of N generators.
+        **params: The pattern's parameters.
+
+    Example:
+        >>> ramp = RateProfile("ramp", 10, start_qps=0, end_qps=100)
+        >>> ramp(2.5), ramp.scaled(0.5)(10)
+        (25.0, 50.0)
+    """
+
+    def __init__(self, pattern, duration, scale=1.0, **params):
+        if pattern not in RATE_PATTERNS:
+            raise ValueError("Unsupported load pattern")
+        for name in ("step_duration", "period"):
+            if name in params and params[name] <= 0:
+                raise ValueError(f"{name} must be positive")
+        self.pattern = pattern
+        self.duration = duration
+        self.scale = scale
+        self.params = params
+        if pattern == "curve":
+            self._points = sorted((float(offset), float(qps)) for offset, qps in params["points"])
+            self._offsets = [offset for offset, _ in self._points]
+
+    def __call__(self, t):
+        return max(0.0, self._rate(t)) * self.scale
+
+    def _rate(self, t):
+        params = self.params
+        if self.pattern == "steady":
+            return params["qps"]
+        if self.pattern == "spike":
+            normal_duration = (self.duration - params["spike_duration"]) // 2
+            if normal_duration <= t < normal_duration + params["spike_duration"]:
+                return params["spike_load"]
+            return params["qps"] if t < 2 * normal_duration + params["spike_duration"] else 0.0
+        if self.pattern == "periodic":
+            position = t % params["spike_interval"]
+            if position >= params["spike_interval"] - params["spike_duration"]:
+                return params["spike_load"]
+            return params["qps"]
+        if self.pattern == "ramp":
+            progress = min(t / self.duration, 1.0) if self.duration else 1.0
+            return params["start_qps"] + (params["end_qps"] - params["start_qps"]) * progress
+        if self.pattern == "steps":
+            return params["qps"] + params["step_qps"] * math.floor(t / params["step_duration"])
+        if self.pattern == "sine":
+            return params["qps"] + params["amplitude"] * math.sin(2 * math.pi * t / params["period"])
+        # curve
+        index = bisect.bisect_right(self._offsets, t)
+        if index == 0:
+            return self._points[0][1]
+        if index == len(self._points):
+            return self._points[-1][1]
+        (t0, qps0), (t1, qps1) = self._points[index - 1], self._points[index]
+        return qps0 + (qps1 - qps0) * (t - t0) / (t1 - t0)
+
+    def scaled(self, factor):
+        """
+        Return a copy of the profile with its rate multiplied by `factor`.
+        """
+        return RateProfile(self.pattern, self.duration, self.scale * factor, **self.params)
+
+    def expected_requests(self, resolution=1.0):
+        """
+        Estimate the number of requests over the whole duration, in O(1) memory.
+
+        Args:
+            resolution (float): Integration step in seconds.
+
+        Returns:
+            int: The expected number of requests.
+        """
+        total = 0.0
+        t = 0.0
+        while t < self.duration:
+            step = min(resolution, self.duration - t)
+            total += self(t + step / 2) * step
+            t += step
+        return round(total)
+
+    def to_dict(self):
+        return {"pattern": self.pattern, "duration": self.duration, "scale": self.scale, "params": self.params}
+
+    @classmethod
+    def from_dict(cls, profile):
+        return cls(profile["pattern"], profile["duration"], profile.get("scale", 1.0), **profile["params"])
+
+    def __repr__(self):
+        params = ", ".join(f"{name}={value}" for name, value in self.params.items())
+        scale = f" x{self.scale:g}" if self.scale != 1.0 else ""
+        return f"{self.pattern}({params}) over {self.duration}s{scale}"
+
+def parse_curve_points(value):
+    """
+    Parse a piecewise rate curve given as comma-separated offset:qps pairs.
+
+    Args:
+        value (str): The curve, e.g. "0:10,60:100,120:20".
+
+    Returns:
+        list: (offset, qps) pairs.
+
+    Example:
+        >>> parse_curve_points("0:10, 60:100.5")
+        [(0.0, 10.0), (60.0, 100.5)]
+    """
+    points = []
+    for pair in value.split(","):
+        offset, qps = pair.split(":")
+        points.append((float(offset), float(qps)))
+    if not points:
+        raise ValueError("A curve needs at least one offset:qps point")
+    return points
+
+def profile_from_args(args, qps, duration):
+    """
+    Build the rate profile for the pattern and pattern options held in parsed arguments.
+
+    Args:
+        args (object): An object with a `pattern` attribute and that pattern's options
+                       (spike_duration, spike_load, spike_interval, start_qps, end_qps, step_qps,
+                       step_duration, amplitude, period or points).
+        qps (float): The target queries per second.
+        duration (int): The duration of the test in seconds.
+
+    Returns:
+        RateProfile: The profile.
+    """
+    pattern = getattr(args, 'pattern', 'steady')
+    if pattern == "periodic":
+        return RateProfile(pattern, duration, qps=qps, spike_duration=args.spike_duration,
+                           spike_load=args.spike_load, spike_interval=args.spike_interval)
+    if pattern == "spike":
+        return RateProfile(pattern, duration, qps=qps, spike_duration=args.spike_duration,
+                           spike_load=args.spike_load)
+    if pattern == "ramp":
+        start_qps = getattr(args, 'start_qps', None)
+        return RateProfile(pattern, duration, start_qps=qps if start_qps is None else start_qps,
+                           end_qps=args.end_qps)
+    if pattern == "steps":
+        return RateProfile(pattern, duration, qps=qps, step_qps=args.step_qps, step_duration=args.step_duration)
+    if pattern == "sine":
+        amplitude = getattr(args, 'amplitude', None)
+        return RateProfile(pattern, duration, qps=qps, amplitude=qps / 2 if amplitude is None else amplitude,
+                           period=args.period)
+    if pattern == "curve":
+        points = args.points if not isinstance(args.points, str) else parse_curve_points(args.points)
+        return RateProfile(pattern, duration, points=points)
+    return RateProfile("steady", duration, qps=qps)
+
+def capacity_search_steps(start_qps, step_qps, max_qps, strategy="linear"):
+    """
+    Choose the offered rate of each step of a capacity search.
+
+    A generator driven with `send()`: it yields the QPS to try next and expects to be sent
+    whether the target sustained that rate. "linear" ramps up by `step_qps` until a step fails;
+    "binary" checks `start_qps` and `max_qps`, then bisects between the highest passing and
+    lowest failing rate until they are within `step_qps` of each other.
+
+    Args:
+        start_qps (int): The first rate to try.
+        step_qps (int): The ramp increment, and the resolution of the binary search.
+        max_qps (int): The highest rate to try.
+        strategy (str): "linear" or "binary".
+
+    Returns:
+        generator: Yields rates to try; returns the highest sustained rate (0 if none) when exhausted.
+
+    Example:
+        >>> search = capacity_search_steps(10, 10, 100, "binary")
+        >>> tried = [next(search)]
+        >>> try:
+        ...     while True:
+        ...         tried.append(search.send(tried[-1] <= 42))
+        ... except StopIteration as done:
+        ...     best = done.value
+        >>> tried, best
+        ([10, 100, 55, 32, 43, 37], 37)
+    """
+    if strategy == "linear":
+        best = 0
+        qps = start_qps
+        while qps <= max_qps:
+            if not (yield qps):
+                break
+            best = qps
+            qps += step_qps
+        return best
+    if strategy == "binary":
+        if not (yield start_qps):
+            return 0
+        if (yield max_qps):
+            return max_qps
+        low, high = start_qps, max_qps
+        while high - low > step_qps:
+            middle = (low + high) // 2
+            if (yield middle):
+                low = middle
+            else:
+                high = middle
+        return low
+    raise ValueError("Unsupported search strategy")
+
+def find_knee(points):
+    """
+    Locate the knee of a latency-versus-load curve.
+
+    Both axes are normalized to [0, 1]; the knee is the point that lies furthest below the
+    straight line joining the first and last points, i.e. where latency stops growing slowly
+    and starts climbing steeply.
+
+    Args:
+        points (list): (qps, latency) pairs.
+
+    Returns:
+        tuple or None: The (qps, latency) pair at the knee, or None with fewer than three points.
+
+    Example:
+        >>> find_knee([(10, 0.10), (20, 0.10), (30, 0.11), (40, 0.20), (50, 0.90)])
+        (40, 0.2)
+    """
+    points = sorted(points)
+    if len(points) < 3:
+        return None
+    (x0, y0), (x1, y1) = points[0], points[-1]
+    if x1 == x0 or y1 == y0:
+        return None
+    return max(points, key=lambda point: (point[0] - x0) / (x1 - x0) - (point[1] - y0) / (y1 - y0))
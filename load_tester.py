@@ -1,52 +1,258 @@
 # load_tester.py
 import asyncio
-import aiohttp
+import contextlib
 from tqdm import tqdm
 from async_worker import worker
-from utils import calculate_and_display_results
-from load_patterns import compute_load_schedule
-from http_client import fetch_server_info
+from baseline import save_run
+from basic_load_tester import run_threaded_test
+from utils import calculate_and_display_results, display_process_breakdown
+from load_patterns import profile_from_args
+from http_client import (RequestTemplate, build_request_template, connection_options, create_session,
+                         fetch_server_info, prewarm_connections, response_check)
+from raw_client import RawConnectionPool, run as run_event_loop
+from scheduler import load_interarrivals, rate_offsets
+from health import HealthMonitor
+from metrics import metrics_options, serve_metrics
+from payload import PayloadPool, payload_options
+from recorder import SampleRecorder, recorder_options
+from stats import RunStats
+from timeline import MetricsTimeline
+import logging
+import multiprocessing
+import os
 import time
 
-async def execute_load_test(url, load_pattern, qps, duration, concurrency, semaphore, method, data=None):
+PROCESS_START_TIMEOUT = 60  # Seconds to wait for every load generator process to come up
+
+async def execute_load_test(url, load_pattern, qps, duration, concurrency, semaphore, method, data=None,
+                            arrival="fixed", interarrivals=None, stats=None, show_progress=True,
+                            session=None, session_options=None, prewarm=0, log_every=0, timeline_options=None,
+                            tick=0.1, phase=0.0, expect=None, recorder_options=None, metrics_options=None,
+                            engine="async", pipeline=1, payloads=None, payload_options=None):
     """
     Execute a load test on a given URL with a specified load pattern.
 
+    Requests are dispatched open-loop: each one is fired at its planned offset from the start
+    of the test, whether or not earlier requests have completed, so a slow target cannot
+    throttle the offered rate. How late each dispatch actually went out is recorded alongside
+    the response times.
+
     Args:
         url (str): The URL to test.
-        load_pattern (list): A list of integers representing the load schedule.
-        qps (int): The target queries per second.
-        duration (int): The duration of the test in seconds.
+        load_pattern (RateProfile): The offered rate over time, as a `load_patterns.RateProfile`
+                                    or any callable of the time offset.
+        qps (float): The target queries per second.
+        duration (float): The duration of the test in seconds.
         concurrency (int): The maximum number of concurrent requests.
         semaphore (asyncio.Semaphore): A semaphore to limit concurrency.
         method (str): The HTTP method to use (e.g. "GET", "POST").
         data (dict): Optional data to send with the request.
+        arrival (str or callable): Inter-arrival mode, see `scheduler.rate_offsets`.
+        interarrivals (list[float]): Normalized gaps for the "custom" arrival mode.
+        stats (RunStats): Optional statistics to record into; a fresh instance is created if omitted.
+        show_progress (bool): Whether to display a progress bar.
+        session (aiohttp.ClientSession or RawConnectionPool): Optional session to send requests with; if
+                                                              omitted, one is created by `connection_pool`
+                                                              and closed at the end.
+        session_options (dict): Connection pool settings for `http_client.create_session`.
+        prewarm (int): Number of connections to open before the test clock starts.
+        log_every (int): Log one in every `log_every` completed requests; 0 disables sampling.
+        timeline_options (dict): Settings for a `timeline.MetricsTimeline` (path, window) to record
+                                 per-window metrics into; no timeline is kept if omitted.
+        tick (float): Seconds between samples of a rate profile.
+        phase (float): Fraction of a gap before the first fixed-mode request, see `scheduler.rate_offsets`.
+        expect (ResponseCheck): Optional size or checksum every successful response body must match.
+        recorder_options (dict): Settings for a `recorder.SampleRecorder` (path, worker) to append every
+                                 request's raw sample to; nothing is recorded if omitted.
+        metrics_options (dict): Settings for a `metrics.MetricsExporter` (port, host) to serve live
+                                metrics from while the test runs; no endpoint is served if omitted.
+        engine (str): "raw" to send requests through a `raw_client.RawConnectionPool` instead of aiohttp.
+        pipeline (int): Maximum outstanding requests per connection with the raw engine.
+        payloads (PayloadPool): Optional pool to take a fresh body from for every request instead of
+                                sending `data`; if omitted and `payload_options` are given, one is
+                                created and closed at the end.
+        payload_options (dict): Settings for a `payload.PayloadPool` (template, rows, content_type, ...).
 
     Returns:
-        tuple: A tuple containing the results and errors of the test.
-    """
-    results = []
-    errors = []
-    pbar = tqdm(total=qps * duration, desc="Progress", unit="req")
-    
-    # Use a proper async context manager for session
-    async with aiohttp.ClientSession() as session:
-        start_time = time.time()
-        for second, current_load in enumerate(load_pattern):
-            if current_load == 0:
-                await asyncio.sleep(1)
-                continue
-            tasks = [asyncio.create_task(worker(url, session, method, semaphore, results, errors, data)) for _ in range(current_load)]
-            await asyncio.gather(*tasks)
-            pbar.update(len(tasks))  # Update for all tasks started
-
-            # Ensure correct pacing by sleeping until the end of the second
-            await asyncio.sleep(max(0, 1 - (time.time() - start_time - second)))
+        RunStats: The latency histograms and error counts of the test.
+    """
+    stats = stats if stats is not None else RunStats()
+    # A pool created here is closed here; one passed in belongs to the caller
+    created_payloads = payloads is None and bool(payload_options)
+    if created_payloads:
+        payloads = PayloadPool(**payload_options)
+    if payloads is not None:
+        template = build_request_template(url, method, headers={"Content-Type": payloads.content_type},
+                                          expect=expect)
+    else:
+        template = build_request_template(url, method, data, expect=expect)
+
+    if session is None:
+        session_context = connection_pool(url, stats, engine, session_options, pipeline)
+    else:
+        session_context = contextlib.nullcontext(session)
+
+    async with session_context as session, serve_metrics(metrics_options) as exporter:
+        if exporter is not None:
+            exporter.attach(stats, load_pattern)
+        if prewarm:
+            if isinstance(session, RawConnectionPool):
+                stats.prewarmed += await session.prewarm(prewarm)
+            else:
+                stats.prewarmed += await prewarm_connections(session, url, prewarm)
+        offsets = rate_offsets(load_pattern, duration, arrival, interarrivals, tick, phase=phase)
+        expected = load_pattern.expected_requests() if hasattr(load_pattern, "expected_requests") else None
+        if payloads is not None:
+            next_body = payloads.next
+            dispatches = ((offset, RequestTemplate(template.method, template.url, template.headers, next_body(),
+                                                   template.expect), None)
+                          for offset in offsets)
+        else:
+            dispatches = ((offset, template, None) for offset in offsets)
+        timeline = MetricsTimeline(**timeline_options) if timeline_options else None
+        recorder = SampleRecorder(**recorder_options) if recorder_options else None
+        try:
+            await dispatch_requests(dispatches, session, semaphore, stats, expected, show_progress, log_every,
+                                    timeline, recorder)
+        finally:
+            if created_payloads:
+                payloads.close()
 
+    return stats
+
+def connection_pool(url, stats, engine="async", session_options=None, pipeline=1):
+    """
+    Create the session requests are sent through for an engine.
+
+    Args:
+        url (str): The URL to test.
+        stats (RunStats): Statistics to record connection creation and reuse and per-phase timings into.
+        engine (str): "raw" for a `raw_client.RawConnectionPool`, anything else for an aiohttp session.
+        session_options (dict): Connection pool settings for `http_client.create_session`; the raw
+                                engine only uses `pool_size` and `timeout`.
+        pipeline (int): Maximum outstanding requests per connection with the raw engine.
+
+    Returns:
+        The session, an async context manager that closes it.
+    """
+    session_options = session_options or {}
+    if engine == "raw":
+        return RawConnectionPool(url, session_options.get("pool_size", 100), pipeline,
+                                 session_options.get("timeout"))
+    return create_session(stats, **session_options)
+
+async def dispatch_requests(dispatches, session, semaphore, stats, expected=None, show_progress=True, log_every=0,
+                            timeline=None, recorder=None):
+    """
+    Fire requests open-loop at their planned offsets and wait for all of them to complete.
+
+    Args:
+        dispatches (iterable): (offset in seconds, RequestTemplate, endpoint name or None) tuples in
+                               offset order. Consumed lazily, so it can be an unbounded generator.
+        session (aiohttp.ClientSession): The session to send requests with.
+        semaphore (asyncio.Semaphore): A semaphore to limit concurrency.
+        stats (RunStats): The statistics to record into.
+        expected (int): Expected number of requests, for the progress bar.
+        show_progress (bool): Whether to display a progress bar.
+        log_every (int): Log one in every `log_every` completed requests; 0 disables sampling.
+        timeline (MetricsTimeline): Optional timeline to record per-window metrics into while the test runs.
+        recorder (SampleRecorder): Optional raw sample log, offsets taken from the start of dispatch;
+                                   it is closed once every request has completed, or once the
+                                   remaining ones are cancelled if dispatch fails.
+
+    Returns:
+        RunStats: The statistics that were recorded into.
+    """
+    pending = set()
+    pbar = tqdm(total=expected, desc="Progress", unit="req", disable=not show_progress)
+    loop = asyncio.get_running_loop()
+    start_time = loop.time()
+    if timeline is not None:
+        stats.timeline = timeline
+        ticker = asyncio.create_task(timeline.run(stats, start_time))
+    if recorder is not None:
+        recorder.start = start_time
+        stats.recorder = recorder
+    metrics = stats.metrics
+    if metrics is not None:
+        metrics.dispatch_started(start_time)
+    monitor = HealthMonitor(stats).start()
+    try:
+        for offset, template, endpoint in dispatches:
+            scheduled_at = start_time + offset
+            # Sleep until the planned dispatch time; when running behind, still yield once
+            # so in-flight requests make progress while we catch up
+            await asyncio.sleep(max(0, scheduled_at - loop.time()))
+            task = asyncio.create_task(worker(template, session, semaphore, stats, scheduled_at, log_every, endpoint))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            pbar.update(1)
+            if metrics is not None:
+                metrics.dispatched += 1
+
+        if pending:
+            await asyncio.gather(*pending)
+    finally:
+        # Only left over when dispatch failed or was cancelled: abandon those requests, and wait for
+        # them to unwind before the timeline and the recorder are closed
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        monitor.stop()
         pbar.close()
+        if timeline is not None:
+            ticker.cancel()
+            timeline.finish(loop.time() - start_time, stats.in_flight)
+            stats.timeline = None
+        if recorder is not None:
+            recorder.close()
+            stats.recorder = None
+    return stats
 
-    return results, errors
+def timeline_options(args):
+    """
+    Build the per-window metrics timeline settings from parsed arguments.
 
+    Args:
+        args (object): Parsed arguments; missing attributes fall back to the defaults.
+
+    Returns:
+        dict or None: Keyword arguments for `timeline.MetricsTimeline`, or None when no timeline was requested.
+    """
+    path = getattr(args, 'timeline', None)
+    if not path:
+        return None
+    return {"path": path, "window": getattr(args, 'timeline_window', 1.0)}
+
+def execution_options(args, concurrency):
+    """
+    Build the keyword arguments for `execute_load_test` from parsed arguments.
+
+    Args:
+        args (object): Parsed arguments; missing attributes fall back to the defaults.
+        concurrency (int): The maximum number of concurrent requests.
+
+    Returns:
+        dict: The arrival, connection pool, pre-warm, logging, scheduling, response check, recording,
+              live metrics and payload options, and the engine.
+    """
+    interarrival_file = getattr(args, 'interarrival_file', None)
+    return {
+        "arrival": getattr(args, 'arrival', 'fixed'),
+        "interarrivals": load_interarrivals(interarrival_file) if interarrival_file else None,
+        "session_options": connection_options(args, concurrency),
+        "prewarm": getattr(args, 'prewarm', 0),
+        "log_every": getattr(args, 'log_every', 0),
+        "timeline_options": timeline_options(args),
+        "tick": getattr(args, 'tick', 0.1),
+        "expect": response_check(args),
+        "recorder_options": recorder_options(args),
+        "metrics_options": metrics_options(args),
+        "engine": getattr(args, 'engine', 'async'),
+        "pipeline": getattr(args, 'pipeline', 1),
+        "payload_options": payload_options(args),
+    }
 
 async def run_load_test(url, qps, duration, concurrency, args):
     """
@@ -54,43 +260,173 @@ async def run_load_test(url, qps, duration, concurrency, args):
 
     Args:
         url (str): The URL to test.
-        qps (int): The target queries per second.
+        qps (float): The target queries per second.
         duration (int): The duration of the test in seconds.
         concurrency (int): The maximum number of concurrent requests.
         args (object): An object containing additional arguments, such as pattern, spike_duration, spike_load, and spike_interval.
     """
-    semaphore = await prepare_test(url, concurrency)
-    # Check the pattern and set up accordingly
-    if args.pattern == "periodic":
-        load_schedule = compute_load_schedule(args.pattern, qps, duration, concurrency,
-                                              spike_duration=args.spike_duration,
-                                              spike_load=args.spike_load,
-                                              spike_interval=args.spike_interval)
-    elif args.pattern == "spike":
-        load_schedule = compute_load_schedule(args.pattern, qps, duration, concurrency,
-                                              spike_duration=args.spike_duration,
-                                              spike_load=args.spike_load)
-    else:
-        load_schedule = compute_load_schedule(args.pattern, qps, duration, concurrency)
-    
-    print(f"Load Schedule: {load_schedule}")  # Debugging output
+    profile = profile_from_args(args, qps, duration)
+
+    precision = getattr(args, 'precision', 3)
+    processes = getattr(args, 'processes', 1)
+    options = execution_options(args, concurrency)
+    if getattr(args, 'engine', 'async') == "threaded":
+        await prepare_test(url, concurrency)
+        print(f"Load profile: {profile}, ~{profile.expected_requests()} requests, {concurrency} threads")
+        # The event loop idles meanwhile; its lag shows how contended the GIL is
+        health = RunStats(precision)
+        monitor = HealthMonitor(health).start()
+        stats = await asyncio.to_thread(run_threaded_test, url, profile, duration, concurrency,
+                                        args.method, args.data, precision, options["expect"],
+                                        options["session_options"]["timeout"])
+        monitor.stop()
+        stats.merge(health)
+        calculate_and_display_results(stats, duration)
+        save_run(args, stats, duration)
+        return
+    if processes > 1:
+        await prepare_test(url, concurrency)
+        print(f"Load profile: {profile}, ~{profile.expected_requests()} requests")
+        stats, process_results = await asyncio.to_thread(
+            run_in_processes, processes, url, profile, concurrency,
+            args.method, args.data, precision, **options)
+        calculate_and_display_results(stats, duration)
+        display_process_breakdown(process_results)
+        save_run(args, stats, duration)
+        return
+
+    stats = RunStats(precision)
+    async with connection_pool(url, stats, options["engine"], options.pop("session_options"),
+                               options["pipeline"]) as session:
+        # The raw pool cannot run the server info probe; it gets a throwaway aiohttp session
+        semaphore = await prepare_test(url, concurrency, None if options["engine"] == "raw" else session)
+        print(f"Load profile: {profile}, ~{profile.expected_requests()} requests")
+        await execute_load_test(url, profile, qps, duration, concurrency, semaphore,
+                                args.method, args.data, stats=stats, session=session, **options)
+    calculate_and_display_results(stats, duration)
+    save_run(args, stats, duration)
+
+def _run_partition(index, url, profile, concurrency, method, data, precision, options, log_level,
+                   barrier, queue):
+    # Entry point of each load generator process: wait for every sibling to be ready so they
+    # start together, run its share of the schedule on its own event loop, then ship back a snapshot
+    logging.basicConfig(level=logging.INFO, format=f"[process {index}] %(message)s")
+    logging.getLogger("async_worker").setLevel(log_level)
+    try:
+        stats = RunStats(precision)
+
+        async def partition():
+            semaphore = asyncio.Semaphore(concurrency)
+            barrier.wait(timeout=PROCESS_START_TIMEOUT)
+            start_time = time.perf_counter()
+            await execute_load_test(url, profile, 0, profile.duration, concurrency, semaphore, method, data,
+                                    stats=stats, show_progress=False, **options)
+            return time.perf_counter() - start_time
+
+        elapsed = (run_event_loop if options.get("engine") == "raw" else asyncio.run)(partition())
+        queue.put((index, stats.snapshot(), elapsed, None))
+    except Exception as e:
+        barrier.abort()
+        queue.put((index, None, 0.0, repr(e)))
+
+def run_in_processes(processes, url, profile, concurrency, method, data, precision=3, **options):
+    """
+    Run a load test across several processes, each driving its own event loop.
+
+    Each process offers 1/N of the rate, with its fixed-mode arrivals phase-shifted so the
+    processes interleave instead of firing together, and the concurrency budget is shared out
+    between them, as are the connection pool and pre-warmed connections. Every process starts
+    at the same moment and its statistics are merged into a single result once all of them have finished.
+
+    Args:
+        processes (int): The number of load generator processes.
+        url (str): The URL to test.
+        profile (RateProfile): The overall offered rate over time.
+        concurrency (int): The overall maximum number of concurrent requests.
+        method (str): The HTTP method to use (e.g. "GET", "POST").
+        data (dict): Optional data to send with the request.
+        precision (int): Significant figures kept by the latency histograms.
+        **options: Further keyword arguments for `execute_load_test` in each process,
+                   such as `arrival`, `session_options` and `prewarm`.
+
+    Returns:
+        tuple: The merged RunStats and a list of (index, RunStats, elapsed seconds) per process.
+    """
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    queue = context.Queue()
+    share = profile.scaled(1 / processes)
+    log_level = logging.getLogger("async_worker").getEffectiveLevel()
+    workers = []
+    for index in range(processes):
+        process_options = dict(options, phase=index / processes)
+        if "session_options" in options:
+            pool_size = options["session_options"].get("pool_size", concurrency)
+            process_options["session_options"] = dict(options["session_options"],
+                                                      pool_size=_share(pool_size, processes, index))
+        if options.get("timeline_options"):
+            # One file per process, e.g. timeline.csv -> timeline.p0.csv
+            stem, extension = os.path.splitext(options["timeline_options"]["path"])
+            process_options["timeline_options"] = dict(options["timeline_options"],
+                                                       path=f"{stem}.p{index}{extension}")
+        if options.get("recorder_options"):
+            # Same for raw samples, tagged with the process index
+            stem, extension = os.path.splitext(options["recorder_options"]["path"])
+            process_options["recorder_options"] = dict(options["recorder_options"],
+                                                       path=f"{stem}.p{index}{extension}", worker=index)
+        if options.get("metrics_options"):
+            # Each process serves its own endpoint on consecutive ports
+            process_options["metrics_options"] = dict(options["metrics_options"],
+                                                      port=options["metrics_options"]["port"] + index)
+        if options.get("payload_options"):
+            # Interleave the sequence numbers of the processes so bodies stay unique
+            process_options["payload_options"] = dict(options["payload_options"], worker=index, workers=processes)
+        if options.get("prewarm"):
+            process_options["prewarm"] = _share(options["prewarm"], processes, index)
+        workers.append(context.Process(
+            target=_run_partition,
+            args=(index, url, share, _share(concurrency, processes, index), method, data, precision,
+                  process_options, log_level, barrier, queue)))
+    for process in workers:
+        process.start()
+
+    merged = RunStats(precision)
+    process_results = []
+    failures = []
+    for _ in workers:
+        index, snapshot, elapsed, error = queue.get()
+        if error:
+            failures.append(f"process {index}: {error}")
+            continue
+        stats = RunStats.from_snapshot(snapshot)
+        merged.merge(stats)
+        process_results.append((index, stats, elapsed))
+    for process in workers:
+        process.join()
+
+    if failures:
+        raise RuntimeError("Load generator processes failed: " + "; ".join(failures))
+    return merged, sorted(process_results, key=lambda result: result[0])
 
-    results, errors = await execute_load_test(url, load_schedule, qps, duration, concurrency, semaphore, args.method, args.data)
-    calculate_and_display_results(results, errors, duration)
+def _share(total, parts, index):
+    # Split a budget as evenly as possible, never handing out less than one
+    return max(1, total // parts + (1 if index < total % parts else 0))
 
-async def prepare_test(url, concurrency):
+async def prepare_test(url, concurrency, session=None):
     """
     Prepare the load test by fetching server information and setting up the semaphore.
 
     Args:
         url (str): The URL to test.
         concurrency (int): The maximum number of concurrent requests.
+        session (aiohttp.ClientSession, optional): The session to probe the server with, so the
+                                                   connection it opens can be reused by the test.
 
     Returns:
         asyncio.Semaphore: A semaphore to limit concurrency.
     """
 
-    server_info = await fetch_server_info(url)
+    server_info = await fetch_server_info(url, session)
     print("-------- Server info --------")
     print(f"Server Software: {server_info}")
     print(f"Host: {url}\n")
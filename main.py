@@ -1,5 +1,10 @@
 import asyncio
-from parser import setup_parser
+import logging
+import sys
+from parser import setup_analyze_parser, setup_compare_parser, setup_parser, setup_targets_parser
+from payload import payload_options
+from raw_client import run
+from replay import check_request_specs
 
 def main():
     """
@@ -15,14 +20,122 @@ def main():
     Returns:
         None
     """
+    if sys.argv[1:2] == ["analyze"]:
+        # Offline analysis of recorded samples; no target URL involved
+        parser = setup_analyze_parser()
+        args = parser.parse_args(sys.argv[2:])
+        if args.window <= 0:
+            parser.error("--window must be positive")
+        try:
+            args.func(args)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        return
+    if sys.argv[1:2] == ["compare"]:
+        # Offline comparison of saved runs; exits with 1 if the candidate regressed
+        parser = setup_compare_parser()
+        args = parser.parse_args(sys.argv[2:])
+        if not 0 < args.confidence < 1:
+            parser.error("--confidence must be between 0 and 1")
+        if args.resamples < 1:
+            parser.error("--resamples must be at least 1")
+        try:
+            sys.exit(args.func(args))
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(str(e))
+
+    if sys.argv[1:2] == ["targets"]:
+        # Several targets from one configuration file, each with its own URL and settings
+        parser = setup_targets_parser()
+        args = parser.parse_args(sys.argv[2:])
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        try:
+            args.func(args)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        return
+
     # Create the top-level parser
     parser = setup_parser()
     args = parser.parse_args()
 
     if not hasattr(args, 'func'):
         parser.error("No load pattern selected!")
+    if args.arrival == "custom" and not args.interarrival_file:
+        parser.error("--arrival custom requires --interarrival_file")
+    if args.expect_checksum is not None:
+        try:
+            int(args.expect_checksum, 16)
+        except ValueError:
+            parser.error("--expect_checksum must be a hexadecimal number")
+    if args.tick <= 0:
+        parser.error("--tick must be positive")
+    if args.pattern in ("steps", "search") and args.step_duration <= 0:
+        parser.error("--step_duration must be positive")
+    if args.pattern == "sine" and args.period <= 0:
+        parser.error("--period must be positive")
+    if args.timeline_window <= 0:
+        parser.error("--timeline_window must be positive")
+    if args.timeout <= 0:
+        parser.error("--timeout must be positive")
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+    if args.engine == "threaded":
+        if args.pattern in ("replay", "search", "scenario") or args.processes > 1 or args.arrival != "fixed" \
+                or args.record or args.metrics_port or args.timeline:
+            parser.error("the threaded engine runs load patterns in one process with token bucket pacing; "
+                         "replay, search, scenario, --processes, --arrival, --record, --metrics_port and --timeline "
+                         "need the async engine")
+        if args.prewarm or args.no_keepalive or args.pool_size or args.per_host_limit:
+            parser.error("the threaded engine keeps one persistent connection per thread; "
+                         "--prewarm, --no_keepalive, --pool_size and --per_host_limit need the async engine")
+    if args.pipeline < 1:
+        parser.error("--pipeline must be at least 1")
+    if args.pipeline > 1 and args.engine != "raw":
+        parser.error("--pipeline needs the raw engine")
+    if args.engine == "raw" and (args.pattern in ("replay", "search", "scenario") or args.no_keepalive):
+        parser.error("the raw engine keeps persistent connections to the URL's origin and runs load patterns only; "
+                     "replay, search, scenario and --no_keepalive need the async engine")
+    if args.record and args.pattern in ("search", "scenario"):
+        parser.error(f"--record is not supported by {args.pattern}")
+    if args.save_run and args.pattern == "search":
+        parser.error("--save_run is not supported by search, which runs many steps")
+    if args.pattern == "search":
+        if args.timeline:
+            parser.error("--timeline is not supported by search, which prints one line per step instead")
+        if args.step_qps <= 0:
+            parser.error("--step_qps must be positive")
+        start_qps = args.start_qps or int(args.qps)
+        if start_qps < 1:
+            parser.error("the search must start at 1 QPS or more (--start_qps, or --qps)")
+        if start_qps > args.max_qps:
+            parser.error(f"the search starts at {start_qps} QPS, above --max_qps {args.max_qps}")
+    if args.payload_template:
+        if args.data:
+            parser.error("--payload_template replaces --data; use one or the other")
+        if args.engine == "threaded" or args.pattern in ("replay", "scenario"):
+            parser.error("--payload_template is not supported by the threaded engine, replay or scenario, "
+                         "whose bodies come from --data or their request specs")
+        if args.payload_batch < 1:
+            parser.error("--payload_batch must be at least 1")
+        try:
+            payload_options(args)
+        except (OSError, ValueError) as e:
+            parser.error(f"--payload_template: {e}")
+    elif args.payload_data:
+        parser.error("--payload_data needs --payload_template")
+    if args.pattern == "replay":
+        try:
+            check_request_specs(args.file, args.url, args.timing)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if args.pattern in ("replay", "search", "scenario") and args.processes > 1:
+        parser.error(f"{args.pattern} runs in a single process; --processes is not supported")
 
-    asyncio.run(args.func(args.url, args.qps, args.duration, args.concurrency, args))
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.debug:
+        logging.getLogger("async_worker").setLevel(logging.DEBUG)
+    (run if args.engine == "raw" else asyncio.run)(args.func(args.url, args.qps, args.duration, args.concurrency, args))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
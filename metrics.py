@@ -0,0 +1,217 @@
+import asyncio
+import bisect
+import contextlib
+import time
+from collections import Counter, deque
+from aiohttp import web
+
+# Upper bounds, in seconds, of the exported latency histogram buckets
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+RATE_WINDOW = 10  # Seconds over which the achieved rate is averaged
+
+class MetricsExporter:
+    """
+    Live OpenMetrics endpoint for a running test, served from the test's own event loop.
+
+    Completed requests are counted by status into plain counters and a fixed-bucket latency
+    histogram, in O(1) and without locks since everything runs on one loop. A scrape only
+    formats those counters, together with the in-flight gauge of the attached statistics and
+    the target rate of the load profile at the current offset, so its cost does not grow with
+    the number of requests. The achieved rate is averaged over the last `RATE_WINDOW` seconds
+    from once-a-second samples of the completed count.
+
+    Use as an async context manager; statistics are attached with `attach`, after which
+    `RunStats.record` feeds the exporter.
+
+    Args:
+        port (int): The port to serve `/metrics` on.
+        host (str): The host to bind to.
+        buckets (list[float]): Latency histogram bucket upper bounds in seconds, in increasing order.
+    """
+
+    def __init__(self, port, host="127.0.0.1", buckets=LATENCY_BUCKETS):
+        self.port = port
+        self.host = host
+        self.buckets = list(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.latency_sum = 0.0
+        self.completed = 0
+        self.dispatched = 0
+        self.statuses = Counter()
+        self.stats = None
+        self.target = None
+        self.started_at = None
+        self._rate_samples = deque(maxlen=RATE_WINDOW + 1)
+        self._runner = None
+        self._sampler = None
+
+    def attach(self, stats, target=None):
+        """
+        Export the statistics of a run; counters carry on across runs attached in turn.
+
+        Args:
+            stats (RunStats): The statistics to feed from and read the in-flight gauge of.
+            target (callable, optional): The offered rate as a function of the offset since dispatch
+                                         started, such as a `load_patterns.RateProfile`.
+        """
+        stats.metrics = self
+        self.stats = stats
+        self.target = target
+        self.started_at = None
+
+    def dispatch_started(self, started_at):
+        """
+        Mark the event loop time dispatch started at, the origin of the target rate's offsets.
+
+        Args:
+            started_at (float): The event loop time.
+        """
+        self.started_at = started_at
+
+    def record(self, response_time, status):
+        """
+        Count a completed request.
+
+        Args:
+            response_time (float): The response time in seconds.
+            status (int or str): The response status, or an error message if the request failed.
+        """
+        self.completed += 1
+        self.latency_sum += response_time
+        self.bucket_counts[bisect.bisect_left(self.buckets, response_time)] += 1
+        # Error messages are unbounded; keep the label set small
+        self.statuses[status if isinstance(status, int) else "error"] += 1
+
+    def achieved_rate(self, now=None):
+        """
+        Completed requests per second over the last `RATE_WINDOW` seconds.
+
+        Args:
+            now (float): The current `perf_counter` time; read from the clock if omitted.
+
+        Returns:
+            float: The achieved rate, 0 before the first sample.
+        """
+        if not self._rate_samples:
+            return 0.0
+        now = time.perf_counter() if now is None else now
+        since, completed = self._rate_samples[0]
+        return (self.completed - completed) / (now - since) if now > since else 0.0
+
+    def target_rate(self):
+        """
+        The offered rate at the current offset, 0 when no profile is attached or dispatch has not started.
+        """
+        if self.target is None or self.started_at is None:
+            return 0.0
+        return float(self.target(asyncio.get_running_loop().time() - self.started_at))
+
+    def render(self):
+        """
+        Format the current values in the OpenMetrics text format.
+
+        Returns:
+            str: The exposition, ending with `# EOF`.
+
+        Example:
+            >>> from stats import RunStats
+            >>> exporter = MetricsExporter(9100, buckets=[0.1, 1.0])
+            >>> stats = RunStats()
+            >>> exporter.attach(stats)
+            >>> for response_time, status in [(0.05, 200), (0.5, 200), (2.0, 503), (0.2, "Timeout")]:
+            ...     stats.record(response_time, status)
+            >>> text = exporter.render()
+            >>> text.endswith("# EOF\\n")
+            True
+            >>> samples = dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+            >>> [samples[f'loadtest_requests_total{{status="{status}"}}'] for status in ("200", "503", "error")]
+            ['2', '1', '1']
+            >>> [samples[f'loadtest_latency_seconds_bucket{{le="{bound}"}}'] for bound in ("0.1", "1", "+Inf")]
+            ['1', '3', '4']
+            >>> samples["loadtest_latency_seconds_sum"], samples["loadtest_latency_seconds_count"]
+            ('2.750000', '4')
+        """
+        lines = [
+            "# TYPE loadtest_requests counter",
+            "# HELP loadtest_requests Completed requests by HTTP status; client-side failures are status=\"error\".",
+        ]
+        lines.extend(f'loadtest_requests_total{{status="{status}"}} {count}'
+                     for status, count in sorted(self.statuses.items(), key=lambda item: str(item[0])))
+        lines += [
+            "# TYPE loadtest_dispatched counter",
+            "# HELP loadtest_dispatched Requests launched, including those still in flight or waiting for a slot.",
+            f"loadtest_dispatched_total {self.dispatched}",
+            "# TYPE loadtest_in_flight gauge",
+            "# HELP loadtest_in_flight Requests currently in flight.",
+            f"loadtest_in_flight {self.stats.in_flight if self.stats is not None else 0}",
+            "# TYPE loadtest_target_rate gauge",
+            "# HELP loadtest_target_rate Offered rate of the load profile right now.",
+            f"loadtest_target_rate {self.target_rate():.6g}",
+            "# TYPE loadtest_achieved_rate gauge",
+            "# HELP loadtest_achieved_rate Completed requests per second over the last few seconds.",
+            f"loadtest_achieved_rate {self.achieved_rate():.6g}",
+            "# TYPE loadtest_latency_seconds histogram",
+            "# UNIT loadtest_latency_seconds seconds",
+            "# HELP loadtest_latency_seconds Response time of completed requests.",
+        ]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            cumulative += count
+            lines.append(f'loadtest_latency_seconds_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'loadtest_latency_seconds_bucket{{le="+Inf"}} {self.completed}')
+        lines.append(f"loadtest_latency_seconds_sum {self.latency_sum:.6f}")
+        lines.append(f"loadtest_latency_seconds_count {self.completed}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, request):
+        return web.Response(body=self.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def _sample_rate(self):
+        while True:
+            self._rate_samples.append((time.perf_counter(), self.completed))
+            await asyncio.sleep(1)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._sampler = asyncio.create_task(self._sample_rate())
+        print(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._sampler.cancel()
+        await self._runner.cleanup()
+        if self.stats is not None:
+            self.stats.metrics = None
+
+def metrics_options(args):
+    """
+    Build the metrics endpoint settings from parsed arguments.
+
+    Args:
+        args (object): Parsed arguments; missing attributes fall back to the defaults.
+
+    Returns:
+        dict or None: Keyword arguments for `MetricsExporter`, or None when no endpoint was requested.
+    """
+    port = getattr(args, 'metrics_port', None)
+    if not port:
+        return None
+    return {"port": port, "host": getattr(args, 'metrics_host', '127.0.0.1')}
+
+def serve_metrics(options):
+    """
+    Serve metrics for the duration of an `async with` block, if requested.
+
+    Args:
+        options (dict): Settings from `metrics_options`, or None.
+
+    Returns:
+        The `MetricsExporter` to enter, or a null context yielding None.
+    """
+    return MetricsExporter(**options) if options else contextlib.nullcontext()
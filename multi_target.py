@@ -0,0 +1,176 @@
+import asyncio
+import contextlib
+import json
+import time
+from types import SimpleNamespace
+from baseline import save_run
+from load_patterns import RATE_PATTERNS, profile_from_args
+from load_tester import connection_pool, execute_load_test, execution_options, prepare_test
+from raw_client import run
+from stats import RunStats
+from utils import calculate_and_display_results, display_process_breakdown
+
+# Options a pattern cannot do without, as they have no default, and a placeholder value to parse the other defaults with
+REQUIRED_PATTERN_ARGS = {"ramp": ("end_qps", "0"), "curve": ("points", "0:0")}
+# Files and ports a target writes to or listens on, which targets in one process cannot share
+EXCLUSIVE_ARGS = ["metrics_port", "timeline", "record"]
+
+def load_targets(file_path, selected=None):
+    """
+    Load target configurations in the format of `beta_distributed/config.json`, checking that every
+    target runs a load pattern with the options it requires, and that no two targets share a metrics
+    port, timeline file or record file.
+
+    Args:
+        file_path (str): The JSON file, a list of objects with url, qps, duration, concurrency and args.
+        selected (list[int]): Indices of the configurations to keep; all of them if omitted.
+
+    Returns:
+        list[dict]: The configurations.
+    """
+    with open(file_path, 'r') as file:
+        configurations = json.load(file)
+    if not isinstance(configurations, list) or not configurations:
+        raise ValueError(f"{file_path} must hold a non-empty list of target configurations")
+    if selected is not None:
+        if any(not 0 <= index < len(configurations) for index in selected):
+            raise ValueError(f"--only indices must be between 0 and {len(configurations) - 1}")
+        configurations = [configurations[index] for index in selected]
+    for index, config in enumerate(configurations):
+        missing = [field for field in ("url", "qps", "duration", "concurrency") if field not in config]
+        if missing:
+            raise ValueError(f"target {index} is missing {', '.join(missing)}")
+        args = config.get("args", {})
+        if args.get("engine") == "threaded":
+            raise ValueError(f"target {index}: the threaded engine cannot share an event loop with other targets")
+        if "precision" in args:
+            # Every target's histograms are merged into the combined report
+            raise ValueError(f"target {index}: precision is set for all targets with --precision")
+        pattern = args.get("pattern", "steady")
+        if pattern not in RATE_PATTERNS:
+            raise ValueError(f"target {index}: pattern {pattern} is not supported, use one of {', '.join(RATE_PATTERNS)}")
+        required, _ = REQUIRED_PATTERN_ARGS.get(pattern, (None, None))
+        if required and required not in args:
+            raise ValueError(f"target {index}: the {pattern} pattern needs {required}")
+    for field in EXCLUSIVE_ARGS:
+        owners = {}
+        for index, config in enumerate(configurations):
+            value = config.get("args", {}).get(field)
+            if value is not None:
+                if value in owners:
+                    raise ValueError(f"targets {owners[value]} and {index} both use {field} {value}")
+                owners[value] = index
+    return configurations
+
+def target_args(config):
+    """
+    Build a target's arguments: the `main.py` defaults for its pattern, overridden by its `args`.
+
+    Args:
+        config (dict): A target configuration, checked by `load_targets`.
+
+    Returns:
+        SimpleNamespace: The arguments.
+
+    Example:
+        >>> args = target_args({"url": "http://example.com", "args": {"pattern": "spike", "spike_load": 30}})
+        >>> args.spike_duration, args.spike_load, args.method
+        (10, 30, 'GET')
+    """
+    # Imported here, as the parser imports this module for the targets command
+    from parser import setup_parser
+
+    args = config.get("args", {})
+    pattern = args.get("pattern", "steady")
+    argv = [config["url"], pattern]
+    if pattern in REQUIRED_PATTERN_ARGS:
+        # The target's own value replaces the placeholder below
+        argv.append("--%s=%s" % REQUIRED_PATTERN_ARGS[pattern])
+    defaults = vars(setup_parser().parse_args(argv))
+    return SimpleNamespace(**dict(defaults, **args))
+
+def target_label(config):
+    """
+    Name a target in reports: its `name` if the configuration has one, else its method and URL.
+
+    Example:
+        >>> target_label({"url": "http://example.com", "args": {"method": "POST"}})
+        'POST http://example.com'
+    """
+    return config.get("name") or f"{config.get('args', {}).get('method', 'GET')} {config['url']}"
+
+async def run_targets(configurations, precision=3):
+    """
+    Run several load tests at once on one event loop, one per target configuration.
+
+    Every target keeps its own rate profile and schedule, concurrency semaphore, connection pool
+    and statistics, exactly as if it ran alone; they only share the event loop and the process.
+    Targets start together, each running for its own duration.
+
+    Args:
+        configurations (list[dict]): Target configurations (url, qps, duration, concurrency and args,
+                                     which holds any `main.py` option, e.g. pattern, method and data).
+        precision (int): Significant figures of the latency histograms.
+
+    Returns:
+        list[tuple]: (label, RunStats, duration) for each target, in configuration order.
+    """
+    targets = []
+    async with contextlib.AsyncExitStack() as stack:
+        for index, config in enumerate(configurations):
+            args = target_args(config)
+            concurrency = config["concurrency"]
+            options = execution_options(args, concurrency)
+            if options["recorder_options"]:
+                # Tag samples with the target index, so `analyze --worker` can tell targets apart
+                options["recorder_options"] = dict(options["recorder_options"], worker=index)
+            stats = RunStats(precision)
+            session = await stack.enter_async_context(
+                connection_pool(config["url"], stats, options["engine"], options.pop("session_options"),
+                                options["pipeline"]))
+            semaphore = await prepare_test(config["url"], concurrency, None if options["engine"] == "raw" else session)
+            profile = profile_from_args(args, config["qps"], config["duration"])
+            print(f"Target {target_label(config)}: {profile}, ~{profile.expected_requests()} requests, "
+                  f"concurrency {concurrency}")
+            targets.append((config, args, stats, session, semaphore, profile, options))
+
+        print(f"Running {len(targets)} targets")
+        start_time = time.perf_counter()
+        await asyncio.gather(*(
+            execute_load_test(config["url"], profile, 0, profile.duration, config["concurrency"], semaphore,
+                              getattr(args, 'method', 'GET'), getattr(args, 'data', None), stats=stats,
+                              show_progress=False, session=session, **options)
+            for config, args, stats, session, semaphore, profile, options in targets))
+        print(f"All targets finished in {time.perf_counter() - start_time:.2f}s")
+
+    return [(target_label(config), stats, profile.duration)
+            for config, args, stats, session, semaphore, profile, options in targets]
+
+def run_config(args):
+    """
+    Entry point of the `targets` command: run every target of a configuration file at once and report
+    on each of them and on all of them combined.
+
+    Args:
+        args (object): Parsed arguments with config, only, precision and save_run.
+
+    Returns:
+        RunStats: The combined statistics of all targets.
+    """
+    configurations = load_targets(args.config, args.only)
+    # The raw engine's runner also serves aiohttp sessions; only pick it when a target needs it
+    raw = any(config.get("args", {}).get("engine") == "raw" for config in configurations)
+    results = (run if raw else asyncio.run)(run_targets(configurations, args.precision))
+
+    combined = RunStats(args.precision)
+    for label, stats, duration in results:
+        print(f"\n======== Target {label} ========")
+        calculate_and_display_results(stats, duration)
+        combined.merge(stats)
+    duration = max(duration for label, stats, duration in results)
+    print("\n======== All targets ========")
+    calculate_and_display_results(combined, duration)
+    display_process_breakdown(results, title="Per-target results", label="Target")
+    save_run(SimpleNamespace(save_run=args.save_run, url=[config["url"] for config in configurations],
+                             duration=duration, pattern="targets"), combined, duration)
+    return combined
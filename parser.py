@@ -1,6 +1,16 @@
 from argparse import ArgumentParser
 import json
+from capacity_search import run_capacity_search
+from http_client import CHECKSUMS
+from load_patterns import parse_curve_points
 from load_tester import run_load_test
+from baseline import parse_thresholds, run_compare
+from recorder import run_analyze
+from multi_target import run_config
+from replay import run_replay
+from scenario import run_scenario
+from scheduler import ARRIVAL_MODES
+from utils import REPORTED_PERCENTILES
 
 def setup_parser():
     """
@@ -15,7 +25,7 @@ def setup_parser():
         >>> args.url
         'https://example.com'
         >>> args.qps
-        5
+        5.0
         >>> args.concurrency
         20
         >>> args.pattern
@@ -23,12 +33,75 @@ def setup_parser():
     """
     parser = ArgumentParser(description="Asynchronous HTTP Load Tester")
     parser.add_argument("url", type=str, help="URL to test")
-    parser.add_argument("--qps", type=int, default=1, help="Queries per second")
+    parser.add_argument("--qps", type=float, default=1, help="Queries per second; fractional rates are allowed")
     parser.add_argument("--method", type=str, default="GET", choices=["GET", "POST", "PUT", "DELETE", "PATCH", "HEAD"],
                     help="HTTP method to use for the requests")
     parser.add_argument("--data", type=json.loads, default={}, help="Data to send with the request; expected JSON format")
+    parser.add_argument("--payload_template", type=str, default=None,
+                    help="File whose contents are sent as the body of every request, with {{seq}}, {{uuid}}, "
+                         "{{int:LOW:HIGH}}, {{float:LOW:HIGH}}, {{string:N}} or {{string:MIN:MAX}} and {{row.FIELD}} "
+                         "placeholders filled in anew for each request; replaces --data")
+    parser.add_argument("--payload_data", type=str, default=None,
+                    help="CSV (with a header line) or JSON Lines file that {{row.FIELD}} placeholders sample rows from")
+    parser.add_argument("--payload_content_type", type=str, default="application/json",
+                    help="Content-Type of the --payload_template bodies")
+    parser.add_argument("--payload_batch", type=int, default=10000,
+                    help="Number of bodies rendered ahead at a time; the next batch is rendered in the background")
+    parser.add_argument("--payload_seed", type=int, default=None, help="Random seed of the payload placeholders")
     parser.add_argument("--duration", type=int, default=10, help="Duration of test in seconds")
     parser.add_argument("-c", "--concurrency", type=int, default=10, help="Maximum number of concurrent requests")
+    parser.add_argument("--engine", type=str, default="async", choices=["async", "threaded", "raw"],
+                    help="Send requests from the asyncio event loop with aiohttp; from a pool of --concurrency threads "
+                         "with one requests.Session each, paced by a shared token bucket; or with raw, a minimal "
+                         "HTTP/1.1 client on asyncio protocols (and uvloop when installed) for cheap endpoints")
+    parser.add_argument("--pipeline", type=int, default=1,
+                    help="Requests in flight per connection with the raw engine (HTTP/1.1 pipelining)")
+    parser.add_argument("--arrival", type=str, default="fixed", choices=ARRIVAL_MODES,
+                    help="How requests are spread within each second: evenly, as a Poisson process, or from --interarrival_file")
+    parser.add_argument("--interarrival_file", type=str, default=None,
+                    help="File of normalized inter-arrival gaps (mean 1.0), one per line; used by --arrival custom")
+    parser.add_argument("--tick", type=float, default=0.1,
+                    help="Seconds between samples of the rate curve; smaller ticks follow fast-changing patterns more closely")
+    parser.add_argument("--precision", type=int, default=3, choices=range(1, 6),
+                    help="Significant figures kept by the latency histograms")
+    parser.add_argument("--processes", type=int, default=1,
+                    help="Number of load generator processes; the rate and concurrency are split evenly between them")
+    parser.add_argument("--pool_size", type=int, default=None,
+                    help="Maximum number of open connections; defaults to the concurrency")
+    parser.add_argument("--per_host_limit", type=int, default=0,
+                    help="Maximum number of open connections per host (0 means only --pool_size applies)")
+    parser.add_argument("--no_keepalive", action="store_true",
+                    help="Open a new connection for every request instead of reusing pooled ones")
+    parser.add_argument("--dns_ttl", type=int, default=10,
+                    help="Seconds to cache DNS lookups; 0 disables the cache")
+    parser.add_argument("--timeout", type=float, default=300,
+                    help="Seconds a request may take before it counts as an error; with the threaded engine, "
+                         "seconds to wait for the connection and for each read")
+    parser.add_argument("--prewarm", type=int, default=0,
+                    help="Number of connections to open before the test clock starts")
+    parser.add_argument("--log_every", type=int, default=0,
+                    help="Log one in every N completed requests (0 disables per-request logging)")
+    parser.add_argument("--debug", action="store_true", help="Log every completed request")
+    parser.add_argument("--expect_size", type=int, default=None,
+                    help="Count successful responses whose body is not exactly this many bytes as errors")
+    parser.add_argument("--expect_checksum", type=str, default=None,
+                    help="Count successful responses whose body checksum (hex) differs as errors")
+    parser.add_argument("--checksum", type=str, default="adler32", choices=list(CHECKSUMS),
+                    help="Checksum used by --expect_checksum")
+    parser.add_argument("--timeline", type=str, default=None,
+                    help="Write per-window RPS, latency, errors and in-flight requests to this file while the test runs "
+                         "(CSV if it ends in .csv, JSON lines otherwise)")
+    parser.add_argument("--timeline_window", type=float, default=1.0, help="Timeline window length in seconds")
+    parser.add_argument("--metrics_port", type=int, default=None,
+                    help="Serve live OpenMetrics (request counts by status, in-flight, latency histogram, target and "
+                         "achieved rate) on this port at /metrics while the test runs; with --processes, process N "
+                         "serves on the port + N")
+    parser.add_argument("--metrics_host", type=str, default="127.0.0.1", help="Address to serve --metrics_port on")
+    parser.add_argument("--save_run", type=str, default=None,
+                    help="Save the run's histograms and settings to this JSON file, as a baseline for `main.py compare`")
+    parser.add_argument("--record", type=str, default=None,
+                    help="Append every request's dispatch offset, latency, status, bytes and worker to this binary "
+                         "file for `main.py analyze` (async engine; one file per process, e.g. samples.p0.bin)")
 
     # Subparsers for each load pattern
     subparsers = parser.add_subparsers(dest='pattern', required=True, help='Load pattern configurations', title='load patterns')
@@ -54,5 +127,143 @@ def setup_parser():
     periodic_parser.add_argument("--spike_duration", type=int, default=5, help="Duration of each spike in seconds")
     periodic_parser.add_argument("--spike_load", type=int, default=20, help="Concurrency level during each spike")
     periodic_parser.set_defaults(func=run_load_test, pattern='periodic')
+
+    # Linear ramp
+    ramp_parser = subparsers.add_parser('ramp', help='Linear ramp from --start_qps to --end_qps over the duration')
+    ramp_parser.add_argument("--start_qps", type=float, default=None, help="Rate at the start (defaults to --qps)")
+    ramp_parser.add_argument("--end_qps", type=float, required=True, help="Rate at the end")
+    ramp_parser.set_defaults(func=run_load_test, pattern='ramp')
+
+    # Step ladder
+    steps_parser = subparsers.add_parser('steps', help='Rate climbing by --step_qps every --step_duration seconds')
+    steps_parser.add_argument("--step_qps", type=float, default=10, help="Rate added at each step")
+    steps_parser.add_argument("--step_duration", type=float, default=10, help="Duration of each step in seconds")
+    steps_parser.set_defaults(func=run_load_test, pattern='steps')
+
+    # Sine wave, e.g. a diurnal cycle with --period 86400
+    sine_parser = subparsers.add_parser('sine', help='Rate oscillating around --qps')
+    sine_parser.add_argument("--amplitude", type=float, default=None, help="Swing around --qps (defaults to half of --qps)")
+    sine_parser.add_argument("--period", type=float, default=60, help="Period in seconds; 86400 for a diurnal cycle")
+    sine_parser.set_defaults(func=run_load_test, pattern='sine')
+
+    # User-supplied piecewise curve
+    curve_parser = subparsers.add_parser('curve', help='Piecewise linear rate curve')
+    curve_parser.add_argument("--points", type=parse_curve_points, required=True,
+                    help="Comma-separated offset:qps pairs joined by straight lines, e.g. 0:10,60:100,120:20")
+    curve_parser.set_defaults(func=run_load_test, pattern='curve')
+
+    # Capacity search under an SLO
+    search_parser = subparsers.add_parser('search', help='Find the highest QPS the target sustains within an SLO')
+    search_parser.add_argument("--start_qps", type=int, default=None, help="First rate to try (defaults to --qps)")
+    search_parser.add_argument("--step_qps", type=int, default=10,
+                    help="Ramp increment, and resolution of the binary search")
+    search_parser.add_argument("--max_qps", type=int, default=1000, help="Highest rate to try")
+    search_parser.add_argument("--step_duration", type=int, default=10, help="Duration of each step in seconds")
+    search_parser.add_argument("--strategy", type=str, default="linear", choices=["linear", "binary"],
+                    help="Ramp step by step until the SLO breaks, or bisect between --start_qps and --max_qps")
+    search_parser.add_argument("--slo_p99", type=float, default=0.5, help="p99 latency objective in seconds")
+    search_parser.add_argument("--max_error_rate", type=float, default=1.0, help="Highest acceptable error rate in percent")
+    search_parser.add_argument("--cooldown", type=float, default=0.0, help="Seconds to pause between steps")
+    search_parser.set_defaults(func=run_capacity_search, pattern='search')
+
+    # Replay of recorded or synthetic traffic
+    replay_parser = subparsers.add_parser('replay', help='Replay request specs from a JSON Lines file')
+    replay_parser.add_argument("file", type=str,
+                    help="JSON Lines file of request specs (method, path or url, headers, body, weight, timestamp, name)")
+    replay_parser.add_argument("--timing", type=str, default="scheduled", choices=["scheduled", "recorded"],
+                    help="Dispatch at --qps, cycling through the file, or at the recorded timestamps")
+    replay_parser.add_argument("--speed", type=float, default=1.0,
+                    help="Speed multiplier for recorded timing")
+    replay_parser.add_argument("--shuffle_buffer", type=int, default=1000,
+                    help="Number of specs buffered to interleave the mix in scheduled timing; 1 keeps file order")
+    replay_parser.set_defaults(func=run_replay, pattern='replay')
+
+    # Closed-loop virtual users
+    scenario_parser = subparsers.add_parser('scenario', help='Virtual users repeating a multi-step flow with think times')
+    scenario_parser.add_argument("file", type=str,
+                    help="JSON scenario: steps (request specs with extract and think) and initial variables")
+    scenario_parser.add_argument("--users", type=int, default=None, help="Number of virtual users (defaults to the concurrency)")
+    scenario_parser.add_argument("--ramp_up", type=float, default=0.0, help="Seconds over which the users are started")
+    scenario_parser.add_argument("--iterations", type=int, default=0,
+                    help="Flows per user; 0 repeats the flow until --duration is over")
+    scenario_parser.set_defaults(func=run_scenario, pattern='scenario')
     
-    return parser
\ No newline at end of file
+    return parser
+
+def setup_analyze_parser():
+    """
+    Sets up an ArgumentParser for `main.py analyze`, which summarizes sample files written with --record.
+
+    Returns:
+        ArgumentParser: The parser object.
+
+    Example:
+        >>> args = setup_analyze_parser().parse_args(["samples.bin", "--start", "10", "--window", "5"])
+        >>> args.files, args.start, args.end, args.window
+        (['samples.bin'], 10.0, None, 5.0)
+    """
+    parser = ArgumentParser(prog="main.py analyze", description="Analyze raw samples recorded with --record")
+    parser.add_argument("files", type=str, nargs='+', help="Sample files, analyzed together")
+    parser.add_argument("--start", type=float, default=None, help="Ignore requests dispatched before this offset in seconds")
+    parser.add_argument("--end", type=float, default=None, help="Ignore requests dispatched at or after this offset in seconds")
+    parser.add_argument("--worker", type=int, default=None, help="Only analyze the samples of this process or worker")
+    parser.add_argument("--window", type=float, default=1.0, help="Timeline window length in seconds")
+    parser.add_argument("--percentiles", type=lambda value: [float(p) for p in value.split(",")],
+                    default=REPORTED_PERCENTILES, help="Comma-separated latency percentiles to report")
+    parser.add_argument("--timeline", type=str, default=None, help="Write the timeline to this CSV file instead of printing it")
+    parser.set_defaults(func=run_analyze)
+    return parser
+
+def setup_compare_parser():
+    """
+    Sets up an ArgumentParser for `main.py compare`, which checks a run saved with --save_run against a baseline.
+
+    Returns:
+        ArgumentParser: The parser object.
+
+    Example:
+        >>> args = setup_compare_parser().parse_args(["base.json", "new.json", "--max_increase", "50:5,99:20"])
+        >>> args.baseline, args.candidate, args.max_increase, args.confidence
+        ('base.json', 'new.json', {50.0: 5.0, 99.0: 20.0}, 0.95)
+    """
+    parser = ArgumentParser(prog="main.py compare", description="Compare a run saved with --save_run against a baseline")
+    parser.add_argument("baseline", type=str, help="The baseline run summary")
+    parser.add_argument("candidate", type=str, help="The run summary to check")
+    parser.add_argument("--percentiles", type=lambda value: [float(p) for p in value.split(",")],
+                    default=[50.0, 90.0, 99.0], help="Comma-separated latency percentiles to compare")
+    parser.add_argument("--max_increase", type=parse_thresholds, default=10.0,
+                    help="Allowed latency increase in percent, for every percentile or per percentile as e.g. 50:5,99:20; "
+                         "percentiles left out are reported without a verdict")
+    parser.add_argument("--max_error_increase", type=float, default=1.0,
+                    help="Allowed error rate increase in percentage points")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the bootstrap intervals")
+    parser.add_argument("--resamples", type=int, default=2000, help="Number of bootstrap resamples")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed, for reproducible intervals")
+    parser.set_defaults(func=run_compare)
+    return parser
+
+def setup_targets_parser():
+    """
+    Sets up an ArgumentParser for `main.py targets`, which runs every target of a configuration file at once.
+
+    Returns:
+        ArgumentParser: The parser object.
+
+    Example:
+        >>> args = setup_targets_parser().parse_args(["beta_distributed/config.json", "--only", "0,2"])
+        >>> args.config, args.only
+        ('beta_distributed/config.json', [0, 2])
+    """
+    parser = ArgumentParser(prog="main.py targets",
+                            description="Load several targets at once from one process, each with its own "
+                                        "schedule, concurrency limit, connection pool and statistics")
+    parser.add_argument("config", type=str,
+                    help="JSON list of targets with url, qps, duration, concurrency and args, "
+                         "as in beta_distributed/config.json")
+    parser.add_argument("--only", type=lambda value: [int(index) for index in value.split(",")], default=None,
+                    help="Comma-separated indices of the targets to run; all of them by default")
+    parser.add_argument("--precision", type=int, default=3, choices=range(1, 6), help="Significant figures of the latency histograms")
+    parser.add_argument("--save_run", type=str, default=None,
+                    help="Save the combined run summary to this JSON file, as a baseline for `main.py compare`")
+    parser.set_defaults(func=run_config)
+    return parser
@@ -0,0 +1,250 @@
+import concurrent.futures
+import csv
+import json
+import logging
+import re
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = re.compile(rb"\{\{\s*([^{}]+?)\s*\}\}")
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+UUID_DIGITS = [i for i in range(36) if i not in (8, 13, 18, 23)]  # Positions of the digits between the dashes
+ALPHABET = np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789", dtype=np.uint8)
+
+def parse_template(template):
+    """
+    Split a body template into its literal text and its `{{...}}` placeholders.
+
+    Placeholders:
+        {{seq}}                 A counter, unique across processes and workers of a run.
+        {{uuid}}                A random UUID (version 4).
+        {{int:LOW:HIGH}}        A random integer between LOW and HIGH, inclusive.
+        {{float:LOW:HIGH}}      A random number between LOW and HIGH, with 6 decimals.
+        {{string:N}}            A random alphanumeric string of N characters, or between
+        {{string:MIN:MAX}}      MIN and MAX characters.
+        {{row.FIELD}}           FIELD of a row sampled from the data file; every placeholder of
+                                one body reads the same row.
+
+    Args:
+        template (bytes): The body template.
+
+    Returns:
+        tuple: The `%`-format for the body, with one `%s` per placeholder, and the parsed
+               placeholders as (kind, arguments) tuples.
+
+    Example:
+        >>> parse_template(b'{"id": {{seq}}, "name": "{{string:4:8}}", "pct": "100%"}')
+        (b'{"id": %s, "name": "%s", "pct": "100%%"}', [('seq', ()), ('string', (4, 8))])
+    """
+    fields = []
+    literals = PLACEHOLDER.split(template)[::2]
+    for spec in PLACEHOLDER.findall(template):
+        name, *arguments = spec.decode().split(":")
+        if name.startswith("row."):
+            fields.append(("row", (name[4:],)))
+        elif name in ("seq", "uuid") and not arguments:
+            fields.append((name, ()))
+        elif name == "int" and len(arguments) == 2:
+            fields.append((name, tuple(int(argument) for argument in arguments)))
+        elif name == "float" and len(arguments) == 2:
+            fields.append((name, tuple(float(argument) for argument in arguments)))
+        elif name == "string" and len(arguments) in (1, 2):
+            lengths = tuple(int(argument) for argument in arguments)
+            fields.append((name, lengths if len(lengths) == 2 else lengths * 2))
+        else:
+            raise ValueError(f"unknown payload placeholder {{{{{spec.decode()}}}}}")
+        if fields[-1][0] in ("int", "float", "string") and fields[-1][1][0] > fields[-1][1][1]:
+            raise ValueError(f"empty range in payload placeholder {{{{{spec.decode()}}}}}")
+    body_format = b"%s".join(literal.replace(b"%", b"%%") for literal in literals)
+    return body_format, fields
+
+def load_rows(file_path):
+    """
+    Load the rows `{{row.FIELD}}` placeholders sample from: CSV with a header line, or JSON Lines.
+
+    String values are escaped for use inside a JSON string; other JSON values are inserted as JSON.
+
+    Args:
+        file_path (str): A `.csv` file, or a file of one JSON object per line.
+
+    Returns:
+        dict: Field name to a NumPy object array of the encoded value of every row.
+    """
+    with open(file_path, 'r', newline='') as file:
+        if file_path.endswith(".csv"):
+            rows = list(csv.DictReader(file))
+        else:
+            rows = [json.loads(line) for line in file if line.strip()]
+    if not rows:
+        raise ValueError(f"{file_path} has no rows")
+    fields = {field for row in rows for field in row}
+    return {field: np.array([_encode_value(row.get(field)) for row in rows], dtype=object) for field in fields}
+
+def check_rows(fields, rows):
+    """
+    Check that the data file has every field the template's `{{row.FIELD}}` placeholders read.
+
+    Args:
+        fields (list[tuple]): The placeholders returned by `parse_template`.
+        rows (dict): Data file rows from `load_rows`, or None.
+    """
+    missing = {arguments[0] for kind, arguments in fields if kind == "row"} - set(rows or {})
+    if missing:
+        raise ValueError(f"payload placeholders need data file fields {', '.join(sorted(missing))}")
+
+def _encode_value(value):
+    # Strings land inside quotes in the template; anything else is a JSON literal
+    encoded = json.dumps(value, ensure_ascii=False)
+    return (encoded[1:-1] if isinstance(value, str) else encoded).encode()
+
+class PayloadPool:
+    """
+    Bodies rendered from a template in batches, handed out one per request.
+
+    A whole batch is rendered at a time with vectorized NumPy draws and a single `%`-format
+    per body, and the next batch is rendered on a background thread once half of the current
+    one has been handed out, so taking a body costs the dispatch path a list lookup, about as
+    much as a static body. Every body is used once; the sequence counter advances by
+    `workers` per body from `worker`, so processes or workers sharing a template never render
+    the same value.
+
+    Args:
+        template (bytes): The body template, see `parse_template`.
+        rows (dict): Data file rows from `load_rows`, for `{{row.FIELD}}` placeholders.
+        content_type (str): The Content-Type of the bodies.
+        batch_size (int): Number of bodies rendered at a time.
+        worker (int): Index of this process or worker.
+        workers (int): Number of processes or workers rendering from the same template.
+        seed (int): Random seed, for reproducible bodies.
+    """
+
+    def __init__(self, template, rows=None, content_type="application/json", batch_size=10000, worker=0,
+                 workers=1, seed=None):
+        self.content_type = content_type
+        self.batch_size = batch_size
+        self.stalls = 0
+        self._format, self._fields = parse_template(template)
+        self._rows = rows or {}
+        check_rows(self._fields, self._rows)
+        self._rng = np.random.default_rng(seed if seed is None else [seed, worker])
+        self._sequence = worker
+        self._stride = workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._next = None
+        self._bodies = self.render(batch_size)
+        self._index = 0
+
+    def render(self, count):
+        """
+        Render bodies, drawing the values of each placeholder for all of them at once.
+
+        Args:
+            count (int): Number of bodies.
+
+        Returns:
+            list[bytes]: The bodies.
+
+        Example:
+            >>> pool = PayloadPool(b'{"id": {{seq}}, "n": {{int:5:5}}}', batch_size=1, worker=1, workers=2)
+            >>> pool.render(2)
+            [b'{"id": 3, "n": 5}', b'{"id": 5, "n": 5}']
+        """
+        if not self._fields:
+            return [self._format.replace(b"%%", b"%")] * count
+        rng = self._rng
+        rows = rng.integers(0, len(next(iter(self._rows.values()))), count) if self._rows else None
+        sequence = None
+        columns = []
+        for kind, arguments in self._fields:
+            if kind == "seq":
+                if sequence is None:
+                    # Every {{seq}} of a body gets the same number
+                    first = self._sequence
+                    self._sequence += count * self._stride
+                    sequence = [b"%d" % value for value in range(first, self._sequence, self._stride)]
+                columns.append(sequence)
+            elif kind == "uuid":
+                columns.append(_uuids(rng, count))
+            elif kind == "int":
+                columns.append([b"%d" % value for value in rng.integers(arguments[0], arguments[1] + 1, count).tolist()])
+            elif kind == "float":
+                columns.append([b"%.6f" % value for value in rng.uniform(arguments[0], arguments[1], count).tolist()])
+            elif kind == "string":
+                columns.append(_strings(rng, count, *arguments))
+            else:
+                columns.append(self._rows[arguments[0]][rows].tolist())
+        body_format = self._format
+        return [body_format % values for values in zip(*columns)]
+
+    def next(self):
+        """
+        Take the next body, switching to the batch rendered in the background when this one runs out.
+
+        Returns:
+            bytes: A body never handed out before.
+        """
+        index = self._index
+        bodies = self._bodies
+        if index == len(bodies):
+            if self._next is None:
+                self._next = self._executor.submit(self.render, self.batch_size)
+            if not self._next.done():
+                # The background render fell behind the request rate
+                self.stalls += 1
+            bodies = self._bodies = self._next.result()
+            self._next = None
+            index = 0
+        elif self._next is None and index * 2 >= len(bodies):
+            self._next = self._executor.submit(self.render, self.batch_size)
+        self._index = index + 1
+        return bodies[index]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.stalls:
+            logger.warning("Payload rendering fell behind %d time(s); raise --payload_batch", self.stalls)
+
+def _uuids(rng, count):
+    # Version 4 UUIDs: 122 random bits with the version and variant bits set, formatted 8-4-4-4-12
+    raw = np.frombuffer(rng.bytes(16 * count), dtype=np.uint8).reshape(count, 16)
+    raw = np.stack([raw >> 4, raw & 0x0F], axis=2).reshape(count, 32)
+    raw[:, 12] = 4
+    raw[:, 16] = raw[:, 16] & 0x3 | 0x8
+    text = np.full((count, 36), ord("-"), dtype=np.uint8)
+    text[:, UUID_DIGITS] = HEX_DIGITS[raw]
+    text = text.tobytes()
+    return [text[i:i + 36] for i in range(0, 36 * count, 36)]
+
+def _strings(rng, count, shortest, longest):
+    characters = ALPHABET[rng.integers(0, len(ALPHABET), (count, longest))].tobytes()
+    if shortest == longest:
+        return [characters[i:i + longest] for i in range(0, count * longest, longest)]
+    lengths = rng.integers(shortest, longest + 1, count).tolist()
+    return [characters[i * longest:i * longest + length] for i, length in enumerate(lengths)]
+
+def payload_options(args):
+    """
+    Build the payload pool settings from parsed arguments, reading and checking the template and data file.
+
+    Args:
+        args (object): Parsed arguments; missing attributes fall back to the defaults.
+
+    Returns:
+        dict or None: Keyword arguments for `PayloadPool`, or None when no template was given.
+    """
+    path = getattr(args, 'payload_template', None)
+    if not path:
+        return None
+    with open(path, 'rb') as file:
+        template = file.read()
+    data_path = getattr(args, 'payload_data', None)
+    rows = load_rows(data_path) if data_path else None
+    check_rows(parse_template(template)[1], rows)
+    return {
+        "template": template,
+        "rows": rows,
+        "content_type": getattr(args, 'payload_content_type', 'application/json'),
+        "batch_size": getattr(args, 'payload_batch', 10000),
+        "seed": getattr(args, 'payload_seed', None),
+    }
@@ -0,0 +1,530 @@
+import asyncio
+import socket
+import ssl
+import time
+from collections import deque
+from urllib.parse import urlsplit
+from http_client import CHECKSUMS
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Parser states of a response
+HEAD, BODY, CHUNK_SIZE, CHUNK_DATA, CHUNK_END, TRAILERS, UNTIL_CLOSE = range(7)
+
+def run(main):
+    """
+    Run a coroutine on a fresh event loop, uvloop's when it is installed.
+
+    Args:
+        main (coroutine): The coroutine to run.
+
+    Returns:
+        The coroutine's result.
+    """
+    if uvloop is None:
+        return asyncio.run(main)
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        return runner.run(main)
+
+def encode_request(template, host):
+    """
+    Serialize a request template to the bytes of an HTTP/1.1 request.
+
+    Args:
+        template (RequestTemplate): The request, see `http_client.build_request_template`.
+        host (str): The Host header value.
+
+    Returns:
+        bytes: The request, ready to be written to a connection.
+
+    Example:
+        >>> from http_client import build_request_template
+        >>> encode_request(build_request_template("http://localhost:8080/a?b=1"), "localhost:8080")
+        b'GET /a?b=1 HTTP/1.1\\r\\nHost: localhost:8080\\r\\n\\r\\n'
+    """
+    return encode_body(encode_head(template, host), template.body)
+
+def encode_head(template, host):
+    """
+    Serialize the request line and headers of a template, up to the body's Content-Length.
+
+    Args:
+        template (RequestTemplate): The request.
+        host (str): The Host header value.
+
+    Returns:
+        bytes: The request line and header lines, each ending with CRLF.
+    """
+    parts = urlsplit(template.url)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    lines = [f"{template.method} {target} HTTP/1.1", f"Host: {host}"]
+    lines.extend(f"{name}: {value}" for name, value in template.headers.items())
+    return "\r\n".join(lines).encode("latin-1") + b"\r\n"
+
+def encode_body(head, body):
+    # Complete a head from `encode_head` with the Content-Length and body, if any
+    if body is None:
+        return head + b"\r\n"
+    return b"%sContent-Length: %d\r\n\r\n%s" % (head, len(body), body)
+
+class HTTPProtocol(asyncio.Protocol):
+    """
+    One persistent HTTP/1.1 connection that parses responses straight off the socket buffer.
+
+    Requests are written as they come and matched to responses in order, so several can be
+    pipelined on the connection. Only the status line and the framing headers (Content-Length,
+    Transfer-Encoding, Connection) are looked at; bodies are counted, optionally checksummed,
+    and dropped as they arrive.
+
+    Example:
+        >>> class Transport:
+        ...     def write(self, data): pass
+        ...     def close(self): pass
+        >>> async def exchange(chunks, *head_only):
+        ...     protocol = HTTPProtocol()
+        ...     protocol.connection_made(Transport())
+        ...     futures = [protocol.send(b"", head) for head in head_only]
+        ...     for chunk in chunks:
+        ...         protocol.data_received(chunk)
+        ...     return [(await future)[:2] for future in futures], protocol.closed
+        >>> asyncio.run(exchange([b"HTTP/1.1 200 OK\\r\\nContent-Length: 5\\r\\n\\r\\nhel", b"lo"], False))
+        ([(200, 5)], False)
+        >>> asyncio.run(exchange([b"HTTP/1.1 200 OK\\r\\nTransfer-Encoding: chunked\\r\\n\\r\\n"
+        ...                       b"3\\r\\nabc\\r\\n2\\r\\nde\\r\\n0\\r\\n\\r\\n"], False))
+        ([(200, 5)], False)
+        >>> asyncio.run(exchange([b"HTTP/1.1 200 OK\\r\\nContent-Length: 100\\r\\n\\r\\n"], True))
+        ([(200, 0)], False)
+        >>> asyncio.run(exchange([b"HTTP/1.1 200 OK\\r\\nContent-Length: 2\\r\\n\\r\\nokHTTP/1.1 404 Not Found\\r\\n"
+        ...                       b"Content-Length: 0\\r\\n\\r\\n"], False, False))
+        ([(200, 2), (404, 0)], False)
+        >>> asyncio.run(exchange([b"HTTP/1.1 200 OK\\r\\nConnection: close\\r\\nContent-Length: 0\\r\\n\\r\\n"], False))
+        ([(200, 0)], True)
+        >>> async def send_after_close():
+        ...     protocol = HTTPProtocol()
+        ...     protocol.connection_made(Transport())
+        ...     protocol.connection_lost(None)
+        ...     await protocol.send(b"")
+        >>> asyncio.run(send_after_close())
+        Traceback (most recent call last):
+        ...
+        ConnectionError: Connection closed
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.closed = False
+        self._buffer = bytearray()
+        self._pending = deque()
+        self._state = HEAD
+        self._remaining = 0
+        self._close_after = False
+        self.outstanding = 0  # Requests the pool has handed this connection, kept by the pool
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def send(self, data, head_only=False, checksum=None):
+        """
+        Write a request and return a future for its response.
+
+        Args:
+            data (bytes): The serialized request.
+            head_only (bool): Whether the response has no body whatever its headers say, as for HEAD.
+            checksum (str or None): Incremental checksum to compute over the body, one of CHECKSUMS.
+
+        Returns:
+            asyncio.Future: Resolves to (status, body size, checksum or None, `perf_counter` time the
+                            headers were parsed, `perf_counter` time the body ended).
+        """
+        future = asyncio.get_running_loop().create_future()
+        if self.closed:
+            # Nothing would ever answer it
+            future.set_exception(ConnectionError("Connection closed"))
+            return future
+        update, value = CHECKSUMS[checksum] if checksum else (None, None)
+        # [future, head_only, checksum update, checksum, status, size, headers_at]
+        self._pending.append([future, head_only, update, value, 0, 0, 0.0])
+        self.transport.write(data)
+        return future
+
+    def data_received(self, data):
+        self._buffer += data
+        try:
+            self._parse()
+        except (ValueError, IndexError) as e:
+            self._fail(ConnectionError(f"Malformed response: {e}"))
+            self.transport.close()
+
+    def eof_received(self):
+        if self._state == UNTIL_CLOSE and self._pending:
+            self._complete()
+        return False
+
+    def connection_lost(self, exc):
+        self.closed = True
+        if self._state == UNTIL_CLOSE and self._pending:
+            self._complete()
+        self._fail(exc or ConnectionError("Connection closed by the server"))
+
+    def _fail(self, exc):
+        self.closed = True
+        while self._pending:
+            future = self._pending.popleft()[0]
+            if not future.done():
+                future.set_exception(exc)
+
+    def _consume_body(self, limit):
+        # Count and drop up to `limit` buffered body bytes
+        taken = min(limit, len(self._buffer))
+        entry = self._pending[0]
+        if entry[2] is not None:
+            with memoryview(self._buffer) as view:
+                entry[3] = entry[2](view[:taken], entry[3])
+        entry[5] += taken
+        del self._buffer[:taken]
+        return taken
+
+    def _complete(self):
+        entry = self._pending.popleft()
+        future, _, _, checksum, status, size, headers_at = entry
+        if not future.done():
+            future.set_result((status, size, checksum, headers_at, time.perf_counter()))
+        self._state = HEAD
+        if self._close_after:
+            self.closed = True
+            self.transport.close()
+
+    def _parse(self):
+        buffer = self._buffer
+        while self._pending:
+            state = self._state
+            if state == HEAD:
+                end = buffer.find(b"\r\n\r\n")
+                if end < 0:
+                    return
+                head = bytes(buffer[:end]).lower()
+                del buffer[:end + 4]
+                entry = self._pending[0]
+                entry[4] = status = int(head[9:12])
+                entry[6] = time.perf_counter()
+                if 100 <= status < 200:
+                    # Interim response; the final one follows
+                    continue
+                self._close_after = b"\r\nconnection: close" in head
+                if entry[1] or status in (204, 304):
+                    self._complete()
+                elif b"\r\ntransfer-encoding: chunked" in head:
+                    self._state = CHUNK_SIZE
+                else:
+                    start = head.find(b"\r\ncontent-length:")
+                    if start >= 0:
+                        line_end = head.find(b"\r\n", start + 2)
+                        self._remaining = int(head[start + 17:line_end if line_end >= 0 else None])
+                        self._state = BODY
+                    else:
+                        self._state = UNTIL_CLOSE
+                        self._close_after = True
+            elif state == BODY:
+                self._remaining -= self._consume_body(self._remaining)
+                if self._remaining:
+                    return
+                self._complete()
+            elif state == CHUNK_SIZE:
+                end = buffer.find(b"\r\n")
+                if end < 0:
+                    return
+                size = int(bytes(buffer[:end]).split(b";")[0], 16)
+                del buffer[:end + 2]
+                self._remaining = size
+                self._state = CHUNK_DATA if size else TRAILERS
+            elif state == CHUNK_DATA:
+                self._remaining -= self._consume_body(self._remaining)
+                if self._remaining:
+                    return
+                self._state = CHUNK_END
+            elif state == CHUNK_END:
+                if len(buffer) < 2:
+                    return
+                del buffer[:2]
+                self._state = CHUNK_SIZE
+            elif state == TRAILERS:
+                if buffer[:2] == b"\r\n":
+                    del buffer[:2]
+                else:
+                    end = buffer.find(b"\r\n\r\n")
+                    if end < 0:
+                        return
+                    del buffer[:end + 4]
+                self._complete()
+            else:
+                self._consume_body(len(buffer))
+                return
+
+class RawConnectionPool:
+    """
+    Pool of persistent raw HTTP/1.1 connections to a single origin, for the "raw" engine.
+
+    Skips the client object layer altogether: requests are serialized to bytes once per
+    template, written straight to the transport and answered by `HTTPProtocol`, which parses
+    only the status line and framing headers. A request goes to the most recently used idle
+    connection, else to a new one while fewer than `pool_size` are open, else is pipelined onto
+    a connection with fewer than `pipeline` requests outstanding, else waits its turn; so
+    connections are only opened, and requests only pipelined, once the load calls for it.
+    Connection creation and reuse, DNS, connect and pool wait times are recorded like with aiohttp.
+
+    Use as an async context manager, which closes the connections on exit.
+
+    Args:
+        url (str): Any URL of the origin; every request must go to the same scheme, host and port.
+        pool_size (int): The maximum number of connections.
+        pipeline (int): The maximum number of outstanding requests per connection.
+        timeout (float): Seconds to wait for a response before giving up on it and its connection;
+                         None waits forever.
+    """
+
+    def __init__(self, url, pool_size=100, pipeline=1, timeout=None):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.netloc = parts.netloc
+        self.pool_size = pool_size
+        self.pipeline = pipeline
+        self.timeout = timeout
+        self._ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self._open = 0
+        self._idle = []          # Open connections with nothing outstanding, most recently used last
+        self._partial = set()    # Connections with room for more pipelined requests
+        self._connections = set()
+        self._waiters = deque()
+        self._template = None
+        self._head = None
+        self._encoded = None
+
+    async def connect(self, stats=None):
+        """
+        Open a new connection, timing the DNS lookup and the TCP (and TLS) handshake separately.
+
+        Args:
+            stats (RunStats, optional): Statistics to record the connection into.
+
+        Returns:
+            HTTPProtocol: The connected protocol.
+        """
+        loop = asyncio.get_running_loop()
+        started_at = time.perf_counter()
+        addresses = await loop.getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)
+        resolved_at = time.perf_counter()
+        address = addresses[0][4]
+        _, protocol = await loop.create_connection(
+            HTTPProtocol, address[0], address[1], ssl=self._ssl,
+            server_hostname=self.host if self._ssl else None)
+        if stats is not None:
+            stats.connections_created += 1
+            stats.dns_time.record(resolved_at - started_at)
+            stats.connect_time.record(time.perf_counter() - resolved_at)
+        sock = protocol.transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._connections.add(protocol)
+        return protocol
+
+    async def prewarm(self, count):
+        """
+        Open idle connections before the test clock starts.
+
+        Args:
+            count (int): The number of connections to open, up to the pool size.
+
+        Returns:
+            int: The number of connections opened.
+        """
+        async def warm():
+            try:
+                self._idle.append(await self.connect())
+                return True
+            except OSError:
+                self._open -= 1
+                return False
+
+        count = min(count, self.pool_size - self._open)
+        self._open += count
+        results = await asyncio.gather(*(warm() for _ in range(count)))
+        return sum(results)
+
+    def encode(self, template):
+        # The same template is sent over and over, at most with a new body each time; serialize
+        # the head once and only the body when that is all that changed
+        previous = self._template
+        if template is not previous:
+            if previous is None or template.headers is not previous.headers or template[:2] != previous[:2]:
+                self._head = encode_head(template, self.netloc)
+            self._encoded = encode_body(self._head, template.body)
+            self._template = template
+        return self._encoded
+
+    async def acquire(self, stats=None):
+        """
+        Take a connection to send one request on, opening or waiting for one if needed.
+
+        Args:
+            stats (RunStats, optional): Statistics to record connection reuse, creation and pool wait into.
+
+        Returns:
+            HTTPProtocol: The connection; hand it back with `release` once the response is in.
+        """
+        queued_at = None
+        while True:
+            idle = self._idle
+            while idle:
+                protocol = idle.pop()
+                if not protocol.closed:
+                    protocol.outstanding = 1
+                    self._check_partial(protocol)
+                    break
+                self._drop(protocol)
+            else:
+                protocol = None
+            if protocol is None and self._open < self.pool_size:
+                self._open += 1
+                try:
+                    protocol = await self.connect(stats)
+                except BaseException:
+                    self._open -= 1
+                    raise
+                protocol.outstanding = 1
+                self._check_partial(protocol)
+                return protocol
+            if protocol is None:
+                protocol = next((candidate for candidate in self._partial if not candidate.closed), None)
+                if protocol is not None:
+                    protocol.outstanding += 1
+                    self._check_partial(protocol)
+            if protocol is None:
+                queued_at = queued_at or time.perf_counter()
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                # Resolves to a connection with a free slot, or None once a closed one made room for a new one
+                protocol = await waiter
+                if protocol is not None and protocol.closed:
+                    # Closed since it was handed over; give the slot back and look again
+                    self.release(protocol)
+                    continue
+            if protocol is not None:
+                if stats is not None:
+                    stats.connections_reused += 1
+                    if queued_at is not None:
+                        stats.pool_wait.record(time.perf_counter() - queued_at)
+                return protocol
+
+    def release(self, protocol):
+        """
+        Hand a connection back once a request on it has completed.
+
+        Args:
+            protocol (HTTPProtocol): The connection returned by `acquire`.
+        """
+        if not protocol.closed:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    # Hand the freed slot straight to the next request in line
+                    waiter.set_result(protocol)
+                    return
+        protocol.outstanding -= 1
+        if protocol.closed:
+            if not protocol.outstanding:
+                self._drop(protocol)
+        elif not protocol.outstanding:
+            self._partial.discard(protocol)
+            self._idle.append(protocol)
+        else:
+            self._check_partial(protocol)
+
+    def _check_partial(self, protocol):
+        if protocol.outstanding < self.pipeline:
+            self._partial.add(protocol)
+        else:
+            self._partial.discard(protocol)
+
+    def _drop(self, protocol):
+        # A closed connection frees its place in the pool for a new one
+        self._partial.discard(protocol)
+        self._connections.discard(protocol)
+        self._open -= 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Let the request in line open the replacement itself
+                waiter.set_result(None)
+                break
+
+    async def request(self, template, stats=None):
+        """
+        Send a request on a pooled connection and wait for its response.
+
+        Args:
+            template (RequestTemplate): The request to send.
+            stats (RunStats, optional): Statistics to record the connection, pool wait and time to first byte into.
+
+        Returns:
+            tuple: (status, body size, checksum or None, `perf_counter` time the headers were parsed,
+                    `perf_counter` time the body ended).
+        """
+        protocol = await self.acquire(stats)
+        try:
+            expect = template.expect
+            sent_at = time.perf_counter()
+            response = protocol.send(self.encode(template), template.method == "HEAD",
+                                     expect.checksum if expect else None)
+            try:
+                result = await asyncio.wait_for(response, self.timeout)
+            except asyncio.TimeoutError:
+                # Responses come back in order, so nothing queued behind this one can arrive either
+                protocol.closed = True
+                protocol.transport.close()
+                raise
+            if stats is not None:
+                stats.ttfb.record(result[3] - sent_at)
+            return result
+        finally:
+            self.release(protocol)
+
+    async def close(self):
+        for protocol in self._connections:
+            if not protocol.closed:
+                protocol.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+async def send_request(template, pool, stats=None):
+    """
+    Send a request through a raw connection pool; the counterpart of `http_client.send_request`.
+
+    Args:
+        template (RequestTemplate): The request to send.
+        pool (RawConnectionPool): The pool to send it through.
+        stats (RunStats, optional): Statistics to record the body download time and size into.
+
+    Returns:
+        tuple: A tuple containing the elapsed time (in seconds), the response status (or error message)
+               and the number of body bytes received.
+    """
+    start_time = time.perf_counter()
+    try:
+        status, size, checksum, headers_at, end_time = await pool.request(template, stats)
+    except Exception as e:
+        return time.perf_counter() - start_time, str(e) or type(e).__name__, 0
+    if stats is not None:
+        stats.body_time.record(end_time - headers_at)
+        stats.bytes_received += size
+    expect = template.expect
+    if expect is not None and status < 400:
+        status = expect.failure(size, checksum) or status
+    return end_time - start_time, status, size
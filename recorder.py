@@ -0,0 +1,318 @@
+import csv
+import math
+import os
+import time
+import numpy as np
+
+# One fixed-size record per request; 20 bytes, so a hundred million samples take 2 GB
+SAMPLE_DTYPE = np.dtype([
+    ("offset", "<f8"),   # Dispatch offset in seconds since the start of the test
+    ("latency", "<f4"),  # Response time in seconds
+    ("status", "<i2"),   # HTTP status, 0 if the request failed on the client side
+    ("bytes", "<u4"),    # Response body bytes received
+    ("worker", "<u2"),   # Process or distributed worker that sent the request
+])
+MAGIC = b"LTSMPL01"
+HEADER_SIZE = 16  # The magic, then the wall-clock start time as a float64
+
+class SampleRecorder:
+    """
+    Append-only binary log of every request of a run.
+
+    Samples are written into a preallocated NumPy chunk and flushed to disk with a single
+    `tofile` call whenever the chunk fills up, so recording costs one tuple assignment per
+    request and memory stays at one chunk however long the run. Files can be appended to by
+    later runs; each run keeps its offsets relative to its own start.
+
+    Args:
+        path (str): The file to append to.
+        worker (int): Id stored with every sample, e.g. the process index.
+        chunk_size (int): Number of samples buffered between writes.
+    """
+
+    def __init__(self, path, worker=0, chunk_size=65536):
+        self.worker = worker
+        self.start = 0.0
+        self._buffer = np.empty(chunk_size, dtype=SAMPLE_DTYPE)
+        self._index = 0
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC + np.float64(time.time()).tobytes())
+
+    def record(self, offset, latency, status, size):
+        """
+        Buffer one sample, flushing the chunk to disk once it is full.
+
+        Args:
+            offset (float): Dispatch offset in seconds since the start of the test.
+            latency (float): Response time in seconds.
+            status (int or str): The response status, or an error message if the request failed.
+            size (int): Response body bytes received.
+        """
+        self._buffer[self._index] = (offset, latency, status if isinstance(status, int) else 0, size, self.worker)
+        self._index += 1
+        if self._index == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        self._buffer[:self._index].tofile(self._file)
+        self._file.flush()
+        self._index = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+def recorder_options(args):
+    """
+    Build the sample recorder settings from parsed arguments.
+
+    Args:
+        args (object): Parsed arguments; missing attributes fall back to the defaults.
+
+    Returns:
+        dict or None: Keyword arguments for `SampleRecorder`, or None when no recording was requested.
+    """
+    path = getattr(args, 'record', None)
+    return {"path": path} if path else None
+
+def load_samples(path):
+    """
+    Memory-map a sample file without reading it.
+
+    Args:
+        path (str): A file written by `SampleRecorder`.
+
+    Returns:
+        numpy.memmap: The samples, as a structured array of SAMPLE_DTYPE.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a sample file")
+    if os.path.getsize(path) == HEADER_SIZE:
+        return np.empty(0, dtype=SAMPLE_DTYPE)
+    return np.memmap(path, dtype=SAMPLE_DTYPE, mode='r', offset=HEADER_SIZE)
+
+class SampleAnalysis:
+    """
+    Vectorized, constant-memory aggregation of samples, fed one chunk at a time.
+
+    Percentiles come from a log-bucketed histogram with 0.1% wide buckets, built with
+    `np.bincount`, so any number of samples can be summarized without holding them in memory.
+    Per-window counts, errors, bytes and mean/max latency are accumulated the same way.
+
+    Args:
+        window (float): Timeline window in seconds.
+    """
+
+    LOWEST = 1e-6      # Latencies below a microsecond share the first bucket
+    HIGHEST = 3600.0   # and above an hour the last one
+    GROWTH = 1.001     # Relative width of a bucket
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self._scale = 1 / math.log(self.GROWTH)
+        self._buckets = int(math.log(self.HIGHEST / self.LOWEST) * self._scale) + 2
+        self.histogram = np.zeros(self._buckets, dtype=np.int64)
+        self.statuses = np.zeros(1000, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.bytes = 0
+        self.min = math.inf
+        self.max = 0.0
+        self.first_offset = math.inf
+        self.last_offset = 0.0
+        self._windows = {name: np.zeros(0, dtype=dtype) for name, dtype in
+                         [("requests", np.int64), ("errors", np.int64), ("bytes", np.int64),
+                          ("latency", np.float64), ("max", np.float64)]}
+
+    def add(self, samples):
+        """
+        Aggregate a chunk of samples.
+
+        Args:
+            samples (numpy.ndarray): A structured array of SAMPLE_DTYPE.
+        """
+        if not len(samples):
+            return
+        latency = samples["latency"].astype(np.float64)
+        status = samples["status"]
+        offset = samples["offset"]
+        size = samples["bytes"].astype(np.int64)
+        errors = (status == 0) | (status >= 400)
+
+        self.count += len(samples)
+        self.total += latency.sum()
+        self.bytes += int(size.sum())
+        self.min = min(self.min, float(latency.min()))
+        self.max = max(self.max, float(latency.max()))
+        self.first_offset = min(self.first_offset, float(offset.min()))
+        self.last_offset = max(self.last_offset, float(offset.max()))
+        self.histogram += np.bincount(self._bucket(latency), minlength=self._buckets)
+        self.statuses += np.bincount(np.clip(status, 0, 999), minlength=1000)
+
+        window = np.maximum(offset // self.window, 0).astype(np.int64)
+        length = int(window.max()) + 1
+        self._grow(length)
+        windows = self._windows
+        windows["requests"][:length] += np.bincount(window, minlength=length)
+        windows["errors"][:length] += np.bincount(window, weights=errors, minlength=length).astype(np.int64)
+        windows["bytes"][:length] += np.bincount(window, weights=size, minlength=length).astype(np.int64)
+        windows["latency"][:length] += np.bincount(window, weights=latency, minlength=length)
+        np.maximum.at(windows["max"], window, latency)
+
+    def _bucket(self, latency):
+        scaled = np.log(np.clip(latency, self.LOWEST, self.HIGHEST) / self.LOWEST) * self._scale
+        return scaled.astype(np.int64)
+
+    def _grow(self, length):
+        for name, values in self._windows.items():
+            if len(values) < length:
+                self._windows[name] = np.concatenate([values, np.zeros(length - len(values), dtype=values.dtype)])
+
+    def percentiles(self, percentiles):
+        """
+        Compute percentiles from the histogram, to within one bucket (0.1%).
+
+        Args:
+            percentiles (list[float]): Percentiles between 0 and 100.
+
+        Returns:
+            list[float]: The latency at each percentile in seconds, clamped to the recorded min/max.
+        """
+        if not self.count:
+            return [0.0 for _ in percentiles]
+        cumulative = np.cumsum(self.histogram)
+        ranks = np.maximum(np.ceil(np.asarray(percentiles, dtype=np.float64) / 100 * self.count), 1)
+        buckets = np.searchsorted(cumulative, ranks)
+        # Report the upper edge of each bucket, like LatencyHistogram does
+        values = self.LOWEST * self.GROWTH ** (buckets + 1)
+        return [min(max(float(value), self.min), self.max) for value in values]
+
+    def timeline(self):
+        """
+        Return the per-window aggregates.
+
+        Returns:
+            dict: Arrays of window start offsets, requests, rps, errors, bytes and mean and max latency.
+        """
+        windows = self._windows
+        requests = windows["requests"]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(requests > 0, windows["latency"] / requests, 0.0)
+        return {
+            "offset": np.arange(len(requests)) * self.window,
+            "requests": requests,
+            "rps": requests / self.window,
+            "errors": windows["errors"],
+            "bytes": windows["bytes"],
+            "mean": mean,
+            "max": windows["max"],
+        }
+
+def analyze_files(paths, window=1.0, start=None, end=None, worker=None, chunk_size=10_000_000):
+    """
+    Aggregate one or more sample files chunk by chunk, optionally restricted to a slice of the run.
+
+    Args:
+        paths (list[str]): Files written by `SampleRecorder`.
+        window (float): Timeline window in seconds.
+        start (float): Ignore samples dispatched before this offset.
+        end (float): Ignore samples dispatched at or after this offset.
+        worker (int): Only keep the samples of this worker.
+        chunk_size (int): Number of samples mapped into memory at a time.
+
+    Returns:
+        SampleAnalysis: The aggregates.
+
+    Example:
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), "samples.bin")
+        >>> recorder = SampleRecorder(path, worker=1, chunk_size=4)
+        >>> for i in range(10):
+        ...     recorder.record(i * 0.25, 0.01 * (i + 1), 200 if i < 9 else "Timeout", 100)
+        >>> recorder.close()
+        >>> len(load_samples(path)), os.path.getsize(path) == HEADER_SIZE + 10 * SAMPLE_DTYPE.itemsize
+        (10, True)
+        >>> analysis = analyze_files([path])
+        >>> analysis.count, analysis.bytes, int(analysis.statuses[200]), int(analysis.statuses[0])
+        (10, 1000, 9, 1)
+        >>> [round(value, 3) for value in analysis.percentiles([50, 90, 100])]
+        [0.05, 0.09, 0.1]
+        >>> analysis.timeline()["requests"].tolist()
+        [4, 4, 2]
+        >>> analyze_files([path], start=1.0).count, analyze_files([path], worker=0).count
+        (6, 0)
+        >>> os.remove(path)
+    """
+    analysis = SampleAnalysis(window)
+    for path in paths:
+        samples = load_samples(path)
+        for first in range(0, len(samples), chunk_size):
+            chunk = samples[first:first + chunk_size]
+            keep = np.ones(len(chunk), dtype=bool)
+            if start is not None:
+                keep &= chunk["offset"] >= start
+            if end is not None:
+                keep &= chunk["offset"] < end
+            if worker is not None:
+                keep &= chunk["worker"] == worker
+            analysis.add(chunk if keep.all() else chunk[keep])
+    return analysis
+
+def display_analysis(analysis, percentiles, timeline_path=None):
+    """
+    Print the summary, status breakdown and timeline of an analysis.
+
+    Args:
+        analysis (SampleAnalysis): The aggregates.
+        percentiles (list[float]): Latency percentiles to report.
+        timeline_path (str): Write the timeline to this CSV file instead of printing it.
+    """
+    count = analysis.count
+    print("-------- Samples --------")
+    print(f"Total Requests: {count}")
+    if not count:
+        return
+    # Dispatches cover count - 1 gaps between the first and last one
+    span = (analysis.last_offset - analysis.first_offset) * count / (count - 1) if count > 1 else 0.0
+    errors = int(analysis.statuses[0] + analysis.statuses[400:].sum())
+    print(f"Dispatch span: {analysis.first_offset:.3f}s - {analysis.last_offset:.3f}s")
+    print(f"Average time per request / Latency: {analysis.total / count:.4f}s")
+    print(f"Fastest time: {analysis.min:.4f}s")
+    print(f"Slowest time: {analysis.max:.4f}s")
+    print(f"Requests Per Second: {count / span:.2f}" if span > 0 else "Requests Per Second: -")
+    print(f"Error Rate: {errors / count * 100:.2f}%")
+    print(f"Bytes Received: {analysis.bytes} ({analysis.bytes / count:.0f} bytes/request)")
+    print("Response Time Percentiles:")
+    for percentile, value in zip(percentiles, analysis.percentiles(percentiles)):
+        print(f"  {percentile:g}th Percentile: {value:.4f}s")
+    print("Status codes:")
+    for status in np.flatnonzero(analysis.statuses):
+        print(f"  {status if status else 'client error'}: {analysis.statuses[status]}")
+
+    timeline = analysis.timeline()
+    if timeline_path:
+        with open(timeline_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(list(timeline))
+            writer.writerows(zip(*(values.tolist() for values in timeline.values())))
+        print(f"Timeline written to {timeline_path}")
+        return
+    print(f"Timeline ({analysis.window:g}s windows):")
+    print(f"  {'offset':>10} {'requests':>9} {'rps':>9} {'errors':>7} {'mean':>9} {'max':>9}")
+    for offset, requests, rps, errors, mean, maximum in zip(
+            timeline["offset"], timeline["requests"], timeline["rps"], timeline["errors"],
+            timeline["mean"], timeline["max"]):
+        if requests:
+            print(f"  {offset:>9.1f}s {requests:>9} {rps:>9.1f} {errors:>7} {mean:>8.4f}s {maximum:>8.4f}s")
+
+def run_analyze(args):
+    """
+    Entry point of the `analyze` command.
+
+    Args:
+        args (object): Parsed arguments with files, window, start, end, worker, percentiles and timeline.
+    """
+    analysis = analyze_files(args.files, args.window, args.start, args.end, args.worker)
+    display_analysis(analysis, args.percentiles, args.timeline)
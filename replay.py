@@ -0,0 +1,249 @@
+import json
+import random
+import time
+from datetime import datetime
+from urllib.parse import urljoin, urlsplit
+from baseline import save_run
+from http_client import RequestTemplate, build_request_template, connection_options, create_session, prewarm_connections
+from load_patterns import RateProfile
+from load_tester import dispatch_requests, prepare_test, timeline_options
+from metrics import metrics_options, serve_metrics
+from recorder import SampleRecorder, recorder_options
+from scheduler import load_interarrivals, rate_offsets
+from stats import RunStats
+from timeline import MetricsTimeline
+from utils import calculate_and_display_results
+
+# Specs kept in memory between passes of a scheduled replay; longer files are streamed on every pass
+MAX_CACHED_SPECS = 10000
+
+def iter_request_specs(file_path):
+    """
+    Stream request specs from a JSON Lines file, one at a time.
+
+    Each line is a JSON object with an optional `method` (default GET), a `path` or absolute `url`,
+    optional `headers`, `body` (JSON object or raw string), `weight`, `timestamp` and `name`.
+    Blank lines and lines starting with `#` are skipped.
+
+    Args:
+        file_path (str): Path to the JSON Lines file.
+
+    Returns:
+        iterator[dict]: The request specs, in file order.
+    """
+    with open(file_path, 'r') as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                spec = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{file_path}:{line_number}: invalid request spec: {e}") from e
+            if not isinstance(spec, dict):
+                raise ValueError(f"{file_path}:{line_number}: invalid request spec: not a JSON object")
+            yield spec
+
+def check_request_specs(file_path, base_url, timing="scheduled"):
+    """
+    Check that a replay file can be read and that its first request spec is valid, before the run starts.
+
+    Args:
+        file_path (str): Path to the JSON Lines file.
+        base_url (str): The URL that relative paths are resolved against.
+        timing (str): "recorded" to also require the first spec's timestamp.
+    """
+    specs = iter_request_specs(file_path)
+    try:
+        spec = next(specs, None)
+    finally:
+        specs.close()
+    if spec is None:
+        raise ValueError(f"{file_path} has no request specs")
+    spec_to_template(spec, base_url)
+    if timing == "recorded":
+        if "timestamp" not in spec:
+            raise ValueError("Recorded timing requires a timestamp on every request spec")
+        _timestamp(spec["timestamp"])
+
+def endpoint_name(spec):
+    """
+    Name the endpoint a request spec is reported under.
+
+    Uses the spec's `name` if given, otherwise the method and the path without its query string,
+    so requests that only differ by query parameters are grouped together. Paths with IDs in
+    them (`/items/123`) need a `name`; past `stats.MAX_ENDPOINTS` distinct endpoints, the rest
+    are reported together as `stats.OTHER_ENDPOINT`.
+
+    Args:
+        spec (dict): The request spec.
+
+    Returns:
+        str: The endpoint name.
+
+    Example:
+        >>> endpoint_name({"method": "get", "path": "/items?page=2"})
+        'GET /items'
+    """
+    if "name" in spec:
+        return spec["name"]
+    return f"{spec.get('method', 'GET').upper()} {urlsplit(spec.get('url') or spec.get('path', '/')).path or '/'}"
+
+def spec_to_template(spec, base_url):
+    """
+    Encode a request spec into a RequestTemplate.
+
+    Args:
+        spec (dict): The request spec.
+        base_url (str): The URL that relative paths are resolved against.
+
+    Returns:
+        RequestTemplate: The pre-encoded request.
+    """
+    method = spec.get("method", "GET").upper()
+    url = spec.get("url") or urljoin(base_url, spec.get("path", "/"))
+    body = spec.get("body")
+    if isinstance(body, str):
+        return RequestTemplate(method, url, dict(spec.get("headers") or {}), body.encode())
+    return build_request_template(url, method, body, spec.get("headers"))
+
+def _timestamp(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+def recorded_dispatches(file_path, base_url, duration, speed=1.0):
+    """
+    Replay request specs at their recorded timing.
+
+    Offsets are taken from each spec's `timestamp` (epoch seconds or ISO 8601), relative to the
+    first spec and divided by `speed`. Specs must be in timestamp order.
+
+    Args:
+        file_path (str): Path to the JSON Lines file.
+        base_url (str): The URL that relative paths are resolved against.
+        duration (float): Stop once the next offset is past this many seconds.
+        speed (float): Replay speed multiplier; 2.0 replays twice as fast as recorded.
+
+    Returns:
+        iterator[tuple]: (offset, RequestTemplate, endpoint name) tuples.
+    """
+    first = None
+    for spec in iter_request_specs(file_path):
+        if "timestamp" not in spec:
+            raise ValueError("Recorded timing requires a timestamp on every request spec")
+        timestamp = _timestamp(spec["timestamp"])
+        first = timestamp if first is None else first
+        offset = (timestamp - first) / speed
+        if offset > duration:
+            return
+        yield offset, spec_to_template(spec, base_url), endpoint_name(spec)
+
+def _weighted_specs(file_path, base_url, rng):
+    # Cycle through the file forever; a spec of weight w is emitted int(w) times per pass,
+    # plus once more with probability equal to the fractional part. Every pass streams the
+    # file, except that a file of at most MAX_CACHED_SPECS specs is kept after the first one
+    cache = []
+    for item, weight in _encoded_specs(file_path, base_url):
+        if cache is not None:
+            cache.append((item, weight))
+            if len(cache) > MAX_CACHED_SPECS:
+                cache = None
+        yield from _repeats(item, weight, rng)
+    while True:
+        emitted = False
+        for item, weight in cache or _encoded_specs(file_path, base_url):
+            emitted = True
+            yield from _repeats(item, weight, rng)
+        if not emitted:
+            raise ValueError("Replay file has no request spec with a positive weight")
+
+def _encoded_specs(file_path, base_url):
+    # One pass over the file: ((RequestTemplate, endpoint name), weight) for specs with a positive weight
+    for spec in iter_request_specs(file_path):
+        weight = float(spec.get("weight", 1))
+        if weight > 0:
+            yield (spec_to_template(spec, base_url), endpoint_name(spec)), weight
+
+def _repeats(item, weight, rng):
+    return [item] * (int(weight) + (1 if rng.random() < weight - int(weight) else 0))
+
+def _shuffled(items, size, rng):
+    # Bounded shuffle buffer: mixes weighted repeats with neighbouring specs in O(size) memory
+    buffer = []
+    for item in items:
+        if len(buffer) < size:
+            buffer.append(item)
+            continue
+        index = rng.randrange(size)
+        yield buffer[index]
+        buffer[index] = item
+    rng.shuffle(buffer)
+    yield from buffer
+
+def scheduled_dispatches(file_path, base_url, offsets, shuffle_buffer=1000, rng=None):
+    """
+    Replay request specs at scheduled offsets, cycling through the file until the schedule ends.
+
+    Args:
+        file_path (str): Path to the JSON Lines file.
+        base_url (str): The URL that relative paths are resolved against.
+        offsets (iterable): Planned dispatch offsets, see `scheduler.rate_offsets`.
+        shuffle_buffer (int): Size of the buffer used to interleave specs; 1 keeps file order.
+        rng (random.Random): Optional random generator, for reproducible mixes.
+
+    Returns:
+        iterator[tuple]: (offset, RequestTemplate, endpoint name) tuples.
+    """
+    rng = rng or random.Random()
+    specs = _shuffled(_weighted_specs(file_path, base_url, rng), max(1, shuffle_buffer), rng)
+    for offset, (template, name) in zip(offsets, specs):
+        yield offset, template, name
+
+async def run_replay(url, qps, duration, concurrency, args):
+    """
+    Replay a JSON Lines file of request specs against a base URL and report results per endpoint.
+
+    Args:
+        url (str): The base URL that relative paths are resolved against.
+        qps (float): The target queries per second, for scheduled timing.
+        duration (int): The maximum duration of the replay in seconds.
+        concurrency (int): The maximum number of concurrent requests.
+        args (object): Parsed arguments, including file, timing, speed and shuffle_buffer.
+    """
+    stats = RunStats(getattr(args, 'precision', 3))
+    if args.timing == "recorded":
+        dispatches = recorded_dispatches(args.file, url, duration, args.speed)
+        expected = None
+        profile = None
+    else:
+        interarrival_file = getattr(args, 'interarrival_file', None)
+        interarrivals = load_interarrivals(interarrival_file) if interarrival_file else None
+        profile = RateProfile("steady", duration, qps=qps)
+        offsets = rate_offsets(profile, duration, getattr(args, 'arrival', 'fixed'), interarrivals,
+                               getattr(args, 'tick', 0.1))
+        dispatches = scheduled_dispatches(args.file, url, offsets, args.shuffle_buffer)
+        expected = profile.expected_requests()
+
+    async with create_session(stats, **connection_options(args, concurrency)) as session, \
+            serve_metrics(metrics_options(args)) as exporter:
+        if exporter is not None:
+            exporter.attach(stats, profile)
+        semaphore = await prepare_test(url, concurrency, session)
+        prewarm = getattr(args, 'prewarm', 0)
+        if prewarm:
+            stats.prewarmed += await prewarm_connections(session, url, prewarm)
+        start_time = time.perf_counter()
+        options = timeline_options(args)
+        recording = recorder_options(args)
+        await dispatch_requests(dispatches, session, semaphore, stats, expected,
+                                log_every=getattr(args, 'log_every', 0),
+                                timeline=MetricsTimeline(**options) if options else None,
+                                recorder=SampleRecorder(**recording) if recording else None)
+        elapsed = time.perf_counter() - start_time
+
+    # A recorded replay may be shorter than --duration; rate over the time actually spent
+    if args.timing == "recorded":
+        duration = elapsed
+    calculate_and_display_results(stats, duration)
+    save_run(args, stats, duration)
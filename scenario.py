@@ -0,0 +1,297 @@
+import asyncio
+import json
+import random
+import re
+import time
+from baseline import save_run
+from http_client import connection_options, create_session, drain_body, prewarm_connections
+from load_tester import prepare_test, timeline_options
+from health import HealthMonitor
+from metrics import metrics_options, serve_metrics
+from replay import spec_to_template
+from stats import EndpointStats, RunStats, is_error
+from timeline import MetricsTimeline
+from utils import calculate_and_display_results, display_flow_results
+
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+class StepFailed(Exception):
+    """
+    Raised when a step cannot be sent or its response does not yield the values later steps need.
+    """
+
+def load_scenario(file_path):
+    """
+    Load a scenario from a JSON file.
+
+    A scenario is an object with a list of `steps` and optional `variables` (initial values
+    shared by every virtual user) and default `think` time. Each step is a request spec as in
+    `replay` (`method`, `path` or `url`, `headers`, `body`, `name`) plus optional `extract`,
+    mapping variable names to dotted paths into the JSON response, and `think`, the pause after
+    the step. Strings may reference variables as `{name}`; `vu` and `iteration` are always set.
+
+    Args:
+        file_path (str): Path to the scenario file.
+
+    Returns:
+        dict: The scenario.
+    """
+    with open(file_path, 'r') as file:
+        scenario = json.load(file)
+    if not scenario.get("steps"):
+        raise ValueError(f"{file_path}: a scenario needs at least one step")
+    for index, step in enumerate(scenario["steps"]):
+        step.setdefault("name", f"{index + 1}. {step.get('method', 'GET').upper()} {step.get('path') or step.get('url', '/')}")
+    return scenario
+
+def render(value, variables):
+    """
+    Substitute `{name}` placeholders in a value, recursively through lists and dicts.
+
+    A string that is exactly one placeholder takes the variable's value as is, so numbers and
+    objects keep their JSON type in request bodies.
+
+    Args:
+        value: The value to render.
+        variables (dict): The variables in scope.
+
+    Returns:
+        The rendered value.
+
+    Example:
+        >>> render({"id": "{item}", "path": "/items/{item}"}, {"item": 7})
+        {'id': 7, 'path': '/items/7'}
+    """
+    if isinstance(value, str):
+        match = PLACEHOLDER.fullmatch(value)
+        if match:
+            return _variable(variables, match.group(1))
+        return PLACEHOLDER.sub(lambda match: str(_variable(variables, match.group(1))), value)
+    if isinstance(value, dict):
+        return {key: render(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [render(item, variables) for item in value]
+    return value
+
+def _variable(variables, name):
+    try:
+        return variables[name]
+    except KeyError:
+        raise StepFailed(f"Missing variable {name}") from None
+
+def _has_placeholders(value):
+    if isinstance(value, str):
+        return PLACEHOLDER.search(value) is not None
+    if isinstance(value, dict):
+        return any(_has_placeholders(item) for item in value.values())
+    if isinstance(value, list):
+        return any(_has_placeholders(item) for item in value)
+    return False
+
+def extract(document, path):
+    """
+    Look up a dotted path in a decoded JSON document; integer parts index into lists.
+
+    Args:
+        document: The decoded JSON response.
+        path (str): The path, e.g. "items.0.id".
+
+    Returns:
+        The value at the path.
+
+    Example:
+        >>> extract({"items": [{"id": 3}]}, "items.0.id")
+        3
+    """
+    value = document
+    for part in path.split("."):
+        try:
+            value = value[int(part)] if isinstance(value, list) else value[part]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise StepFailed(f"Nothing to extract at {path}") from None
+    return value
+
+def think_time(think, rng):
+    """
+    Draw a think time from a constant or a distribution.
+
+    Args:
+        think (float or dict): Seconds, or a dict with a `distribution` of "constant" (`mean`),
+                               "uniform" (`min`, `max`) or "exponential" (`mean`).
+        rng (random.Random): The random generator.
+
+    Returns:
+        float: The think time in seconds.
+
+    Example:
+        >>> think_time({"distribution": "uniform", "min": 1, "max": 1}, random.Random(0))
+        1.0
+    """
+    if not think:
+        return 0.0
+    if not isinstance(think, dict):
+        return float(think)
+    distribution = think.get("distribution", "constant")
+    if distribution == "constant":
+        return float(think["mean"])
+    if distribution == "uniform":
+        return rng.uniform(think["min"], think["max"])
+    if distribution == "exponential":
+        return rng.expovariate(1.0 / think["mean"]) if think["mean"] > 0 else 0.0
+    raise ValueError(f"Unsupported think time distribution: {distribution}")
+
+async def send_step(session, template, stats, parse):
+    """
+    Send one step's request, reading the body whole if values are to be extracted from it.
+
+    Args:
+        session (aiohttp.ClientSession): The shared session.
+        template (RequestTemplate): The rendered request.
+        stats (RunStats): The statistics to record into.
+        parse (bool): Whether to decode the body as JSON for extraction; otherwise it is only drained.
+
+    Returns:
+        tuple: The elapsed time in seconds, the response status (or error message) and the decoded
+               body, or None if it was not parsed.
+    """
+    stats.request_started()
+    start_time = time.perf_counter()
+    document = None
+    try:
+        async with session.request(template.method, template.url, data=template.body,
+                                   headers=template.headers) as response:
+            headers_at = time.perf_counter()
+            if parse:
+                body = await response.read()
+                size = len(body)
+            else:
+                size, _ = await drain_body(response.content)
+            status = response.status
+        end_time = time.perf_counter()
+        elapsed_time = end_time - start_time
+        stats.body_time.record(end_time - headers_at)
+        if parse and status < 400:
+            try:
+                document = json.loads(body)
+            except ValueError:
+                status = "Response is not JSON"
+        stats.bytes_received += size
+    except Exception as e:
+        elapsed_time = time.perf_counter() - start_time
+        status = str(e)
+    finally:
+        stats.in_flight -= 1
+    return elapsed_time, status, document
+
+async def virtual_user(index, scenario, steps, base_url, session, stats, flows, deadline, iterations, rng):
+    """
+    Run the scenario's flow over and over until the deadline or the iteration limit.
+
+    A flow stops at the first failing step; the next iteration starts from the first step
+    with the user's variables reset.
+
+    Args:
+        index (int): The virtual user's number, available to templates as `vu`.
+        scenario (dict): The scenario, see `load_scenario`.
+        steps (list): (step, pre-built RequestTemplate or None) pairs.
+        base_url (str): The URL that relative paths are resolved against.
+        session (aiohttp.ClientSession): The shared session.
+        stats (RunStats): Per-request statistics, broken down by step.
+        flows (EndpointStats): Whole-flow durations, with failures keyed by the failing step.
+        deadline (float): The `perf_counter` time after which no new step is started.
+        iterations (int): Maximum number of flows; 0 runs until the deadline.
+        rng (random.Random): Random generator for think times.
+    """
+    default_think = scenario.get("think", 0)
+    iteration = 0
+    while (not iterations or iteration < iterations) and time.perf_counter() < deadline:
+        variables = dict(scenario.get("variables", {}), vu=index, iteration=iteration)
+        flow_started = time.perf_counter()
+        outcome = 200
+        for step, template in steps:
+            if time.perf_counter() >= deadline:
+                return
+            try:
+                request = template or spec_to_template(render(step, variables), base_url)
+            except StepFailed as e:
+                outcome = f"{step['name']}: {e}"
+                break
+            response_time, status, document = await send_step(session, request, stats, bool(step.get("extract")))
+            stats.record(response_time, status, step["name"])
+            if is_error(status):
+                outcome = f"{step['name']}: {status}"
+                break
+            try:
+                for name, path in step.get("extract", {}).items():
+                    variables[name] = extract(document, path)
+            except StepFailed as e:
+                outcome = f"{step['name']}: {e}"
+                break
+            await asyncio.sleep(think_time(step.get("think", default_think), rng))
+        flows.record(time.perf_counter() - flow_started, outcome)
+        iteration += 1
+
+async def run_scenario(url, qps, duration, concurrency, args):
+    """
+    Run a closed-loop scenario: virtual users each repeat a multi-step flow with think times.
+
+    Unlike the rate-driven patterns, the load is set by the number of users and how long each
+    one thinks between steps, the way interactive traffic behaves. All users share one session.
+    The report breaks latency down per step and adds whole-flow throughput and duration.
+
+    Args:
+        url (str): The base URL that relative paths are resolved against.
+        qps (float): Unused; the load follows from the users and their think times.
+        duration (int): How long to run, in seconds.
+        concurrency (int): The number of virtual users, unless --users is given.
+        args (object): Parsed arguments, including file, users, ramp_up and iterations.
+
+    Returns:
+        EndpointStats: The whole-flow statistics.
+    """
+    scenario = load_scenario(args.file)
+    users = getattr(args, 'users', None) or concurrency
+    ramp_up = getattr(args, 'ramp_up', 0.0)
+    stats = RunStats(getattr(args, 'precision', 3))
+    flows = EndpointStats(getattr(args, 'precision', 3))
+    # Steps without placeholders are encoded once, like the single-request patterns
+    steps = [(step, None if _has_placeholders(step) else spec_to_template(step, url)) for step in scenario["steps"]]
+    rng = random.Random()
+
+    async with create_session(stats, **connection_options(args, users)) as session, \
+            serve_metrics(metrics_options(args)) as exporter:
+        if exporter is not None:
+            # Closed loop: there is no target rate to export
+            exporter.attach(stats)
+        await prepare_test(url, users, session)
+        prewarm = getattr(args, 'prewarm', 0)
+        if prewarm:
+            stats.prewarmed += await prewarm_connections(session, url, prewarm)
+        print(f"Scenario: {len(steps)} steps, {users} virtual users, {duration}s")
+        options = timeline_options(args)
+        timeline = MetricsTimeline(**options) if options else None
+        start_time = time.perf_counter()
+        deadline = start_time + duration
+        monitor = HealthMonitor(stats).start()
+        if timeline is not None:
+            stats.timeline = timeline
+            ticker = asyncio.create_task(timeline.run(stats, asyncio.get_running_loop().time()))
+
+        async def start_user(index):
+            # Spread user start times evenly over the ramp-up
+            await asyncio.sleep(ramp_up * index / users)
+            await virtual_user(index, scenario, steps, url, session, stats, flows, deadline,
+                               getattr(args, 'iterations', 0), rng)
+
+        await asyncio.gather(*(start_user(index) for index in range(users)))
+        elapsed = time.perf_counter() - start_time
+        monitor.stop()
+        if timeline is not None:
+            ticker.cancel()
+            timeline.finish(elapsed, stats.in_flight)
+            stats.timeline = None
+
+    calculate_and_display_results(stats, elapsed)
+    display_flow_results(flows, elapsed)
+    save_run(args, stats, elapsed)
+    return flows
@@ -0,0 +1,97 @@
+import math
+import random
+from itertools import cycle
+
+ARRIVAL_MODES = ["fixed", "poisson", "custom"]
+
+def load_interarrivals(file_path):
+    """
+    Load normalized inter-arrival gaps from a text file, one number per line.
+
+    Gaps are expressed in units of the mean gap, so a value of 1.0 means "exactly on rate",
+    0.5 means twice as fast and 2.0 half as fast. They are rescaled to the current rate while
+    the test runs, which keeps the offered QPS intact whatever shape the file describes.
+
+    Args:
+        file_path (str): Path to the file with one positive gap per line.
+
+    Returns:
+        list[float]: The gaps, in file order.
+    """
+    with open(file_path, 'r') as file:
+        gaps = [float(line) for line in file if line.strip()]
+    if not gaps or any(gap <= 0 for gap in gaps):
+        raise ValueError("Inter-arrival file must contain positive numbers")
+    return gaps
+
+def _budget_offsets(intervals, next_gap, need=None):
+    # Each arrival consumes `next_gap()` units of "expected requests"; an interval of length l
+    # at rate r supplies r * l units. Unspent budget carries over, so gaps straddling an interval
+    # boundary (or an idle interval) are honoured instead of being restarted.
+    t = 0.0
+    need = next_gap() if need is None else need
+    for start, length, rate in intervals:
+        end = start + length
+        if rate > 0:
+            # The tolerance keeps rounding in the running offset from squeezing an arrival
+            # that belongs at the very start of the next interval into this one
+            while t + need / rate < end - 1e-9:
+                t += need / rate
+                yield t
+                need = next_gap()
+            need -= rate * (end - t)
+        t = end
+
+def _ticks(profile, duration, tick):
+    # Sample the rate at the middle of each tick; tick boundaries are computed from the tick
+    # index rather than accumulated, so long runs do not drift
+    for index in range(math.ceil(duration / tick)):
+        start = index * tick
+        length = min(tick, duration - start)
+        yield start, length, profile(start + length / 2)
+
+def rate_offsets(profile, duration=None, arrival="fixed", interarrivals=None, tick=0.1, rng=None, phase=0.0):
+    """
+    Turn a rate function into planned dispatch offsets, lazily and in constant memory.
+
+    The rate is sampled once per tick and every arrival consumes one mean gap of budget at the
+    current rate, so fractional rates, smooth ramps and sub-second shaping are followed exactly
+    and however long the run, nothing is materialized up front.
+
+    Args:
+        profile (callable): Maps a time offset in seconds to the target rate in QPS, e.g. a
+                            `load_patterns.RateProfile`.
+        duration (float): Length of the schedule in seconds; defaults to `profile.duration`.
+        arrival (str or callable): "fixed" spaces requests exactly one mean gap apart, "poisson"
+            draws exponential gaps, "custom" cycles through `interarrivals`. A callable returning
+            the next normalized gap (mean 1.0) is also accepted.
+        interarrivals (list[float]): Normalized gaps used by the "custom" mode.
+        tick (float): Seconds between rate samples.
+        rng (random.Random): Optional random generator, for reproducible Poisson schedules.
+        phase (float): Fraction of a gap to wait before the first fixed-mode request. Giving
+                       generator i of N a phase of i / N interleaves their requests evenly.
+
+    Returns:
+        iterator[float]: The planned offset of each request, in seconds.
+
+    Example:
+        >>> [round(offset, 2) for offset in rate_offsets(lambda t: 2.5, 2)]
+        [0.0, 0.4, 0.8, 1.2, 1.6]
+    """
+    duration = profile.duration if duration is None else duration
+    if tick <= 0:
+        raise ValueError("tick must be positive")
+    intervals = _ticks(profile, duration, tick)
+    if arrival == "fixed":
+        return _budget_offsets(intervals, lambda: 1.0, phase)
+    if arrival == "poisson":
+        rng = rng or random.Random()
+        return _budget_offsets(intervals, lambda: rng.expovariate(1.0))
+    if arrival == "custom":
+        if not interarrivals:
+            raise ValueError("Custom arrival mode requires inter-arrival gaps")
+        gaps = cycle(interarrivals)
+        return _budget_offsets(intervals, lambda: next(gaps))
+    if callable(arrival):
+        return _budget_offsets(intervals, arrival)
+    raise ValueError("Unsupported arrival mode")
@@ -0,0 +1,242 @@
+from collections import Counter
+from histogram import LatencyHistogram
+
+# Request phase histograms of RunStats, in the order a request goes through them
+PHASES = ["dns_time", "pool_wait", "connect_time", "ttfb", "body_time"]
+# Distinct endpoints kept per run; later ones share one bucket, so IDs in paths cannot grow memory
+MAX_ENDPOINTS = 100
+OTHER_ENDPOINT = "(other)"
+
+def is_error(status):
+    """
+    Tell whether a request outcome counts as an error.
+
+    Args:
+        status (int or str): The response status, or an error message if the request failed.
+
+    Returns:
+        bool: True for exceptions and any 400+ status.
+    """
+    return not isinstance(status, int) or status >= 400
+
+class EndpointStats:
+    """
+    Response time histogram and error counts for one endpoint of a run.
+
+    Args:
+        significant_figures (int): Precision of the latency histogram.
+    """
+
+    def __init__(self, significant_figures=3):
+        self.latency = LatencyHistogram(significant_figures)
+        self.errors = Counter()
+
+    def record(self, response_time, status):
+        self.latency.record(response_time)
+        if is_error(status):
+            self.errors[status] += 1
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.errors.update(other.errors)
+        return self
+
+    def snapshot(self):
+        return {
+            "latency": self.latency.snapshot(),
+            "errors": [[status, count] for status, count in self.errors.items()],
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        stats = cls(snapshot["latency"]["significant_figures"])
+        stats.latency = LatencyHistogram.from_snapshot(snapshot["latency"])
+        stats.errors = Counter({status: count for status, count in snapshot["errors"]})
+        return stats
+
+class RunStats:
+    """
+    Constant-memory statistics for one load test run.
+
+    Holds the response time and dispatch lag histograms, a count of failed requests per
+    status code or error message, connection pool statistics, one histogram per request phase
+    (DNS, pool wait, connect, time to first byte, body download), the number of body bytes
+    received, the load generator's own health (event loop lag, CPU, peak RSS; see
+    `health.HealthMonitor`) and, when requests are tagged
+    with an endpoint name, a per-endpoint breakdown. Instances can be snapshotted
+    to plain JSON-friendly dicts and merged, so results from several event loops or processes
+    combine into one report.
+
+    Args:
+        significant_figures (int): Precision of the latency histograms.
+    """
+
+    def __init__(self, significant_figures=3):
+        self.latency = LatencyHistogram(significant_figures)
+        self.dispatch_lag = LatencyHistogram(significant_figures)
+        self.errors = Counter()
+        self.dns_time = LatencyHistogram(significant_figures)
+        self.connect_time = LatencyHistogram(significant_figures)
+        self.pool_wait = LatencyHistogram(significant_figures)
+        self.ttfb = LatencyHistogram(significant_figures)
+        self.body_time = LatencyHistogram(significant_figures)
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.prewarmed = 0
+        self.bytes_received = 0
+        self.loop_lag = LatencyHistogram(significant_figures)
+        self.cpu_time = 0.0
+        self.cpu_wall = 0.0
+        self.cpu_peak = 0.0
+        self.rss_peak = 0
+        self.endpoints = {}
+        self.in_flight = 0
+        self.timeline = None
+        self.recorder = None
+        self.metrics = None
+
+    def request_started(self):
+        """
+        Count a request as in flight; the worker decrements `in_flight` once it completes.
+        """
+        self.in_flight += 1
+        if self.timeline is not None:
+            self.timeline.observe_in_flight(self.in_flight)
+
+    def endpoint(self, name):
+        """
+        Return the statistics of one endpoint, creating them on first use.
+
+        Once MAX_ENDPOINTS endpoints exist, new names are folded into a single OTHER_ENDPOINT bucket.
+
+        Args:
+            name (str): The endpoint name.
+
+        Returns:
+            EndpointStats: The endpoint's statistics.
+
+        Example:
+            >>> stats = RunStats()
+            >>> for item in range(MAX_ENDPOINTS + 5):
+            ...     stats.record(0.1, 200, f"GET /items/{item}")
+            >>> len(stats.endpoints), stats.endpoints[OTHER_ENDPOINT].latency.count
+            (101, 5)
+        """
+        stats = self.endpoints.get(name)
+        if stats is None and len(self.endpoints) >= MAX_ENDPOINTS:
+            name = OTHER_ENDPOINT
+            stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = EndpointStats(self.latency.significant_figures)
+        return stats
+
+    def record(self, response_time, status, endpoint=None):
+        """
+        Record the outcome of a single request.
+
+        Args:
+            response_time (float): The response time in seconds.
+            status (int or str): The response status, or an error message if the request failed.
+            endpoint (str, optional): The endpoint to also record the request under.
+        """
+        self.latency.record(response_time)
+        if is_error(status):
+            self.errors[status] += 1
+        if endpoint is not None:
+            self.endpoint(endpoint).record(response_time, status)
+        if self.timeline is not None:
+            self.timeline.record(response_time, status)
+        if self.metrics is not None:
+            self.metrics.record(response_time, status)
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+    def merge(self, other):
+        """
+        Merge another run's statistics into this one.
+
+        Args:
+            other (RunStats): The statistics to merge in.
+
+        Returns:
+            RunStats: This instance, for chaining.
+        """
+        self.latency.merge(other.latency)
+        self.dispatch_lag.merge(other.dispatch_lag)
+        self.errors.update(other.errors)
+        for phase in PHASES:
+            getattr(self, phase).merge(getattr(other, phase))
+        self.connections_created += other.connections_created
+        self.connections_reused += other.connections_reused
+        self.prewarmed += other.prewarmed
+        self.bytes_received += other.bytes_received
+        # Health is per process: time adds up, peaks are the worst process's
+        self.loop_lag.merge(other.loop_lag)
+        self.cpu_time += other.cpu_time
+        self.cpu_wall += other.cpu_wall
+        self.cpu_peak = max(self.cpu_peak, other.cpu_peak)
+        self.rss_peak = max(self.rss_peak, other.rss_peak)
+        for name, endpoint in other.endpoints.items():
+            self.endpoint(name).merge(endpoint)
+        return self
+
+    def snapshot(self):
+        """
+        Return a JSON-serializable copy of the statistics.
+
+        Returns:
+            dict: The snapshot.
+        """
+        return {
+            "latency": self.latency.snapshot(),
+            "dispatch_lag": self.dispatch_lag.snapshot(),
+            # Keep statuses as pairs so integer codes survive a JSON round trip
+            "errors": [[status, count] for status, count in self.errors.items()],
+            **{phase: getattr(self, phase).snapshot() for phase in PHASES},
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "prewarmed": self.prewarmed,
+            "bytes_received": self.bytes_received,
+            "loop_lag": self.loop_lag.snapshot(),
+            "cpu_time": self.cpu_time,
+            "cpu_wall": self.cpu_wall,
+            "cpu_peak": self.cpu_peak,
+            "rss_peak": self.rss_peak,
+            "endpoints": {name: endpoint.snapshot() for name, endpoint in self.endpoints.items()},
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Rebuild statistics from a snapshot produced by `snapshot()`.
+
+        Args:
+            snapshot (dict): The snapshot.
+
+        Returns:
+            RunStats: The restored statistics.
+        """
+        stats = cls(snapshot["latency"]["significant_figures"])
+        stats.latency = LatencyHistogram.from_snapshot(snapshot["latency"])
+        stats.dispatch_lag = LatencyHistogram.from_snapshot(snapshot["dispatch_lag"])
+        stats.errors = Counter({status: count for status, count in snapshot["errors"]})
+        for phase in PHASES:
+            setattr(stats, phase, LatencyHistogram.from_snapshot(snapshot[phase]))
+        stats.connections_created = snapshot["connections_created"]
+        stats.connections_reused = snapshot["connections_reused"]
+        stats.prewarmed = snapshot["prewarmed"]
+        stats.bytes_received = snapshot["bytes_received"]
+        stats.loop_lag = LatencyHistogram.from_snapshot(snapshot["loop_lag"])
+        stats.cpu_time = snapshot["cpu_time"]
+        stats.cpu_wall = snapshot["cpu_wall"]
+        stats.cpu_peak = snapshot["cpu_peak"]
+        stats.rss_peak = snapshot["rss_peak"]
+        stats.endpoints = {name: EndpointStats.from_snapshot(endpoint)
+                           for name, endpoint in snapshot["endpoints"].items()}
+        return stats
@@ -0,0 +1,80 @@
+import asyncio
+from argparse import ArgumentParser
+from aiohttp import web
+
+def create_app(delay=0.0, size=2):
+    """
+    Create a target application that answers every request after a fixed delay with a fixed-size body.
+
+    The body is built once, so the server does as little work per request as possible and
+    any latency beyond `delay` measured against it is added by the network stack or the client.
+
+    Args:
+        delay (float): Seconds to wait before responding.
+        size (int): Size of the response body in bytes.
+
+    Returns:
+        aiohttp.web.Application: The application.
+    """
+    body = b"x" * size
+
+    async def handle(request):
+        await request.read()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return web.Response(body=body)
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handle)
+    return app
+
+async def start_server(host="127.0.0.1", port=8080, delay=0.0, size=2):
+    """
+    Start the target server on the running event loop.
+
+    Args:
+        host (str): The host to bind to.
+        port (int): The port to listen on.
+        delay (float): Seconds to wait before responding.
+        size (int): Size of the response body in bytes.
+
+    Returns:
+        aiohttp.web.AppRunner: The runner; call `cleanup()` on it to stop the server.
+    """
+    runner = web.AppRunner(create_app(delay, size), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+def serve(port, delay=0.0, size=2, host="127.0.0.1", ready=None):
+    """
+    Run the target server until the process is terminated.
+
+    Meant as the target of a separate process, so the server's CPU time is not counted
+    against the load generator being measured.
+
+    Args:
+        port (int): The port to listen on.
+        delay (float): Seconds to wait before responding.
+        size (int): Size of the response body in bytes.
+        host (str): The host to bind to.
+        ready (multiprocessing.Event): Optional event set once the server accepts connections.
+    """
+    async def run():
+        await start_server(host, port, delay, size)
+        if ready is not None:
+            ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Local HTTP target with a fixed response delay and size")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind to")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before responding")
+    parser.add_argument("--size", type=int, default=2, help="Size of the response body in bytes")
+    args = parser.parse_args()
+
+    print(f"Target server on http://{args.host}:{args.port}/ (delay {args.delay}s, {args.size} byte responses)")
+    serve(args.port, args.delay, args.size, args.host)
@@ -0,0 +1,148 @@
+import asyncio
+import csv
+import json
+import time
+from collections import Counter, deque
+from histogram import LatencyHistogram
+from stats import is_error
+
+TIMELINE_FIELDS = ["timestamp", "offset", "requests", "rps", "p50", "p99", "max", "errors", "error_statuses",
+                   "in_flight"]
+
+class MetricsTimeline:
+    """
+    Per-window throughput, latency, errors and concurrency of a running test.
+
+    Requests are recorded into the current window in O(1). When a window closes, it is reduced
+    to a single summary row that is appended to a bounded ring buffer and, if a path was given,
+    written out immediately as a CSV row or a JSON line, so the file can be followed while the
+    test runs. Memory stays constant however long the test is.
+
+    Args:
+        path (str, optional): File to stream rows to; CSV if it ends in `.csv`, JSON lines otherwise.
+        window (float): Window length in seconds.
+        capacity (int): Number of most recent rows kept in memory.
+        precision (int): Significant figures of the per-window latency histogram.
+
+    Example:
+        >>> import os, shutil, tempfile
+        >>> directory = tempfile.mkdtemp()
+        >>> for name in ("timeline.csv", "timeline.jsonl"):
+        ...     timeline = MetricsTimeline(os.path.join(directory, name))
+        ...     for latency, status in [(0.1, 200), (0.2, 200), (0.3, 200), (0.05, 503), (0.4, "Timeout")]:
+        ...         timeline.record(latency, status)
+        ...     timeline.observe_in_flight(4)
+        ...     timeline.finish(0.5, in_flight=2)
+        >>> with open(os.path.join(directory, "timeline.csv"), newline='') as file:
+        ...     row = next(csv.DictReader(file))
+        >>> row["offset"], row["requests"], row["rps"], row["max"], row["errors"], row["error_statuses"], row["in_flight"]
+        ('0.0', '5', '10.0', '0.4', '2', '503:1;Timeout:1', '4')
+        >>> with open(os.path.join(directory, "timeline.jsonl")) as file:
+        ...     row = json.loads(file.readline())
+        >>> row["requests"], row["errors"], row["error_statuses"], row["in_flight"]
+        (5, 2, {'503': 1, 'Timeout': 1}, 4)
+        >>> shutil.rmtree(directory)
+    """
+
+    def __init__(self, path=None, window=1.0, capacity=3600, precision=2):
+        self.window = window
+        self.rows = deque(maxlen=capacity)
+        self._latency = LatencyHistogram(precision)
+        self._errors = Counter()
+        self._peak_in_flight = 0
+        self._offset = 0.0
+        self._file = open(path, 'w', newline='', buffering=1) if path else None
+        self._csv = None
+        if self._file and path.endswith('.csv'):
+            self._csv = csv.DictWriter(self._file, fieldnames=TIMELINE_FIELDS)
+            self._csv.writeheader()
+
+    def record(self, response_time, status):
+        """
+        Record a completed request in the current window.
+
+        Args:
+            response_time (float): The response time in seconds.
+            status (int or str): The response status, or an error message if the request failed.
+        """
+        self._latency.record(response_time)
+        if is_error(status):
+            self._errors[status] += 1
+
+    def observe_in_flight(self, in_flight):
+        """
+        Track the peak number of in-flight requests in the current window.
+
+        Args:
+            in_flight (int): The current number of in-flight requests.
+        """
+        if in_flight > self._peak_in_flight:
+            self._peak_in_flight = in_flight
+
+    def close_window(self, offset, length, in_flight):
+        """
+        Summarize the current window into a row and start a new window.
+
+        Args:
+            offset (float): Start of the window, in seconds since the start of the test.
+            length (float): Length of the window in seconds; shorter than `window` for the last one.
+            in_flight (int): Requests in flight when the window closes; seeds the next window's peak.
+
+        Returns:
+            dict: The row.
+        """
+        latency = self._latency
+        p50, p99 = latency.percentiles([50, 99])
+        row = {
+            "timestamp": round(time.time() - length, 3),
+            "offset": round(offset, 3),
+            "requests": latency.count,
+            "rps": round(latency.count / length, 2) if length > 0 else 0.0,
+            "p50": round(p50, 6),
+            "p99": round(p99, 6),
+            "max": round(latency.max, 6),
+            "errors": sum(self._errors.values()),
+            "error_statuses": dict(self._errors),
+            "in_flight": self._peak_in_flight,
+        }
+        self.rows.append(row)
+        self._write(row)
+        latency.reset()
+        self._errors.clear()
+        self._peak_in_flight = in_flight
+        return row
+
+    def _write(self, row):
+        statuses = row["error_statuses"]
+        if self._csv:
+            self._csv.writerow(dict(row, error_statuses=";".join(f"{status}:{count}" for status, count in statuses.items())))
+        elif self._file:
+            self._file.write(json.dumps(dict(row, error_statuses={str(status): count for status, count
+                                                                  in statuses.items()})) + "\n")
+
+    async def run(self, stats, start_time):
+        """
+        Close a window every `window` seconds, aligned to the start of the test, until cancelled.
+
+        Args:
+            stats (RunStats): The run's statistics, read for the current in-flight count.
+            start_time (float): The event loop time at which the test started.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(max(0, start_time + self._offset + self.window - loop.time()))
+            self.close_window(self._offset, self.window, stats.in_flight)
+            self._offset += self.window
+
+    def finish(self, elapsed, in_flight=0):
+        """
+        Close the last, possibly partial, window and the output file.
+
+        Args:
+            elapsed (float): Seconds since the start of the test.
+            in_flight (int): Requests still in flight.
+        """
+        if self._latency.count or self._errors:
+            self.close_window(self._offset, elapsed - self._offset, in_flight)
+        if self._file:
+            self._file.close()
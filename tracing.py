@@ -0,0 +1,77 @@
+import time
+import aiohttp
+
+# Pass as `trace_request_ctx` for requests that must not show up in the run's statistics,
+# such as the server info probe and connection pre-warming
+UNTRACKED = object()
+
+def request_trace_config(stats):
+    """
+    Build an aiohttp trace config that records connection pool behaviour and per-phase timings into run statistics.
+
+    Counts connections created versus reused from the pool and times the phases of each request
+    on the monotonic `perf_counter` clock:
+
+    - DNS resolution, when the address was not cached
+    - pool wait, queueing for a free connection when the pool is full
+    - connect, opening a new connection minus its DNS lookup; aiohttp has no TLS hook, so the
+      TCP and TLS handshakes are measured together
+    - time to first byte, from the request headers being sent to the response headers arriving
+
+    The body download is timed by `http_client.send_request`, which reads the body.
+
+    Args:
+        stats (RunStats): The statistics to record into.
+
+    Returns:
+        aiohttp.TraceConfig: The trace config, to pass to `aiohttp.ClientSession`.
+    """
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_dns_resolvehost_start(session, context, params):
+        context.dns_started_at = time.perf_counter()
+
+    async def on_dns_resolvehost_end(session, context, params):
+        context.dns_time = time.perf_counter() - context.dns_started_at
+        if context.trace_request_ctx is not UNTRACKED:
+            stats.dns_time.record(context.dns_time)
+
+    async def on_connection_queued_start(session, context, params):
+        context.queued_at = time.perf_counter()
+
+    async def on_connection_queued_end(session, context, params):
+        if context.trace_request_ctx is not UNTRACKED:
+            stats.pool_wait.record(time.perf_counter() - context.queued_at)
+
+    async def on_connection_create_start(session, context, params):
+        context.connect_started_at = time.perf_counter()
+
+    async def on_connection_create_end(session, context, params):
+        if context.trace_request_ctx is not UNTRACKED:
+            stats.connections_created += 1
+            # The lookup happens inside connection creation; keep the phases disjoint
+            connect_time = time.perf_counter() - context.connect_started_at - getattr(context, 'dns_time', 0.0)
+            stats.connect_time.record(connect_time)
+
+    async def on_connection_reuseconn(session, context, params):
+        if context.trace_request_ctx is not UNTRACKED:
+            stats.connections_reused += 1
+
+    async def on_request_headers_sent(session, context, params):
+        context.sent_at = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        # Fires once the response headers have been received, before the body is read
+        if context.trace_request_ctx is not UNTRACKED and hasattr(context, 'sent_at'):
+            stats.ttfb.record(time.perf_counter() - context.sent_at)
+
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_connection_queued_start.append(on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(on_connection_queued_end)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_request_headers_sent.append(on_request_headers_sent)
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
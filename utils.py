@@ -1,22 +1,33 @@
-import numpy as np
+from health import saturation_verdict
 
-def calculate_and_display_results(results, errors, duration):
+REPORTED_PERCENTILES = [50, 90, 99, 99.9]
+# Request phase histograms of RunStats and how the report names them
+PHASE_LABELS = {
+    "dns_time": "DNS",
+    "pool_wait": "Pool wait",
+    "connect_time": "Connect (TCP + TLS)",
+    "ttfb": "Time to first byte",
+    "body_time": "Body download",
+}
+
+def calculate_and_display_results(stats, duration):
     """
-    Calculate and display various statistics from a list of request times and errors.
+    Calculate and display various statistics from the latency histogram and error counts of a run.
 
     Parameters:
-    results (list): A list of request times in seconds
-    errors (list): A list of error messages (if any)
+    stats (RunStats): The statistics recorded during the test
     duration (float): The total duration of the test in seconds
 
     Returns:
     None
 
     Example:
-    >>> results = [0.1, 0.2, 0.3, 0.4, 0.5]
-    >>> errors = []
+    >>> from stats import RunStats
+    >>> stats = RunStats()
+    >>> for response_time in [0.1, 0.2, 0.3, 0.4, 0.5]:
+    ...     stats.record(response_time, 200)
     >>> duration = 10.0
-    >>> calculate_and_display_results(results, errors, duration)
+    >>> calculate_and_display_results(stats, duration)
     -------- Results --------
     Total Requests: 5
     Total time: 1.5000s
@@ -29,31 +40,184 @@ def calculate_and_display_results(results, errors, duration):
     Error Rate: 0.00%
     Response Time Percentiles:
       50th Percentile: 0.3000s
-      75th Percentile: 0.4000s
       90th Percentile: 0.5000s
+      99th Percentile: 0.5000s
+      99.9th Percentile: 0.5000s
+      Max: 0.5000s
     """
-
-    total_requests = len(results)
-    total_time = sum(results)
-    avg_time = np.mean(results)
-    min_time = min(results)
-    max_time = max(results)
-    std_dev = np.std(results)
+    latency = stats.latency
+    total_requests = latency.count
+    min_time = latency.min if total_requests else 0.0
+    max_time = latency.max
     rps = total_requests / duration
-    error_rate = (len(errors) / total_requests) * 100 if total_requests else 0
-    percentiles = np.percentile(results, [50, 75, 90, 95, 99])
+    error_rate = (stats.error_count / total_requests) * 100 if total_requests else 0
+    percentiles = latency.percentiles(REPORTED_PERCENTILES)
 
     print("-------- Results --------")
     print(f"Total Requests: {total_requests}")
-    print(f"Total time: {total_time:.4f}s")
-    print(f"Average time per request / Latency: {avg_time:.4f}s")
+    print(f"Total time: {latency.total:.4f}s")
+    print(f"Average time per request / Latency: {latency.mean:.4f}s")
     print(f"Fastest time: {min_time:.4f}s")
     print(f"Slowest time: {max_time:.4f}s")
     print(f"Amplitude: {max_time - min_time:.4f}s")
-    print(f"Standard deviation: {std_dev:.6f}")
+    print(f"Standard deviation: {latency.stdev:.6f}")
     print(f"Requests Per Second: {rps:.2f}")
     print(f"Error Rate: {error_rate:.2f}%")
+    if stats.bytes_received:
+        print(f"Bytes Received: {stats.bytes_received} ({stats.bytes_received / total_requests:.0f} bytes/request)")
+        print(f"Transfer Rate: {stats.bytes_received / duration / 1e6:.2f} MB/s")
     print("Response Time Percentiles:")
-    print(f"  50th Percentile: {percentiles[0]:.4f}s")
-    print(f"  75th Percentile: {percentiles[1]:.4f}s")
-    print(f"  90th Percentile: {percentiles[2]:.4f}s")
+    for percentile, value in zip(REPORTED_PERCENTILES, percentiles):
+        print(f"  {percentile:g}th Percentile: {value:.4f}s")
+    print(f"  Max: {max_time:.4f}s")
+
+    if stats.errors:
+        print("Errors:")
+        for status, count in stats.errors.most_common():
+            print(f"  {status}: {count}")
+
+    if stats.endpoints:
+        display_endpoint_breakdown(stats.endpoints, duration)
+
+    lag = stats.dispatch_lag
+    if lag.count:
+        lag_percentiles = lag.percentiles([50, 99])
+        print("Dispatch Lag (actual vs planned send time):")
+        print(f"  50th Percentile: {lag_percentiles[0]:.4f}s")
+        print(f"  99th Percentile: {lag_percentiles[1]:.4f}s")
+        print(f"  Max: {lag.max:.4f}s")
+
+    connections = stats.connections_created + stats.connections_reused
+    if connections:
+        print("Connections:")
+        print(f"  Pre-warmed: {stats.prewarmed}")
+        print(f"  Created: {stats.connections_created}")
+        print(f"  Reused: {stats.connections_reused} ({stats.connections_reused / connections * 100:.2f}%)")
+
+    if any(getattr(stats, phase).count for phase in PHASE_LABELS):
+        display_phase_breakdown(stats)
+
+    if stats.loop_lag.count or stats.cpu_wall:
+        display_client_health(stats)
+
+def display_client_health(stats):
+    """
+    Display the load generator's own health and whether it, rather than the target, limited the run.
+
+    Parameters:
+    stats (RunStats): The statistics recorded during the test, with health samples
+
+    Returns:
+    None
+    """
+    print("Client Health:")
+    if stats.loop_lag.count:
+        p50, p99 = stats.loop_lag.percentiles([50, 99])
+        print(f"  Event loop lag: p50 {p50 * 1e3:.1f} ms, p99 {p99 * 1e3:.1f} ms, max {stats.loop_lag.max * 1e3:.1f} ms")
+    if stats.cpu_wall:
+        print(f"  CPU: {stats.cpu_time / stats.cpu_wall * 100:.0f}% of a core on average, "
+              f"{stats.cpu_peak * 100:.0f}% peak")
+    if stats.rss_peak:
+        print(f"  Peak RSS: {stats.rss_peak / 2**20:.1f} MiB")
+    verdict, reasons = saturation_verdict(stats)
+    if verdict == "OK":
+        print("  Verdict: OK, the load generator kept up")
+        return
+    print(f"  Verdict: {verdict}, " + "; ".join(reasons))
+    banner = "!" * 72
+    if verdict == "CONCURRENCY-LIMITED":
+        print("NOTE: the client kept up, but the target answered too slowly for -c to carry the offered rate,")
+        print("so requests went out later than planned. Raise -c to offer the full rate.")
+    elif verdict == "INVALID":
+        print(banner)
+        print("RESULTS INVALID: the load generator was the bottleneck, so latencies and rates above")
+        print("describe the client, not the target. Lower the rate, raise -c, add --processes or use")
+        print("a faster --engine before drawing conclusions about the target.")
+        print(banner)
+    else:
+        print("WARNING: the load generator was close to saturation; latencies may include client-side delay.")
+
+def display_phase_breakdown(stats):
+    """
+    Display one line per request phase that was observed, so network and server time can be told apart.
+
+    Phases that only some requests go through (DNS lookups, new connections, pool waits) are
+    counted separately from the total number of requests.
+
+    Parameters:
+    stats (RunStats): The statistics recorded during the test
+
+    Returns:
+    None
+    """
+    print("Request Phases:")
+    for phase, label in PHASE_LABELS.items():
+        histogram = getattr(stats, phase)
+        if not histogram.count:
+            continue
+        p50, p99 = histogram.percentiles([50, 99])
+        print(f"  {label:<20} {histogram.count:>8}x  avg {histogram.mean:.4f}s  p50 {p50:.4f}s  "
+              f"p99 {p99:.4f}s  max {histogram.max:.4f}s")
+
+def display_process_breakdown(process_results, title="Per-process throughput", label="Process"):
+    """
+    Display per-generator throughput of a run split across processes or workers, so imbalance is visible.
+
+    Parameters:
+    process_results (list): (index, RunStats, elapsed seconds) for each load generator
+    title (str): Heading of the section
+    label (str): Name of a single load generator
+
+    Returns:
+    None
+    """
+    print(f"-------- {title} --------")
+    for index, stats, elapsed in process_results:
+        requests = stats.latency.count
+        rps = requests / elapsed if elapsed else 0
+        print(f"  {label} {index}: {requests} requests in {elapsed:.2f}s "
+              f"({rps:.2f} req/s), p99 {stats.latency.percentile(99):.4f}s, errors {stats.error_count}")
+
+def display_endpoint_breakdown(endpoints, duration):
+    """
+    Display request count, throughput, error rate and latency percentiles for each endpoint.
+
+    Parameters:
+    endpoints (dict): Endpoint name to EndpointStats
+    duration (float): The total duration of the test in seconds
+
+    Returns:
+    None
+    """
+    print("Per-endpoint Results:")
+    width = max(len(name) for name in endpoints)
+    for name, stats in sorted(endpoints.items(), key=lambda item: -item[1].latency.count):
+        requests = stats.latency.count
+        error_rate = stats.error_count / requests * 100 if requests else 0
+        p50, p99 = stats.latency.percentiles([50, 99])
+        print(f"  {name:<{width}}  {requests:>8} req  {requests / duration:8.2f} req/s  "
+              f"errors {error_rate:6.2f}%  p50 {p50:.4f}s  p99 {p99:.4f}s  max {stats.latency.max:.4f}s")
+
+def display_flow_results(flows, duration):
+    """
+    Display whole-flow throughput and duration of a scenario run, and where failed flows stopped.
+
+    Parameters:
+    flows (EndpointStats): Flow durations, with failures keyed by the failing step
+    duration (float): The total duration of the run in seconds
+
+    Returns:
+    None
+    """
+    total = flows.latency.count
+    failed = flows.error_count
+    completed = total - failed
+    p50, p99 = flows.latency.percentiles([50, 99])
+    print("-------- Flows --------")
+    print(f"Flows: {total} ({completed} completed, {failed} failed)")
+    print(f"Completed Flows Per Second: {completed / duration:.2f}")
+    print(f"Flow duration (with think time): avg {flows.latency.mean:.4f}s, p50 {p50:.4f}s, p99 {p99:.4f}s")
+    if failed:
+        print("Failed flows:")
+        for step, count in flows.errors.most_common():
+            print(f"  {step}: {count}")